@@ -24,6 +24,9 @@ class DatabaseConfig:
     emulator_host: Optional[str] = None
     use_firestore: bool = True
     local_db_path: str = "local_db"
+    local_db_backend: str = "file"  # file | sqlite
+    local_db_pretty_json: bool = False  # ローカルDBのJSONをインデント付きで保存（デバッグ用）
+    local_db_inplace_updates: bool = False  # 更新を一時ファイル経由でなくその場で書き換える（電源断時は壊れうる）
     
     @classmethod
     def from_env(cls) -> 'DatabaseConfig':
@@ -34,7 +37,10 @@ class DatabaseConfig:
             use_emulator=os.getenv('USE_FIRESTORE_EMULATOR', 'false').lower() == 'true',
             emulator_host=os.getenv('FIRESTORE_EMULATOR_HOST'),
             use_firestore=os.getenv('USE_FIRESTORE', 'false').lower() == 'true',
-            local_db_path=os.getenv('LOCAL_DB_PATH', 'local_db')
+            local_db_path=os.getenv('LOCAL_DB_PATH', 'local_db'),
+            local_db_backend=os.getenv('LOCAL_DB_BACKEND', 'file'),
+            local_db_pretty_json=os.getenv('LOCAL_DB_PRETTY_JSON', 'false').lower() == 'true',
+            local_db_inplace_updates=os.getenv('LOCAL_DB_INPLACE_UPDATES', 'false').lower() == 'true'
         )
 
 
@@ -45,6 +51,27 @@ class APIConfig:
     gemini_api_key: Optional[str] = None
     google_cloud_project_id: Optional[str] = None
     lazy_init_enabled: bool = True  # 遅延初期化を有効化
+    gemini_requests_per_minute: int = 300  # Gemini APIのリクエスト数上限（RPM）
+    gemini_tokens_per_minute: int = 1_000_000  # Gemini APIの入力トークン数上限（TPM）
+    gemini_request_burst: int = 10  # 同時に送出できるリクエスト数
+    gemini_max_concurrent: int = 5  # Gemini APIの同時呼び出し数
+    gemini_streaming_enabled: bool = True  # Gemini応答をストリーミングで受信
+    gemini_api_timeout_seconds: float = 60.0  # Gemini API呼び出し1回あたりのタイムアウト
+    gemini_retry_backoff_base_seconds: float = 1.0  # リトライ待機（フルジッター）の基準秒数
+    gemini_retry_backoff_cap_seconds: float = 30.0  # リトライ待機の上限秒数
+    gemini_speculative_generation_enabled: bool = False  # シナリオ生成を2本並行で送り先に成功した応答を採用
+    ai_response_cache_enabled: bool = False  # 同一リクエストのAI応答キャッシュ（明示時のみ有効）
+    ai_response_cache_max_size: int = 1024
+    ai_response_cache_ttl_seconds: int = 3600
+    ai_response_cache_backend: str = "memory"  # memory | redis | sqlite
+    ai_response_cache_redis_url: Optional[str] = None
+    ai_response_cache_path: str = ".cache/llm_responses.sqlite3"  # sqlite バックエンドの保存先
+    ai_response_cache_mode: str = "exact"  # exact: temperature=0のみ / loose: 温度に関係なくキャッシュ（明示時のみ）
+    semantic_cache_enabled: bool = False  # 場所情報の言い換えを埋め込み類似度で同一視するキャッシュ（AI_RESPONSE_CACHE_MODE=loose が必要）
+    semantic_cache_threshold: float = 0.92  # ヒットとみなすコサイン類似度
+    semantic_cache_max_entries: int = 256  # パーティションごとの保持件数
+    semantic_cache_ttl_seconds: int = 3600
+    background_enhancement_max_concurrent: int = 4  # バックグラウンド詳細化の同時実行数
     
     @classmethod
     def from_env(cls) -> 'APIConfig':
@@ -53,7 +80,28 @@ class APIConfig:
             google_maps_api_key=os.getenv('GOOGLE_MAPS_API_KEY'),
             gemini_api_key=os.getenv('GEMINI_API_KEY'),
             google_cloud_project_id=os.getenv('GOOGLE_CLOUD_PROJECT_ID'),
-            lazy_init_enabled=os.getenv('LAZY_INIT_ENABLED', 'true').lower() == 'true'
+            lazy_init_enabled=os.getenv('LAZY_INIT_ENABLED', 'true').lower() == 'true',
+            gemini_requests_per_minute=int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '300')),
+            gemini_tokens_per_minute=int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '1000000')),
+            gemini_request_burst=int(os.getenv('GEMINI_REQUEST_BURST', '10')),
+            gemini_max_concurrent=int(os.getenv('GEMINI_MAX_CONCURRENT', '5')),
+            gemini_streaming_enabled=os.getenv('GEMINI_STREAMING_ENABLED', 'true').lower() == 'true',
+            gemini_api_timeout_seconds=float(os.getenv('GEMINI_API_TIMEOUT_SECONDS', '60')),
+            gemini_retry_backoff_base_seconds=float(os.getenv('GEMINI_RETRY_BACKOFF_BASE_SECONDS', '1.0')),
+            gemini_retry_backoff_cap_seconds=float(os.getenv('GEMINI_RETRY_BACKOFF_CAP_SECONDS', '30.0')),
+            gemini_speculative_generation_enabled=os.getenv('GEMINI_SPECULATIVE_GENERATION_ENABLED', 'false').lower() == 'true',
+            ai_response_cache_enabled=os.getenv('AI_RESPONSE_CACHE_ENABLED', 'false').lower() == 'true',
+            ai_response_cache_max_size=int(os.getenv('AI_RESPONSE_CACHE_MAX_SIZE', '1024')),
+            ai_response_cache_ttl_seconds=int(os.getenv('AI_RESPONSE_CACHE_TTL_SECONDS', '3600')),
+            ai_response_cache_backend=os.getenv('AI_RESPONSE_CACHE_BACKEND', 'memory'),
+            ai_response_cache_redis_url=os.getenv('REDIS_URL'),
+            ai_response_cache_path=os.getenv('AI_RESPONSE_CACHE_PATH', '.cache/llm_responses.sqlite3'),
+            ai_response_cache_mode=os.getenv('AI_RESPONSE_CACHE_MODE', 'exact'),
+            semantic_cache_enabled=os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true',
+            semantic_cache_threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92')),
+            semantic_cache_max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '256')),
+            semantic_cache_ttl_seconds=int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', '3600')),
+            background_enhancement_max_concurrent=int(os.getenv('BACKGROUND_ENHANCEMENT_MAX_CONCURRENT', '4'))
         )
 
 
@@ -36,6 +36,16 @@ class LogCategory(str, Enum):
     SYSTEM = "system"
 
 
+# LogLevel から標準ロギングの数値レベルへの対応
+_LEVEL_NUMBERS = {
+    LogLevel.DEBUG: logging.DEBUG,
+    LogLevel.INFO: logging.INFO,
+    LogLevel.WARNING: logging.WARNING,
+    LogLevel.ERROR: logging.ERROR,
+    LogLevel.CRITICAL: logging.CRITICAL,
+}
+
+
 class StructuredLogger:
     """構造化ロガー"""
     
@@ -73,43 +83,45 @@ class StructuredLogger:
         # 重複ログ防止
         self.logger.propagate = False
     
+    def isEnabledFor(self, level: int) -> bool:
+        """指定レベルのログが出力されるか（高コストなログ引数の生成を省く判定用）"""
+        return self.logger.isEnabledFor(level)
+    
     def _log_structured(
         self, 
         level: LogLevel, 
         message: str, 
+        *args,
         **kwargs
     ):
-        """構造化ログ出力"""
+        """構造化ログ出力
+        
+        args を渡した場合は標準ロギングと同じく %形式で遅延フォーマットする。
+        """
+        level_number = _LEVEL_NUMBERS[level]
+        # 出力されないレベルは extra の構築も省略
+        if not self.logger.isEnabledFor(level_number):
+            return
+        
         extra = {
             'category': self.category.value,
             'structured_data': kwargs
         }
-        
-        # ログレベルに応じて出力
-        if level == LogLevel.DEBUG:
-            self.logger.debug(message, extra=extra)
-        elif level == LogLevel.INFO:
-            self.logger.info(message, extra=extra)
-        elif level == LogLevel.WARNING:
-            self.logger.warning(message, extra=extra)
-        elif level == LogLevel.ERROR:
-            self.logger.error(message, extra=extra)
-        elif level == LogLevel.CRITICAL:
-            self.logger.critical(message, extra=extra)
+        self.logger.log(level_number, message, *args, extra=extra, stacklevel=3)
     
-    def debug(self, message: str, **kwargs):
+    def debug(self, message: str, *args, **kwargs):
         """デバッグログ"""
-        self._log_structured(LogLevel.DEBUG, message, **kwargs)
+        self._log_structured(LogLevel.DEBUG, message, *args, **kwargs)
     
-    def info(self, message: str, **kwargs):
+    def info(self, message: str, *args, **kwargs):
         """情報ログ"""
-        self._log_structured(LogLevel.INFO, message, **kwargs)
+        self._log_structured(LogLevel.INFO, message, *args, **kwargs)
     
-    def warning(self, message: str, **kwargs):
+    def warning(self, message: str, *args, **kwargs):
         """警告ログ"""
-        self._log_structured(LogLevel.WARNING, message, **kwargs)
+        self._log_structured(LogLevel.WARNING, message, *args, **kwargs)
     
-    def error(self, message: str, exception: Optional[Exception] = None, **kwargs):
+    def error(self, message: str, *args, exception: Optional[Exception] = None, **kwargs):
         """エラーログ"""
         if exception:
             kwargs.update({
@@ -117,9 +129,9 @@ class StructuredLogger:
                 'exception_message': str(exception),
                 'traceback': traceback.format_exc()
             })
-        self._log_structured(LogLevel.ERROR, message, **kwargs)
+        self._log_structured(LogLevel.ERROR, message, *args, **kwargs)
     
-    def critical(self, message: str, exception: Optional[Exception] = None, **kwargs):
+    def critical(self, message: str, *args, exception: Optional[Exception] = None, **kwargs):
         """重要エラーログ"""
         if exception:
             kwargs.update({
@@ -127,7 +139,7 @@ class StructuredLogger:
                 'exception_message': str(exception),
                 'traceback': traceback.format_exc()
             })
-        self._log_structured(LogLevel.CRITICAL, message, **kwargs)
+        self._log_structured(LogLevel.CRITICAL, message, *args, **kwargs)
     
     # API操作用の専用メソッド
     def api_request(
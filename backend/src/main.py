@@ -4,12 +4,15 @@ AIミステリー散歩 - メインアプリケーション
 
 from typing import Dict, Any
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from contextlib import asynccontextmanager
 import os
+import re
+import time
+import orjson
 from dotenv import load_dotenv
 
 # ローカル環境用の設定読み込み
@@ -81,20 +84,33 @@ async def lifespan(app: FastAPI):
             lazy_init_enabled=False
         )
         
-        # Firestoreの初期化
-        try:
-            await initialize_firestore()
-            logger.info("Firestore initialized successfully")
-        except Exception as e:
-            logger.warning(f"Firestore initialization failed, using local database: {e}")
-        
         # AI、POI、ルートサービスの初期化
         from .services.ai_service import ai_service
         from .services.poi_service import poi_service
         from .services.route_generation_service import route_generation_service
         
-        await ai_service.initialize()
-        await route_generation_service.initialize()
+        # Firestore・AI・ルートサービスは互いに独立しているため並行して初期化
+        import asyncio
+        init_results = await asyncio.gather(
+            initialize_firestore(),
+            ai_service.initialize(),
+            route_generation_service.initialize(),
+            return_exceptions=True
+        )
+        firestore_result, ai_result, route_result = init_results
+        
+        if isinstance(firestore_result, Exception):
+            logger.warning(f"Firestore initialization failed, using local database: {firestore_result}")
+        else:
+            logger.info("Firestore initialized successfully")
+        
+        # AI・ルートサービスの初期化失敗は従来通り起動エラーとする
+        for service_name, result in (("ai_service", ai_result), ("route_generation_service", route_result)):
+            if isinstance(result, Exception):
+                logger.error(f"{service_name} initialization failed: {result}")
+        for result in (ai_result, route_result):
+            if isinstance(result, Exception):
+                raise result
         
         print("✅ 初期化完了（従来モード）")
     
@@ -107,6 +123,15 @@ async def lifespan(app: FastAPI):
     
     # シャットダウン
     print("🛑 サーバーをシャットダウンしています...")
+    
+    # DB書き込みを失わないよう、実行中のバックグラウンド詳細化の完了を待つ
+    from .services.game_service import game_service
+    await game_service.drain_background_tasks()
+    
+    # 書き込みが終わってからローカルDBのファイル・接続を閉じる
+    from .services.database_service import database_service
+    database_service.close()
+
 # FastAPIアプリケーションの作成
 app = FastAPI(
     title="AIミステリー散歩 API",
@@ -115,38 +140,83 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Firebase Hostingからのアクセスのみ許可するドメイン
+ALLOWED_DOMAINS = (
+    "detective-anywhere-hosting.web.app",
+    "detective-anywhere-hosting.firebaseapp.com",
+    "localhost",
+    "127.0.0.1"
+)
+
+# 大文字小文字を区別せず1回の走査で判定できるよう事前コンパイル
+ALLOWED_DOMAIN_PATTERN = re.compile(
+    "|".join(re.escape(domain) for domain in ALLOWED_DOMAINS),
+    re.IGNORECASE
+)
+
+# アクセス制限の対象外とするパス
+PUBLIC_PATHS = frozenset({"/", "/health", "/warmup"})
+
+# ルートエンドポイントの応答（固定内容のため事前シリアライズ）
+ROOT_RESPONSE = {
+    "message": "AIミステリー散歩 API",
+    "version": "1.0.0",
+    "status": "running"
+}
+ROOT_RESPONSE_BYTES = orjson.dumps(ROOT_RESPONSE)
+
+# ヘルスチェック応答のキャッシュ（ロードバランサーのプローブ向け）
+HEALTH_CACHE_TTL_SECONDS = 1.0
+_health_cache: Dict[str, Any] = {"expires_at": 0.0, "body": b""}
+
+
+def _build_health_payload() -> Dict[str, Any]:
+    """ヘルスチェック応答を作成（実際のサービス接続チェックは行わない）"""
+    settings = get_settings()
+    
+    # LazyServiceManagerから状態を取得
+    from .services.lazy_service_manager import lazy_service_manager
+    service_status = lazy_service_manager.get_service_status()
+    
+    return {
+        "status": "healthy",
+        "environment": settings.environment.value,
+        "services": service_status,
+        "startup_mode": "lazy_initialization",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def _get_health_bytes() -> bytes:
+    """シリアライズ済みのヘルスチェック応答を取得（1秒ごとに更新）"""
+    now = time.monotonic()
+    if now >= _health_cache["expires_at"]:
+        _health_cache["body"] = orjson.dumps(_build_health_payload())
+        _health_cache["expires_at"] = now + HEALTH_CACHE_TTL_SECONDS
+    return _health_cache["body"]
+
+
 # Firebase Hostingからのアクセスのみ許可するミドルウェア
 @app.middleware("http")
 async def firebase_only_middleware(request: Request, call_next):
     """Firebase Hostingからのアクセスのみ許可"""
+    path = request.scope["path"]
+    
+    # ヘルスチェックとルートはルーターを経由せずに即座に応答
+    if request.method == "GET":
+        if path == "/health":
+            return Response(content=_get_health_bytes(), media_type="application/json")
+        if path == "/":
+            return Response(content=ROOT_RESPONSE_BYTES, media_type="application/json")
     
     # ヘルスチェックとルートエンドポイントは除外
-    if request.url.path in ["/", "/health", "/warmup"]:
+    if path in PUBLIC_PATHS:
         response = await call_next(request)
         return response
     
-    # 許可されたOriginをチェック
-    origin = request.headers.get("origin")
-    referer = request.headers.get("referer")
-    
-    allowed_domains = [
-        "detective-anywhere-hosting.web.app",
-        "detective-anywhere-hosting.firebaseapp.com",
-        "localhost",
-        "127.0.0.1"
-    ]
-    
-    is_allowed = False
-    if origin:
-        for domain in allowed_domains:
-            if domain in origin:
-                is_allowed = True
-                break
-    elif referer:
-        for domain in allowed_domains:
-            if domain in referer:
-                is_allowed = True
-                break
+    # 許可されたOriginをチェック（Originが無い場合はRefererで判定）
+    source = request.headers.get("origin") or request.headers.get("referer")
+    is_allowed = bool(source and ALLOWED_DOMAIN_PATTERN.search(source))
     
     if not is_allowed:
         return JSONResponse(
@@ -209,55 +279,35 @@ app.include_router(
 
 @app.get("/")
 async def root() -> Dict[str, str]:
-    """ヘルスチェックエンドポイント"""
-    return {
-        "message": "AIミステリー散歩 API",
-        "version": "1.0.0",
-        "status": "running"
-    }
+    """ヘルスチェックエンドポイント（通常はミドルウェアで応答）"""
+    return ROOT_RESPONSE
 
 
 @app.get("/health")
 async def health_check() -> Dict[str, Any]:
-    """ヘルスチェック（軽量化版）"""
-    settings = get_settings()
-    
-    # LazyServiceManagerから状態を取得
-    from .services.lazy_service_manager import lazy_service_manager
-    service_status = lazy_service_manager.get_service_status()
-    
-    # 基本的な応答のみ返す（実際のサービス接続チェックは行わない）
-    return {
-        "status": "healthy",
-        "environment": settings.environment.value,
-        "services": service_status,
-        "startup_mode": "lazy_initialization",
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    """ヘルスチェック（軽量化版・通常はミドルウェアで応答）"""
+    return _build_health_payload()
 
 
-@app.post("/warmup")
-async def warmup_services():
-    """サービスのウォームアップ（事前初期化）"""
+@app.post("/warmup", status_code=202)
+async def warmup_services(background_tasks: BackgroundTasks) -> JSONResponse:
+    """サービスのウォームアップ（事前初期化）
+    
+    初期化完了を待たずに202を返す。完了状況は /health の services で確認する。
+    """
     from .services.lazy_service_manager import lazy_service_manager
     
-    try:
-        # バックグラウンドでクリティカルサービスをウォームアップ
-        await lazy_service_manager.warmup_critical_services()
-        
-        service_status = lazy_service_manager.get_service_status()
-        return {
-            "status": "warmup_completed",
-            "services": service_status,
-            "message": "Critical services warmed up successfully"
-        }
-    except Exception as e:
-        logger.error(f"Warmup failed: {e}")
-        return {
-            "status": "warmup_partial", 
+    # バックグラウンドでクリティカルサービスをウォームアップ
+    background_tasks.add_task(lazy_service_manager.warmup_critical_services)
+    
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "warmup_scheduled",
             "services": lazy_service_manager.get_service_status(),
-            "message": f"Warmup partially failed: {str(e)}"
+            "message": "Critical services warmup scheduled"
         }
+    )
 
 
 # 静的ファイルマウント
@@ -317,10 +367,13 @@ async def internal_error_handler(request: Request, exc: Exception) -> JSONRespon
 if __name__ == "__main__":
     import uvicorn
     
-    # 開発用サーバー起動
+    # サーバー起動（uvloopイベントループとhttptools HTTPパーサーを使用）
+    # 本番環境では gunicorn -k uvicorn.workers.UvicornWorker -w $(nproc) で起動する
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        loop="uvloop",
+        http="httptools",
+        reload=settings.is_development
     )
\ No newline at end of file
@@ -7,6 +7,9 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from cachetools import TTLCache
+import asyncio
 import random
 import uuid
 from datetime import datetime
@@ -16,10 +19,32 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+# ゲームセッション保持設定（上限件数・有効期限）
+GAME_SESSION_MAX_SIZE = 10_000
+GAME_SESSION_TTL_SECONDS = 3600
+GAME_SESSION_EXPIRE_INTERVAL_SECONDS = 60
+
+
+async def _expire_game_sessions_periodically():
+    """期限切れゲームセッションを定期的に破棄"""
+    while True:
+        await asyncio.sleep(GAME_SESSION_EXPIRE_INTERVAL_SECONDS)
+        game_sessions.expire()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリケーションライフサイクル管理"""
+    expire_task = asyncio.create_task(_expire_game_sessions_periodically())
+    yield
+    expire_task.cancel()
+
+
 app = FastAPI(
     title="AIミステリー散歩 API (テスト版)",
     description="ローカルテスト用の簡略版API",
-    version="1.0.0-test"
+    version="1.0.0-test",
+    lifespan=lifespan
 )
 
 # CORS設定
@@ -122,6 +147,22 @@ MOCK_SCENARIOS = [
     }
 ]
 
+# モックシナリオのオブジェクト（固定データのため起動時に一度だけ構築）
+# 検証済みの静的データなので model_construct で検証を省略する
+PREBUILT_SCENARIOS = [
+    (
+        scenario_data,
+        Scenario.model_construct(
+            title=scenario_data["title"],
+            description=scenario_data["description"],
+            victim=Character.model_construct(**scenario_data["victim"]),
+            suspects=[Character.model_construct(**suspect) for suspect in scenario_data["suspects"]],
+            culprit=scenario_data["culprit"]
+        )
+    )
+    for scenario_data in MOCK_SCENARIOS
+]
+
 MOCK_POIS = [
     {"name": "東京タワー", "type": "landmark", "lat": 35.6586, "lng": 139.7454},
     {"name": "スターバックス 芝公園店", "type": "cafe", "lat": 35.6580, "lng": 139.7520},
@@ -132,8 +173,30 @@ MOCK_POIS = [
     {"name": "愛宕神社", "type": "landmark", "lat": 35.6603, "lng": 139.7461}
 ]
 
-# ゲームセッションストレージ（メモリ内）
-game_sessions = {}
+# エリア検証レスポンス（固定内容のため事前構築して使い回す）
+TOKYO_TOWER_LAT, TOKYO_TOWER_LNG = 35.6586, 139.7454
+
+VALID_AREA_RESPONSE = {
+    "valid": True,
+    "total_pois": len(MOCK_POIS),
+    "suitable_pois": 5,
+    "min_required_total": 5,
+    "min_required_suitable": 3,
+    "reason": "検証完了",
+    "recommendations": ["この地域でゲームを作成できます"],
+    "poi_types_available": ["landmark", "cafe", "park", "shop", "station"]
+}
+
+INVALID_AREA_RESPONSE = {
+    "valid": False,
+    "total_pois": 2,
+    "suitable_pois": 1,
+    "reason": "POIが不足しています",
+    "recommendations": ["東京タワー周辺に移動してください"]
+}
+
+# ゲームセッションストレージ（メモリ内・上限件数とTTL付き）
+game_sessions = TTLCache(maxsize=GAME_SESSION_MAX_SIZE, ttl=GAME_SESSION_TTL_SECONDS)
 
 @app.get("/")
 async def root():
@@ -189,49 +252,20 @@ async def get_nearby_pois(lat: float, lng: float, radius: int = 1000, limit: int
 @app.post("/api/v1/poi/validate-area")
 async def validate_game_area(lat: float, lng: float, radius: int = 1000):
     """ゲーム作成可能エリア検証（モック）"""
-    # 東京タワー周辺かチェック
-    tokyo_tower_lat, tokyo_tower_lng = 35.6586, 139.7454
-    distance = abs(lat - tokyo_tower_lat) + abs(lng - tokyo_tower_lng)
-    
-    if distance < 0.01:  # 大雑把に東京タワー周辺
-        return {
-            "valid": True,
-            "total_pois": len(MOCK_POIS),
-            "suitable_pois": 5,
-            "min_required_total": 5,
-            "min_required_suitable": 3,
-            "reason": "検証完了",
-            "recommendations": ["この地域でゲームを作成できます"],
-            "poi_types_available": ["landmark", "cafe", "park", "shop", "station"]
-        }
-    else:
-        return {
-            "valid": False,
-            "total_pois": 2,
-            "suitable_pois": 1,
-            "reason": "POIが不足しています",
-            "recommendations": ["東京タワー周辺に移動してください"]
-        }
+    # 東京タワー周辺かチェック（大雑把な距離判定）
+    distance = abs(lat - TOKYO_TOWER_LAT) + abs(lng - TOKYO_TOWER_LNG)
+    return VALID_AREA_RESPONSE if distance < 0.01 else INVALID_AREA_RESPONSE
 
 @app.post("/api/v1/game/start", response_model=GameStartResponse)
 async def start_game(request: GameStartRequest):
     """ゲーム開始（モック）"""
     try:
-        # ランダムにシナリオを選択
-        scenario_data = random.choice(MOCK_SCENARIOS)
+        # ランダムにシナリオを選択（構築済みオブジェクトを再利用）
+        scenario_data, scenario = random.choice(PREBUILT_SCENARIOS)
         
         # ゲームIDを生成
         game_id = str(uuid.uuid4())
         
-        # シナリオオブジェクトを作成
-        scenario = Scenario(
-            title=scenario_data["title"],
-            description=scenario_data["description"],
-            victim=Character(**scenario_data["victim"]),
-            suspects=[Character(**suspect) for suspect in scenario_data["suspects"]],
-            culprit=scenario_data["culprit"]
-        )
-        
         # 証拠を生成（POIに配置）
         evidence_list = []
         selected_pois = random.sample(MOCK_POIS, min(5, len(MOCK_POIS)))
@@ -292,7 +326,9 @@ async def start_game(request: GameStartRequest):
 @app.get("/api/v1/game/{game_id}")
 async def get_game_status(game_id: str):
     """ゲーム状態取得"""
-    if game_id not in game_sessions:
+    # 存在確認と取得の間にTTL失効しないよう1回の参照で取得
+    session = game_sessions.get(game_id)
+    if session is None:
         raise HTTPException(status_code=404, detail={
             "error": {
                 "code": "GAME_NOT_FOUND",
@@ -300,7 +336,6 @@ async def get_game_status(game_id: str):
             }
         })
     
-    session = game_sessions[game_id]
     total_evidence = len(session["evidence"])
     discovered_count = len(session["discovered_evidence"])
     
@@ -2,39 +2,781 @@
 AI サービス - Gemini APIを使用したシナリオ生成と推理判定
 """
 
-import json
 import asyncio
-import time
-from typing import List, Dict, Any, Optional
+import contextvars
+import logging
+import functools
+import random
+import re
+import secrets
+import string
+import textwrap
+import orjson
+from concurrent.futures import Executor
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Callable, Mapping, Tuple, TypeVar
+from pydantic import TypeAdapter
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from google.ai.generativelanguage_v1beta.types import content
 from ..core.logging import get_ai_logger
 
 logger = get_ai_logger(__name__)
 from shared.models.scenario import Scenario, ScenarioGenerationRequest
-from shared.models.character import Character, Temperament, CharacterReaction
+from shared.models.character import CharacterReaction
 from shared.models.evidence import Evidence, EvidenceImportance
 from shared.models.location import Location
 
 from ..config.settings import get_settings
 from ..config.secrets import get_api_key
+from .rate_limiter import RateLimiter, get_gemini_rate_limiter
+from .llm_cache import (
+    ResponseCache, RedisCacheBackend, SqliteCacheBackend, SemanticScenarioCache, build_cache_key
+)
+
+
+def _compact_prompt(text: str) -> str:
+    """プロンプトのインデント・行末空白・空行を除去（モジュール読み込み時に一度だけ実行）"""
+    lines = (line.rstrip() for line in textwrap.dedent(text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+# プロンプトの固定部分（システム指示）
+# 毎回同じ内容のため、プロンプト種別ごとのモデルにシステム指示として持たせる
+SCENARIO_SYSTEM_INSTRUCTION = _compact_prompt("""
+あなたは優秀な推理小説作家です。GPS連動のミステリーゲーム用に、論理的で魅力的な事件シナリオを作成してください。
+
+## 重要な要件
+**3つの証拠から論理的に犯人を特定できるシナリオを作成してください。**
+- 証拠1: 犯人でない容疑者を除外できる証拠
+- 証拠2: さらに別の容疑者を除外できる証拠
+- 証拠3: 残った容疑者が犯人であることを示す決定的証拠
+
+## シナリオ作成のルール
+1. 各容疑者に明確で異なる動機を設定
+2. 各容疑者のアリバイに穴や矛盾を設定（犯人は致命的な矛盾）
+3. 証拠は段階的に真相に近づくよう設計
+4. 毎回異なるシナリオを生成（ランダム要素を含める）
+5. 現実的で信憑性のある事件設定
+
+## 重要な注意事項
+1. 容疑者のうち1名が必ず真犯人
+2. temperament は必ず指定の5種類から選択
+3. 日本の法律に違反しない範囲で作成
+4. 実在する人物・団体は使用しない
+5. 過度に暴力的・グロテスクな描写は避ける
+6. プレイヤーが推理できる論理的な手がかりを含む
+""")
+
+EVIDENCE_SYSTEM_INSTRUCTION = _compact_prompt("""
+ミステリーシナリオ用に、3つの証拠で論理的に犯人を特定できる証拠を生成してください。
+
+## 重要：3つの証拠の論理構造
+1. **第1の証拠（除外証拠）**: 容疑者Aが犯人でないことを示す証拠
+   - 例：容疑者Aが事件時刻に別の場所にいたことを証明する防犯カメラ映像
+   
+2. **第2の証拠（除外証拠）**: 容疑者Bが犯人でないことを示す証拠
+   - 例：容疑者Bのアリバイを裏付ける第三者の証言記録
+
+3. **第3の証拠（決定的証拠）**: 容疑者C（真犯人）の犯行を示す証拠
+   - 例：犯人しか知りえない情報、凶器に残された痕跡、決定的な矛盾の証明
+
+## 要求
+- 証拠は3個で構成し、各証拠は異なるPOIに配置される
+- 証拠の重要度: critical(1個：決定的証拠), important(2個：除外証拠)
+- 論理的に推理可能な構成にする
+- このうち「生成する証拠」で指定された1つの証拠のみを、指定のPOIに合わせて生成する
+""")
+
+# シナリオと証拠を1回の呼び出しでまとめて生成する場合の固定部分
+SCENARIO_WITH_EVIDENCE_SYSTEM_INSTRUCTION = SCENARIO_SYSTEM_INSTRUCTION + "\n" + _compact_prompt("""
+## 証拠の同時生成
+シナリオと合わせて、3つの証拠で論理的に犯人を特定できる証拠を生成してください。
+1. **第1の証拠（除外証拠・important）**: 犯人でない容疑者1名が犯人でないことを示す証拠
+2. **第2の証拠（除外証拠・important）**: 犯人でない別の容疑者1名が犯人でないことを示す証拠
+3. **第3の証拠（決定的証拠・critical）**: 真犯人の犯行を示す証拠
+- 各証拠は「配置するPOI」のうち異なるPOIに配置し、poi_name にそのPOI名を指定する
+- 証拠はPOIの種類に合った自然なものにする
+""")
+
+DEDUCTION_SYSTEM_INSTRUCTION = _compact_prompt("""
+推理小説の結末シーンを作成してください。
+
+## 要求
+推理結果に応じた各キャラクターの反応を生成。
+""")
+
+PROMPT_SYSTEM_INSTRUCTIONS = {
+    "scenario": SCENARIO_SYSTEM_INSTRUCTION,
+    "evidence": EVIDENCE_SYSTEM_INSTRUCTION,
+    "scenario_with_evidence": SCENARIO_WITH_EVIDENCE_SYSTEM_INSTRUCTION,
+    "deduction": DEDUCTION_SYSTEM_INSTRUCTION
+}
+
+# ログ・エラーメッセージ用のプロンプト種別名
+PROMPT_KIND_LABELS = {
+    "scenario": "シナリオ生成",
+    "evidence": "証拠生成",
+    "scenario_with_evidence": "シナリオ・証拠生成",
+    "deduction": "推理判定"
+}
+
+# 構造化出力（JSONモード）のレスポンススキーマ
+# 出力形式はプロンプトではなくスキーマで指定する
+TEMPERAMENT_VALUES = ["calm", "volatile", "sarcastic", "defensive", "nervous"]
+
+# 値から列挙型メンバーを引く索引（Enum(value) の呼び出しを避ける）
+_IMPORTANCE_MAP = {i.value: i for i in EvidenceImportance}
+
+# 応答からCharacterに渡す項目（それ以外の項目は無視する）
+_CHARACTER_FIELDS = (
+    "name", "age", "occupation", "personality", "temperament", "relationship", "alibi", "motive", "background"
+)
+
+
+def _character_payload(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """応答のキャラクター情報からCharacterの項目のみを取り出す（型・必須項目の検証はモデル側）"""
+    return {field: data[field] for field in _CHARACTER_FIELDS if field in data}
+
+
+def _character_schema(role_description: str) -> Dict[str, Any]:
+    """キャラクター情報のスキーマ"""
+    return {
+        "type": "object",
+        "description": role_description,
+        "properties": {
+            "name": {"type": "string"},
+            "age": {"type": "integer"},
+            "occupation": {"type": "string"},
+            "personality": {"type": "string", "description": "性格・特徴"},
+            "temperament": {"type": "string", "enum": TEMPERAMENT_VALUES},
+            "relationship": {"type": "string", "description": "被害者・事件との関係"},
+            "alibi": {"type": "string", "nullable": True},
+            "motive": {"type": "string", "nullable": True, "description": "動機（犯人以外は薄い動機）"},
+            "background": {"type": "string", "nullable": True, "description": "背景情報"}
+        },
+        "required": ["name", "age", "occupation", "personality", "temperament", "relationship"]
+    }
+
+
+SCENARIO_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "事件のタイトル"},
+        "description": {
+            "type": "string",
+            "description": "導入文（必ず条件設定の「説明文の長さ」で作成、ドラマチック、条件設定の「詳細レベル」に従う）"
+        },
+        "victim": _character_schema("被害者（temperamentはcalm）"),
+        "suspects": {"type": "array", "items": _character_schema("容疑者")},
+        "culprit": {"type": "string", "description": "真犯人の名前（容疑者の1名）"},
+        "motive": {"type": "string", "description": "真の犯行動機"},
+        "method": {"type": "string", "description": "犯行手口"},
+        "timeline": {"type": "array", "items": {"type": "string"}},
+        "theme": {
+            "type": "string",
+            "enum": ["human_drama", "time_complex", "misdirection", "psychological", "classic"]
+        },
+        "difficulty_factors": {"type": "array", "items": {"type": "string"}},
+        "red_herrings": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["title", "description", "victim", "suspects", "culprit", "motive", "method", "timeline"]
+}
+
+EVIDENCE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string", "description": "証拠名"},
+        "description": {"type": "string", "description": "証拠の詳細説明"},
+        "discovery_text": {"type": "string", "description": "発見時のドラマチックな描写"},
+        "related_character": {"type": "string", "nullable": True},
+        "clue_text": {"type": "string", "nullable": True, "description": "次のヒント"}
+    },
+    "required": ["name", "description", "discovery_text"]
+}
+
+SCENARIO_WITH_EVIDENCE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scenario": SCENARIO_RESPONSE_SCHEMA,
+        "evidence": {
+            "type": "array",
+            "items": {
+                **EVIDENCE_RESPONSE_SCHEMA,
+                "properties": {
+                    **EVIDENCE_RESPONSE_SCHEMA["properties"],
+                    "poi_name": {"type": "string", "description": "配置先のPOI名"},
+                    "importance": {"type": "string", "enum": ["critical", "important"]}
+                },
+                "required": [*EVIDENCE_RESPONSE_SCHEMA["required"], "poi_name", "importance"]
+            }
+        }
+    },
+    "required": ["scenario", "evidence"]
+}
+
+DEDUCTION_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reactions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "character_name": {"type": "string"},
+                    "reaction": {"type": "string", "description": "反応テキスト（気質に応じて）"},
+                    "reaction_type": {"type": "string", "enum": ["confession", "denial", "surprise", "praise"]},
+                    "emotion_intensity": {"type": "number", "description": "0.0〜1.0"}
+                },
+                "required": ["character_name", "reaction", "reaction_type", "emotion_intensity"]
+            }
+        }
+    },
+    "required": ["reactions"]
+}
+
+PROMPT_RESPONSE_SCHEMAS = {
+    "scenario": SCENARIO_RESPONSE_SCHEMA,
+    "evidence": EVIDENCE_RESPONSE_SCHEMA,
+    "scenario_with_evidence": SCENARIO_WITH_EVIDENCE_RESPONSE_SCHEMA,
+    "deduction": DEDUCTION_RESPONSE_SCHEMA
+}
+
+_SCHEMA_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool
+}
+
+
+# 待てば回復し得るAPIエラー（これ以外のAPIエラーはリトライしない）
+_RETRYABLE_API_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded
+)
+
+# 応答内容の不正（JSONパース・スキーマ検証・変換の失敗）は1回だけ再生成する
+MAX_OUTPUT_ERROR_RETRIES = 1
+
+# 安全フィルタ等で生成が止められたことを示す終了理由（同じプロンプトでは結果が変わらない）
+_BLOCKED_FINISH_REASONS = frozenset({"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"})
+
+# 出力トークン上限で途切れた応答を再生成する際の上限値
+MAX_OUTPUT_TOKENS_LIMIT = 8192
+
+
+class GeminiResponseBlocked(RuntimeError):
+    """プロンプトまたは応答が安全フィルタ等でブロックされた（リトライしない）"""
+
+
+class GeminiResponseTruncated(ValueError):
+    """応答が出力トークン上限で途切れた（上限を引き上げて再生成する）"""
+
+
+def _raise_for_incomplete_response(response: Any) -> None:
+    """応答の終了理由を確認し、ブロック・途切れの場合はパース前に例外を送出"""
+    block_reason = getattr(getattr(response, "prompt_feedback", None), "block_reason", None)
+    if block_reason:
+        raise GeminiResponseBlocked(f"プロンプトがブロックされました: {getattr(block_reason, 'name', block_reason)}")
+    
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return
+    finish_reason = getattr(candidates[0].finish_reason, "name", None)
+    if finish_reason in _BLOCKED_FINISH_REASONS:
+        raise GeminiResponseBlocked(f"応答がブロックされました: {finish_reason}")
+    if finish_reason == "MAX_TOKENS":
+        raise GeminiResponseTruncated("応答が出力トークン上限で途切れました")
+
+
+def _compile_schema_validator(schema: Mapping[str, Any], path: str = "$") -> Callable[[Any], None]:
+    """応答スキーマから検証関数を作成（スキーマの走査は作成時の1回のみ）
+    
+    構造が合わない場合は ValueError を送出し、リトライ対象とする。
+    """
+    expected_type = _SCHEMA_TYPES[schema["type"]]
+    nullable = schema.get("nullable", False)
+    enum = frozenset(schema["enum"]) if "enum" in schema else None
+    required = tuple(schema.get("required", ()))
+    properties = {
+        name: _compile_schema_validator(sub_schema, f"{path}.{name}")
+        for name, sub_schema in schema.get("properties", {}).items()
+    }
+    items = _compile_schema_validator(schema["items"], f"{path}[]") if "items" in schema else None
+    
+    def validate(value: Any) -> None:
+        if value is None and nullable:
+            return
+        if not isinstance(value, expected_type) or (expected_type is not bool and isinstance(value, bool)):
+            raise ValueError(f"{path}: {schema['type']} が必要です")
+        if enum is not None and value not in enum:
+            raise ValueError(f"{path}: 想定外の値 {value!r}")
+        if properties or required:
+            for name in required:
+                if name not in value:
+                    raise ValueError(f"{path}.{name}: 必須項目がありません")
+            for name, validate_property in properties.items():
+                if name in value:
+                    validate_property(value[name])
+        if items is not None:
+            for item in value:
+                items(item)
+    
+    return validate
+
+
+# 応答JSONの構造検証（Scenario/Evidence 構築前に検出してリトライする）
+_RESPONSE_VALIDATORS = MappingProxyType({
+    kind: _compile_schema_validator(schema) for kind, schema in PROMPT_RESPONSE_SCHEMAS.items()
+})
+
+# 難易度ごとのシナリオ生成条件（変更不可）
+DIFFICULTY_SETTINGS = MappingProxyType({
+    "easy": MappingProxyType({
+        "suspects": 3, 
+        "complexity": "シンプル", 
+        "red_herrings": "少なめ",
+        "description_length": "200-400文字",
+        "detail_level": "基本的な情報と簡潔な背景説明"
+    }),
+    "normal": MappingProxyType({
+        "suspects": 4, 
+        "complexity": "適度", 
+        "red_herrings": "適度",
+        "description_length": "400-600文字",
+        "detail_level": "詳細な背景情報と人間関係を含む"
+    }),
+    "hard": MappingProxyType({
+        "suspects": 6, 
+        "complexity": "複雑", 
+        "red_herrings": "多め",
+        "description_length": "600-1000文字",
+        "detail_level": "非常に詳細な人間関係、複雑な背景設定、複数の伏線を含む"
+    })
+})
+
+# プロンプトの可変部分のテンプレート（固定部分は各 *_SYSTEM_INSTRUCTION 側）
+_SCENARIO_CONDITIONS = _compact_prompt("""
+## 条件設定
+- 難易度: $difficulty
+- 場所: $location
+- 利用可能なPOI: $poi_types
+- 容疑者数: $suspects名（必ず3名）
+- 複雑さ: $complexity
+- ミスリード要素: $red_herrings
+- 説明文の長さ: **$description_length**
+- 詳細レベル: $detail_level
+
+**最重要: 難易度${difficulty}に応じて、説明文を必ず${description_length}の範囲で作成し、${detail_level}**
+""")
+
+_SCENARIO_PROMPT_TPL = string.Template(_SCENARIO_CONDITIONS + "\nシナリオを生成してください。")
+
+_SCENARIO_WITH_EVIDENCE_PROMPT_TPL = string.Template(_SCENARIO_CONDITIONS + "\n" + _compact_prompt("""
+## 配置するPOI
+$poi_json
+シナリオと3つの証拠を生成してください。
+"""))
+
+_EVIDENCE_PROMPT_TPL = string.Template(_compact_prompt("""
+## シナリオ情報
+タイトル: $title
+犯人: $culprit
+犯行動機: $motive
+犯行手口: $method
+
+## 容疑者情報
+$suspects_json
+
+## 配置するPOI
+$poi_json
+
+## 生成する証拠
+$role
+重要度: $importance
+
+証拠を1つ生成してください。
+"""))
+
+_DEDUCTION_PROMPT_TPL = string.Template(_compact_prompt("""
+## シナリオ
+タイトル: $title
+真犯人: $culprit
+犯行動機: $motive
+
+## プレイヤーの推理
+推理した犯人: $suspect_name
+正解: $verdict
+
+## キャラクター情報
+$characters_json
+
+キャラクター反応を生成してください。
+"""))
+
+_ENHANCEMENT_PROMPT_TPL = string.Template(_compact_prompt("""
+以下の基本シナリオを詳細化してください。
+
+## 基本シナリオ
+タイトル: $title
+説明: $description
+被害者: $victim
+容疑者: $suspects
+真犯人: $culprit
+
+## 詳細化要求
+- 各キャラクターの背景を詳細化
+- 複雑な人間関係を追加
+- 動機を深掘り
+- ミスリード要素を追加
+- 推理要素を強化
+
+## 出力形式（JSON）
+基本シナリオの全フィールドを含め、以下を詳細化：
+- description: 400-800文字に拡張
+- 各キャラクターのbackground, motive を詳細化
+- difficulty_factors と red_herrings を追加
+- timeline を詳細化
+
+詳細化されたシナリオを生成してください。
+"""))
+
+# 軽量シナリオ生成プロンプトの固定部分
+# 毎回同じ内容を先頭に置き、Geminiのプレフィックス（暗黙）キャッシュを効かせる
+_LIGHTWEIGHT_SCENARIO_PROMPT_PREFIX = _compact_prompt("""
+推理ゲーム用のミステリー事件シナリオをJSON形式で作成してください。
+場所・難易度・テーマ・容疑者数・文字数は末尾の「条件」に従ってください。
+
+【厳守事項】:
+- descriptionは条件で指定した文字数で記述（最低文字数未満は不可）
+- 短い文章は絶対禁止 - 「○○事件。証拠を集めて推理を進めよう」のような短文は不可
+- 毎回異なるユニークなシナリオ生成
+- 具体的で詳細な事件描写が必要
+- 容疑者は必ず条件で指定した人数分生成
+- temperamentは calm|volatile|sarcastic|defensive|nervous から選択必須
+
+JSON出力:
+{
+  "title": "ユニークな事件タイトル（10-15文字）",
+  "description": "条件の場所で起きた、条件のテーマに関連する事件の詳細な描写。被害者の状況、事件の経緯、現場の様子、不可解な謎、関係者の動き、時系列などを含む魅力的で引き込まれる事件説明。「証拠を集めて推理を進めよう」のような短い文ではなく、具体的で詳細な事件ストーリーを条件の文字数で記述。",
+  "victim": {
+    "name": "被害者名",
+    "age": 年齢,
+    "occupation": "職業",
+    "personality": "性格",
+    "temperament": "calm",
+    "relationship": "被害者",
+    "alibi": ""
+  },
+  "suspects": [
+    {
+      "name": "容疑者名",
+      "age": 年齢,
+      "occupation": "職業",
+      "personality": "性格",
+      "temperament": "条件で指定したtemperament",
+      "relationship": "テーマに関連する関係",
+      "alibi": "具体的アリバイ",
+      "motive": null,
+      "background": null
+    }
+  ],
+  "culprit": "容疑者1人目の名前",
+  "motive": "具体的な動機",
+  "method": "手口",
+  "timeline": ["時系列"],
+  "theme": "human_drama",
+  "difficulty_factors": [],
+  "red_herrings": []
+}
+""") + "\n"
+
+# 軽量シナリオの難易度別の説明文の長さ（範囲, 最低文字数）
+LIGHTWEIGHT_DESCRIPTION_LENGTHS = MappingProxyType({
+    "easy": ("120-200文字", "120"),
+    "normal": ("200-350文字", "200"),
+    "hard": ("350-500文字", "350")
+})
+
+# 軽量シナリオのバリエーション
+_LIGHTWEIGHT_THEMES = ("人間関係", "金銭問題", "秘密", "裏切り")
+_LIGHTWEIGHT_CRIMES = ("失踪", "盗難", "詐欺", "恐喝")
+
+# 容疑者ごとに順番に割り当てるtemperament（人数ごとの列挙文字列を事前作成）
+_LIGHTWEIGHT_TEMPERAMENTS = ("nervous", "volatile", "sarcastic", "defensive", "calm")
+_SUSPECT_TEMPERAMENTS_BY_COUNT = MappingProxyType({
+    count: ", ".join(_LIGHTWEIGHT_TEMPERAMENTS[i % len(_LIGHTWEIGHT_TEMPERAMENTS)] for i in range(count))
+    for count in range(1, 11)
+})
+
+
+def _suspect_temperaments(count: int) -> str:
+    """容疑者数に応じたtemperamentの列挙文字列"""
+    cached = _SUSPECT_TEMPERAMENTS_BY_COUNT.get(count)
+    if cached is not None:
+        return cached
+    return ", ".join(_LIGHTWEIGHT_TEMPERAMENTS[i % len(_LIGHTWEIGHT_TEMPERAMENTS)] for i in range(count))
+
+
+# 軽量シナリオ生成プロンプトの可変部分（毎回変わる値はすべてここに置く）
+_LIGHTWEIGHT_SCENARIO_PROMPT_TPL = string.Template(_compact_prompt("""
+## 条件
+- 場所: $location
+- 難易度: $difficulty
+- テーマ: ${theme}を背景とした${crime}事件
+- 容疑者数: ${suspects}人（temperamentは順に $suspect_temperaments）
+- description文字数: 必ず${description_length}（最低でも${min_length}文字以上）
+【最重要】description は必ず${description_length}で詳細に記述してください
+ユニーク性のためのID: $unique_id
+"""))
+
+# 高速モックシナリオ（APIキーなし・フォールバック用）の素材
+_FAST_MOCK_TITLES = ("突然の失踪", "謎の訪問者", "消えた証拠", "偽りの証言")
+_FAST_MOCK_OCCUPATIONS = ("会社員", "店主", "学生", "主婦", "フリーランサー")
+_FAST_MOCK_SUSPECT_NAMES = (
+    "佐藤花子", "田中一郎", "鈴木次郎", "高橋美咲", "渡辺健太",
+    "伊藤良子", "山田浩二", "中村真理", "小林隆史", "加藤恵美"
+)
+_FAST_MOCK_PERSONALITIES = ("社交的だが秘密主義", "無口で頑固", "神経質で疑い深い", "明るく積極的")
+_FAST_MOCK_TEMPERAMENTS = ("nervous", "volatile", "defensive", "calm")
+_FAST_MOCK_RELATIONSHIPS = ("知人", "同僚", "近隣住民", "関係者")
+_FAST_MOCK_ALIBIS = ("仕事をしていました", "家にいました", "買い物に出ていました", "友人と会っていました")
+
+FAST_MOCK_MIN_SUSPECTS = 3
+FAST_MOCK_MAX_SUSPECTS = len(_FAST_MOCK_SUSPECT_NAMES)
+FAST_MOCK_VARIANTS_PER_COUNT = 8
+
+
+def _build_fast_mock_scenarios() -> Dict[int, tuple]:
+    """容疑者数ごとの高速モックシナリオを事前生成（場所に依存する説明文は呼び出し時に設定）"""
+    rng = random.Random(0)
+    scenarios = {}
+    for suspect_count in range(FAST_MOCK_MIN_SUSPECTS, FAST_MOCK_MAX_SUSPECTS + 1):
+        variants = []
+        for _ in range(FAST_MOCK_VARIANTS_PER_COUNT):
+            suspects = [
+                {
+                    "name": name,
+                    "age": rng.randint(25, 60),
+                    "occupation": rng.choice(_FAST_MOCK_OCCUPATIONS),
+                    "personality": rng.choice(_FAST_MOCK_PERSONALITIES),
+                    "temperament": rng.choice(_FAST_MOCK_TEMPERAMENTS),
+                    "relationship": rng.choice(_FAST_MOCK_RELATIONSHIPS),
+                    "alibi": rng.choice(_FAST_MOCK_ALIBIS),
+                    "motive": None,
+                    "background": None
+                }
+                for name in rng.sample(_FAST_MOCK_SUSPECT_NAMES, suspect_count)
+            ]
+            variants.append({
+                "title": rng.choice(_FAST_MOCK_TITLES),
+                "victim": {
+                    "name": "山田太郎",
+                    "age": rng.randint(25, 60),
+                    "occupation": rng.choice(_FAST_MOCK_OCCUPATIONS),
+                    "personality": "真面目で責任感が強い",
+                    "temperament": "calm",
+                    "relationship": "被害者",
+                    "alibi": ""
+                },
+                "suspects": suspects,
+                "culprit": suspects[0]["name"],  # 最初の容疑者を犯人に設定
+                "motive": "金銭トラブル",
+                "method": "計画的犯行",
+                "timeline": ["事件発生前の異変"],
+                "theme": "human_drama"
+            })
+        scenarios[suspect_count] = tuple(variants)
+    return scenarios
+
+
+_FAST_MOCK_SCENARIOS = MappingProxyType(_build_fast_mock_scenarios())
+
+# ランダムモックシナリオ（APIキーなし時）のテンプレート
+_RANDOM_SCENARIO_TEMPLATES = (
+    {
+        "title": "深夜のカフェ殺人事件",
+        "victim": {"name": "木村太郎", "age": 42, "occupation": "カフェオーナー"},
+        "location": "深夜営業のカフェ",
+        "time": "午後11時",
+        "method": "毒殺",
+        "culprit_index": 0
+    },
+    {
+        "title": "公園の謎の失踪事件",
+        "victim": {"name": "高橋美咲", "age": 28, "occupation": "ジョガー"},
+        "location": "早朝の公園",
+        "time": "午前5時",
+        "method": "突き落とし",
+        "culprit_index": 1
+    },
+    {
+        "title": "商店街の密室殺人",
+        "victim": {"name": "渡辺次郎", "age": 55, "occupation": "商店主"},
+        "location": "閉店後の商店",
+        "time": "午後9時",
+        "method": "絞殺",
+        "culprit_index": 2
+    },
+    {
+        "title": "オフィスビルの転落事件",
+        "victim": {"name": "斉藤花子", "age": 35, "occupation": "会社員"},
+        "location": "オフィスビルの屋上",
+        "time": "午後7時",
+        "method": "転落",
+        "culprit_index": 0
+    },
+    {
+        "title": "駐車場の襲撃事件",
+        "victim": {"name": "伊藤健一", "age": 48, "occupation": "タクシー運転手"},
+        "location": "地下駐車場",
+        "time": "午前2時",
+        "method": "鈍器による殴打",
+        "culprit_index": 1
+    }
+)
+
+_RANDOM_SUSPECT_TEMPLATES = (
+    {"name": "山田太郎", "age": 30, "occupation": "会社員", "personality": "神経質で短気"},
+    {"name": "佐藤花子", "age": 25, "occupation": "パート店員", "personality": "表面上は明るいが計算高い"},
+    {"name": "鈴木一郎", "age": 40, "occupation": "自営業", "personality": "プライドが高く頑固"},
+    {"name": "田中美咲", "age": 35, "occupation": "主婦", "personality": "嫉妬深く執念深い"},
+    {"name": "高橋健太", "age": 28, "occupation": "フリーター", "personality": "怠惰だが賢い"},
+    {"name": "渡辺真理", "age": 45, "occupation": "教師", "personality": "厳格で融通が利かない"},
+    {"name": "伊藤次郎", "age": 50, "occupation": "警備員", "personality": "無口で観察力が鋭い"},
+    {"name": "斉藤美香", "age": 32, "occupation": "看護師", "personality": "献身的だが秘密主義"}
+)
+
+_RANDOM_MOTIVES = (
+    "金銭トラブルで恨みを持っていた",
+    "不倫関係が暴露されることを恐れた",
+    "過去の秘密を握られていた",
+    "仕事上の対立があった",
+    "嫉妬と怒りが爆発した",
+    "復讐のため計画的に実行した"
+)
+
+_RANDOM_TEMPERAMENTS = ("calm", "nervous", "defensive")
+_RANDOM_RELATIONSHIPS = ("同僚", "近隣住民", "知人", "取引相手")
+
+# モック証拠（APIキーなし時）と、POIが足りない場合の配置先名
+_MOCK_EVIDENCE = (
+    (MappingProxyType({
+        "name": "血痕の付いた花瓶",
+        "description": "コミュニティセンター会議室の床に落ちていた陶製の花瓶。被害者の血液と複数人の指紋が付着している。",
+        "discovery_text": "会議室の床に散らばった花瓶の破片を発見した。底の部分に血痕があり、持ち手部分には複数の指紋が確認できる。田中、佐藤、鈴木の指紋が全て検出された...",
+        "importance": "critical",
+        "related_character": "全容疑者",
+        "clue_text": "全員の指紋があるため、まだ犯人を特定できない"
+    }), "近所の公園"),
+    (MappingProxyType({
+        "name": "破れた騒音苦情書",
+        "description": "ゴミ箱から発見された、田中直筆の騒音苦情書。山田に対する強い怒りの言葉が書かれ、最後に「もう我慢の限界だ」と記されている。",
+        "discovery_text": "ゴミ箱の中から破り捨てられた苦情書を発見した。田中の直筆で書かれており、山田への激しい怒りと「今夜話し合いに行く」という予告が記されている...",
+        "importance": "important",
+        "related_character": "田中太郎",
+        "clue_text": "田中が事件当夜に山田と会う予定だったことを示す"
+    }), "ニュータウン広場"),
+    (MappingProxyType({
+        "name": "防犯カメラの映像",
+        "description": "会議終了後の映像記録。佐藤と鈴木は8時45分に帰宅、田中のみ9時まで残り、その後会議室へ向かう姿が記録されている。",
+        "discovery_text": "防犯カメラの映像を詳しく分析すると、他の参加者は早めに帰宅しているが、田中だけが最後まで残り、一人で会議室に向かっている決定的な瞬間が記録されていた...",
+        "importance": "critical",
+        "related_character": "田中太郎",
+        "clue_text": "他の容疑者にはアリバイがあり、田中のみが犯行可能時間に現場にいた"
+    }), "港北ニュータウン駅")
+)
+
+# キャッシュ済みJSONからパースとモデル構築を1回で行う検証器（作成はプロセスで1回のみ）
+_EVIDENCE_LIST_ADAPTER = TypeAdapter(List[Evidence])
+_REACTION_LIST_ADAPTER = TypeAdapter(List[CharacterReaction])
+
+# 応答からJSONオブジェクトを1回の走査で抽出（コードブロック内を優先、なければ最初の{から最後の}まで）
+_JSON_BLOCK_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```|(\{.*\})", re.DOTALL)
+
+# この文字数を超えるJSON応答はスレッドでパースしてイベントループを塞がない
+JSON_PARSE_THREAD_THRESHOLD = 16 * 1024
+
+# 軽量シナリオ生成用の高速モデルと生成設定（レスポンス速度重視）
+FAST_MODEL_NAME = "gemini-1.5-flash"
+FAST_GENERATION_CONFIG = MappingProxyType({
+    "temperature": 0.5,  # より低い温度で安定性向上
+    "max_output_tokens": 2000,  # 適度に制限
+    "top_p": 0.8,
+    "top_k": 20,  # 選択肢を絞って高速化
+    "candidate_count": 1
+})
+
+# 投機的な並行生成の各呼び出しの生成温度（多様な応答と安定した応答を並行して試す）
+SPECULATIVE_TEMPERATURES = (0.8, 0.6)
+
+# 意味的キャッシュ用の埋め込みモデル
+EMBEDDING_MODEL_NAME = "models/text-embedding-004"
+
+T = TypeVar("T")
+
+
+def _normalize_location_context(location_context: Optional[str]) -> str:
+    """プロンプト・キャッシュキー用に場所情報を正規化"""
+    if not location_context or location_context == "不明な地域の情報です。":
+        location_context = "都市部の商業地域"
+    return location_context.rstrip('。')
+
+
+def extract_json_text(response: str) -> str:
+    """Gemini APIのレスポンスからJSONオブジェクト部分を抽出（コードブロック・前後の文章を除去）"""
+    # JSONのみの応答（大半のケース）は正規表現を通さずに返す
+    stripped = response.strip()
+    if stripped[:1] == "{" and stripped[-1:] == "}":
+        return stripped
+    
+    match = _JSON_BLOCK_PATTERN.search(stripped)
+    if match is None:
+        return stripped
+    return match.group(1) or match.group(2)
+
+
+# genai.configure は呼ぶたびに内部クライアント（接続）を破棄するため、
+# APIキーが変わった場合のみ再設定してプロセス内で接続を使い回す
+_configured_api_key: Optional[str] = None
+
+
+def _configure_genai(api_key: str) -> None:
+    """Gemini APIクライアントを設定（同じAPIキーでは再設定しない）"""
+    global _configured_api_key
+    if api_key == _configured_api_key:
+        return
+    genai.configure(api_key=api_key)
+    _configured_api_key = api_key
+
+
+async def _to_thread_fast(executor: Optional[Executor], func, *args, **kwargs):
+    """asyncio.to_thread と同等だが、コンテキスト変数が空の場合はコピー実行を省略"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    if not ctx:
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, func, *args, **kwargs))
 
 
 class AIService:
     """AI サービス（Gemini）"""
     
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None):
+        api_settings = get_settings().api
         self.model = None
         self.gemini_api_key = get_api_key("gemini")
         
-        # Gemini API初期化
-        if self.gemini_api_key:
-            genai.configure(api_key=self.gemini_api_key)
-            logger.info("Gemini API configured successfully")
-        else:
+        # Gemini APIの設定は initialize() で一度だけ行う
+        if not self.gemini_api_key:
             logger.warning("Gemini API key not found - using fallback mode")
         
-        self.model_name = get_settings().api.gemini_model if hasattr(get_settings().api, 'gemini_model') else 'gemini-1.5-pro'
+        self.model_name = getattr(api_settings, 'gemini_model', 'gemini-1.5-pro')
         self.generation_config = {
             "temperature": 0.8,
             "top_p": 0.9,
@@ -60,26 +802,88 @@ class AIService:
             }
         ]
         
-        # レート制限とリトライ設定
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # 1秒間隔
-        self.max_retries = get_settings().api.max_scenario_generation_retries if hasattr(get_settings().api, 'max_scenario_generation_retries') else 3
-        self.retry_delay = 2.0  # 2秒  # 2秒
+        # レート制限（RPM・TPM）はAPIキー単位のため全インスタンスで共有
+        self._rate_limiter = rate_limiter or get_gemini_rate_limiter()
+        # Gemini APIの同時呼び出し数の上限とストリーミング受信
+        self._concurrency = asyncio.Semaphore(api_settings.gemini_max_concurrent)
+        self._streaming_enabled = api_settings.gemini_streaming_enabled
+        # 応答が返らない呼び出しでリトライループが止まらないようにする
+        self.api_timeout = api_settings.gemini_api_timeout_seconds
+        # シナリオ生成の投機的な並行呼び出し（遅いインスタンス・応答不正へのヘッジ）
+        self._speculative_enabled = api_settings.gemini_speculative_generation_enabled
+        
+        # プロンプト種別ごとのモデル（固定部分はシステム指示で保持）
+        self._default_model: Optional[genai.GenerativeModel] = None
+        self._fast_model: Optional[genai.GenerativeModel] = None
+        self._prompt_models: Dict[str, genai.GenerativeModel] = {}
+        
+        # 同一リクエストに対する応答キャッシュ
+        self._response_cache: Optional[ResponseCache] = None
+        self._response_cache_mode = api_settings.ai_response_cache_mode
+        if api_settings.ai_response_cache_enabled:
+            backend = None
+            if api_settings.ai_response_cache_backend == "redis" and api_settings.ai_response_cache_redis_url:
+                backend = RedisCacheBackend(
+                    api_settings.ai_response_cache_redis_url,
+                    ttl_seconds=api_settings.ai_response_cache_ttl_seconds
+                )
+            elif api_settings.ai_response_cache_backend == "sqlite":
+                backend = SqliteCacheBackend(
+                    api_settings.ai_response_cache_path,
+                    max_size=api_settings.ai_response_cache_max_size,
+                    ttl_seconds=api_settings.ai_response_cache_ttl_seconds
+                )
+            self._response_cache = ResponseCache(
+                max_size=api_settings.ai_response_cache_max_size,
+                ttl_seconds=api_settings.ai_response_cache_ttl_seconds,
+                backend=backend
+            )
+            # exactモードは temperature=0 の生成のみ保存するため、該当する生成設定がなければ何もキャッシュされない
+            if self._response_cache_mode == "exact" and all(
+                config["temperature"] != 0 for config in (self.generation_config, FAST_GENERATION_CONFIG)
+            ):
+                logger.warning(
+                    "AI response cache is enabled in exact mode, but no generation config uses temperature 0 "
+                    "- nothing will be cached (set AI_RESPONSE_CACHE_MODE=loose to cache anyway)"
+                )
+        
+        # 言い換えられた場所情報に対する意味的キャッシュ（埋め込みにAPIキーが必要）
+        self._semantic_cache: Optional[SemanticScenarioCache] = None
+        if self._response_cache is not None and api_settings.semantic_cache_enabled and self.gemini_api_key:
+            self._semantic_cache = SemanticScenarioCache(
+                self._embed_text,
+                threshold=api_settings.semantic_cache_threshold,
+                max_entries=api_settings.semantic_cache_max_entries,
+                ttl_seconds=api_settings.semantic_cache_ttl_seconds
+            )
+        
+        # 生成中の軽量シナリオ（同一キャッシュキーの同時リクエストは1回の生成を共有）
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # モック生成・ジッター用の乱数生成器（インスタンスごとに保持）
+        self._rng = random.Random()
+        
+        self.max_retries = getattr(api_settings, 'max_scenario_generation_retries', 3)
+        # 推理判定のタイムアウト（呼び出しごとに設定を引かない）
+        self._judge_timeout = getattr(api_settings, 'scenario_generation_timeout', 30)
+        # リトライ間隔（フルジッター付き指数バックオフ）
+        self._backoff_base = api_settings.gemini_retry_backoff_base_seconds
+        self._backoff_cap = api_settings.gemini_retry_backoff_cap_seconds
     
     async def initialize(self) -> None:
         """AIサービスの初期化"""
         try:
-            gemini_api_key = get_api_key('gemini')
+            # コンストラクタで取得済みのAPIキーを再利用（Secret Managerへの再問い合わせを避ける）
+            gemini_api_key = self.gemini_api_key or get_api_key('gemini')
             if not gemini_api_key:
                 logger.error("Gemini API key取得失敗 - Secret ManagerまたはCloud Run環境変数を確認してください")
                 raise RuntimeError("Gemini API keyが設定されていません")
             
-            logger.info(f"Gemini API key取得成功 (長さ: {len(gemini_api_key)})")
-            genai.configure(api_key=gemini_api_key)
+            logger.info("Gemini API key取得成功 (長さ: %d)", len(gemini_api_key))
+            _configure_genai(gemini_api_key)
             
-            settings = get_settings()
-            model_name = getattr(settings.api, 'gemini_model', 'gemini-1.5-flash')
-            logger.info(f"Gemini model設定: {model_name}")
+            model_name = getattr(get_settings().api, 'gemini_model', 'gemini-1.5-flash')
+            logger.info("Gemini model設定: %s", model_name)
             
             self.model = genai.GenerativeModel(
                 model_name=model_name,
@@ -90,104 +894,520 @@ class AIService:
             # APIキーをインスタンス変数にも設定（重複初期化の解決）
             self.gemini_api_key = gemini_api_key
             
+            # プロンプト種別ごとのモデルを作成
+            self._setup_prompt_models()
+            
             logger.info("AI Service初期化完了")
             
         except Exception as e:
-            logger.error(f"AI Service初期化エラー: {e}")
+            logger.error("AI Service初期化エラー: %s", e)
             raise RuntimeError(f"AI Service初期化に失敗しました: {str(e)}")
     
-    async def _call_gemini_api(self, prompt: str) -> str:
-        """Gemini APIを呼び出してレスポンスを取得"""
-        import google.generativeai as genai
-        
-        genai.configure(api_key=self.gemini_api_key)
-        model = genai.GenerativeModel(
+    def _structured_generation_config(self, prompt_kind: str) -> Dict[str, Any]:
+        """JSONモード（スキーマ指定）の生成設定"""
+        return {
+            **self.generation_config,
+            "response_mime_type": "application/json",
+            "response_schema": PROMPT_RESPONSE_SCHEMAS[prompt_kind]
+        }
+    
+    def _build_prompt_model(self, prompt_kind: str) -> genai.GenerativeModel:
+        """固定部分をシステム指示として持つモデルを作成"""
+        return genai.GenerativeModel(
             model_name=self.model_name,
-            generation_config=self.generation_config,
-            safety_settings=self.safety_settings
+            generation_config=self._structured_generation_config(prompt_kind),
+            safety_settings=self.safety_settings,
+            system_instruction=PROMPT_SYSTEM_INSTRUCTIONS[prompt_kind]
         )
+    
+    def _get_prompt_model(self, prompt_kind: str) -> genai.GenerativeModel:
+        """プロンプト種別に対応するモデルを取得"""
+        model = self._prompt_models.get(prompt_kind)
+        if model is None:
+            model = self._build_prompt_model(prompt_kind)
+            self._prompt_models[prompt_kind] = model
+        return model
+    
+    def _get_default_model(self) -> genai.GenerativeModel:
+        """システム指示・スキーマなしの汎用モデルを取得（初回のみ作成）"""
+        if self._default_model is None:
+            self._default_model = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config=self.generation_config,
+                safety_settings=self.safety_settings
+            )
+        return self._default_model
+    
+    def _setup_prompt_models(self) -> None:
+        """プロンプト種別ごとに、固定部分をシステム指示として持つモデルを作成
+        
+        現在の固定部分はGeminiのコンテキストキャッシュの最小トークン数（4096）に届かず、
+        キャッシュを作成できないため、システム指示付きのモデルのみを使う。
+        """
+        for prompt_kind in PROMPT_SYSTEM_INSTRUCTIONS:
+            self._prompt_models[prompt_kind] = self._build_prompt_model(prompt_kind)
+    
+    async def _generate_text(
+        self,
+        model: genai.GenerativeModel,
+        prompt: str,
+        stop_on_complete_json: bool = False,
+        generation_config: Optional[Mapping[str, Any]] = None
+    ) -> str:
+        """Gemini APIで生成してテキストを取得
+        
+        ストリーミング有効時は生成完了を待たずにチャンク単位で受信して連結する。
+        stop_on_complete_json を指定すると、JSONオブジェクトが閉じてパースできた時点で
+        残り（コードブロック終端など）を待たずに受信を打ち切る。
+        ブロック・途切れた応答は終了理由で判定し、パースを試みずに例外とする。
+        """
+        async with self._concurrency:
+            if not self._streaming_enabled:
+                response = await model.generate_content_async(prompt, generation_config=generation_config)
+                _raise_for_incomplete_response(response)
+                return response.text
+            
+            response = await model.generate_content_async(prompt, stream=True, generation_config=generation_config)
+            chunks = []
+            depth = 0
+            json_start = -1
+            received = 0
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # テキストを含まないチャンク（終了理由のみ等）
+                    continue
+                chunks.append(text)
+                
+                if not stop_on_complete_json:
+                    continue
+                if json_start < 0 and "{" in text:
+                    json_start = received + text.index("{")
+                received += len(text)
+                # 文字列中の括弧も数えるため、閉じたと判断した時点で実際にパースして確認
+                depth += text.count("{") - text.count("}")
+                if json_start >= 0 and depth <= 0:
+                    joined = "".join(chunks)
+                    candidate = joined[json_start:joined.rindex("}") + 1]
+                    try:
+                        orjson.loads(candidate)
+                    except orjson.JSONDecodeError:
+                        continue
+                    return candidate
+            _raise_for_incomplete_response(response)
+            return "".join(chunks)
+    
+    async def _call_gemini_api(
+        self,
+        prompt: str,
+        prompt_kind: Optional[str] = None,
+        max_output_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> str:
+        """Gemini APIを呼び出してレスポンスを取得
+        
+        prompt_kind を指定した場合は固定部分をシステム指示として持つモデルを使い、
+        prompt には可変部分のみを渡す。応答はスキーマに沿ったJSONになる。
+        max_output_tokens・temperature を指定した場合はその呼び出しのみ生成設定を上書きする。
+        """
+        model = self._get_prompt_model(prompt_kind) if prompt_kind else self._get_default_model()
+        overrides = {
+            name: value
+            for name, value in (("max_output_tokens", max_output_tokens), ("temperature", temperature))
+            if value is not None
+        }
         
-        response = await model.generate_content_async(prompt)
+        try:
+            text = await asyncio.wait_for(
+                self._generate_text(model, prompt, generation_config=overrides or None),
+                timeout=self.api_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error("Gemini API タイムアウト (%.0f秒)", self.api_timeout)
+            raise
         
-        # JSONブロックを抽出
-        text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0].strip()
-        elif "{" in text:
-            # JSONオブジェクトの開始と終了を見つける
-            start = text.index("{")
-            end = text.rindex("}") + 1
-            text = text[start:end]
+        # JSONモードの応答はそのままJSONとして扱える
+        if prompt_kind:
+            return text
         
-        return text
+        return extract_json_text(text)
     
-    async def _wait_for_rate_limit(self) -> None:
-        """レート制限のための待機"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
+    @staticmethod
+    def _retry_after_seconds(error: Optional[BaseException]) -> Optional[float]:
+        """429応答で指定された待機時間を取得（指定がなければNone）"""
+        if not isinstance(error, google_exceptions.TooManyRequests):
+            return None
         
-        if time_since_last_request < self.min_request_interval:
-            wait_time = self.min_request_interval - time_since_last_request
-            await asyncio.sleep(wait_time)
+        # REST応答の Retry-After ヘッダー
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers:
+            retry_after = headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
         
-        self.last_request_time = time.time()
+        # gRPC応答の RetryInfo
+        for detail in error.details or []:
+            retry_delay = getattr(detail, "retry_delay", None)
+            if retry_delay is None:
+                continue
+            if hasattr(retry_delay, "total_seconds"):
+                return retry_delay.total_seconds()
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+        return None
     
-    async def generate_mystery_scenario(
+    def _backoff_delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """リトライまでの待機時間（Retry-After優先、なければフルジッター）"""
+        retry_after = self._retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        return self._rng.uniform(0, min(self._backoff_cap, self._backoff_base * (2 ** attempt)))
+    
+    async def _parse_json(self, text: str, parse: Optional[Callable[[Any], T]] = None) -> Any:
+        """Gemini応答のJSONをパースし、parse を指定した場合は変換結果を返す
+        
+        大きな応答はパースと変換をまとめて1回のスレッド実行で処理し、イベントループを塞がない。
+        """
+        def decode() -> Any:
+            data = orjson.loads(text)
+            return parse(data) if parse else data
+        
+        if len(text) > JSON_PARSE_THREAD_THRESHOLD:
+            return await _to_thread_fast(None, decode)
+        return decode()
+    
+    async def _wait_for_rate_limit(self, prompt: str) -> None:
+        """レート制限のための待機（RPMとTPMの両方を消費）"""
+        # 入力トークン数は文字数から概算する
+        await self._rate_limiter.acquire(len(prompt) // 4)
+    
+    async def generate_text(self, prompt: str) -> str:
+        """自由形式のプロンプトでGeminiに生成させ、応答テキストをそのまま返す
+        
+        他サービスからの生成もレート制限・同時実行数の制限を経由させ、
+        タイムアウトと一時的なAPIエラーのみ max_retries 回までリトライする。
+        """
+        if not self.gemini_api_key:
+            raise RuntimeError("Gemini API keyが設定されていません")
+        
+        for attempt in range(self.max_retries):
+            try:
+                await self._wait_for_rate_limit(prompt)
+                return await asyncio.wait_for(
+                    self._generate_text(self._get_default_model(), prompt), timeout=self.api_timeout
+                )
+            except (asyncio.TimeoutError, *_RETRYABLE_API_ERRORS) as e:
+                logger.warning("テキスト生成エラー (試行 %d): %s", attempt + 1, e)
+                if attempt == self.max_retries - 1:
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt, e))
+        
+        raise RuntimeError("最大リトライ回数を超えました")
+    
+    async def _call_gemini_with_retry(
         self,
-        request: ScenarioGenerationRequest
-    ) -> Scenario:
-        """ミステリーシナリオを生成"""
+        prompt: str,
+        *,
+        kind: str,
+        parse: Optional[Callable[[Any], T]] = None,
+        timeout: Optional[float] = None,
+        temperature: Optional[float] = None
+    ) -> T:
+        """レート制限・タイムアウト・リトライ付きでGemini APIを呼び出す
         
-        prompt = self._create_scenario_prompt(request)
+        応答JSONをパースして応答スキーマで検証し、parse を指定した場合はその変換結果を返す。
+        temperature を指定した場合はその呼び出しのみ生成温度を上書きする。
+        リトライはタイムアウトと一時的なAPIエラーのみ max_retries 回まで行い、
+        応答内容の不正は MAX_OUTPUT_ERROR_RETRIES 回まで再生成する（途切れた応答は出力トークン上限を
+        引き上げて再生成する）。ブロックされた応答を含むその他のエラーは即座に失敗とする。
+        """
+        label = PROMPT_KIND_LABELS[kind]
+        validate = _RESPONSE_VALIDATORS[kind]
+        
+        def convert(data: Any) -> Any:
+            validate(data)
+            return parse(data) if parse else data
         
+        output_errors = 0
+        max_output_tokens: Optional[int] = None
         for attempt in range(self.max_retries):
             try:
                 # レート制限待機
-                await self._wait_for_rate_limit()
+                await self._wait_for_rate_limit(prompt)
                 
-                logger.info(f"シナリオ生成開始 (試行 {attempt + 1}/{self.max_retries})")
+                logger.info("%s開始 (試行 %d/%d)", label, attempt + 1, self.max_retries)
                 
-                # Gemini APIでシナリオ生成
-                if self.gemini_api_key:
-                    logger.info("Using Gemini API for scenario generation")
-                    response = await self._call_gemini_api(prompt)
-                    json_str = self._clean_json_response(response)
-                    scenario_data = json.loads(json_str)
-                else:
-                    # APIキーがない場合はランダムモックを使用
-                    logger.info("No API key, using randomized mock scenario")
-                    scenario_data = self._generate_random_scenario(request.location_context)
-                
-                # Scenarioオブジェクトに変換
-                scenario = self._parse_scenario_response(scenario_data)
-                logger.info(f"シナリオ生成成功: {scenario.title}")
-                return scenario
+                response = await asyncio.wait_for(
+                    self._call_gemini_api(prompt, kind, max_output_tokens, temperature), timeout=timeout
+                )
+                return await self._parse_json(response, convert)
                 
             except asyncio.TimeoutError:
-                logger.warning(f"シナリオ生成がタイムアウトしました (試行 {attempt + 1})")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError("シナリオ生成がタイムアウトしました")
-                    
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSONパースエラー (試行 {attempt + 1}): {e}")
+                logger.warning("%sがタイムアウトしました (試行 %d)", label, attempt + 1)
                 if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
+                    await asyncio.sleep(self._backoff_delay(attempt))
                     continue
                 else:
-                    raise RuntimeError(f"シナリオ生成のレスポンス形式が不正です: {str(e)}")
+                    raise RuntimeError(f"{label}がタイムアウトしました")
                     
             except Exception as e:
-                logger.error(f"シナリオ生成エラー (試行 {attempt + 1}): {e}")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
+                logger.error("%sエラー (試行 %d): %s", label, attempt + 1, e)
+                if isinstance(e, GeminiResponseTruncated):
+                    max_output_tokens = min(
+                        MAX_OUTPUT_TOKENS_LIMIT, 2 * (max_output_tokens or self.generation_config["max_output_tokens"])
+                    )
+                if isinstance(e, ValueError):
+                    # JSONDecodeError・pydantic の ValidationError も ValueError の派生
+                    output_errors += 1
+                    retryable = output_errors <= MAX_OUTPUT_ERROR_RETRIES
+                else:
+                    retryable = isinstance(e, _RETRYABLE_API_ERRORS)
+                if retryable and attempt < self.max_retries - 1:
+                    await asyncio.sleep(self._backoff_delay(attempt, e))
                     continue
                 else:
-                    raise RuntimeError(f"シナリオ生成に失敗しました: {str(e)}")
+                    raise RuntimeError(f"{label}に失敗しました: {str(e)}")
         
         raise RuntimeError("最大リトライ回数を超えました")
+    
+    async def _call_gemini_speculative(
+        self,
+        prompt: str,
+        *,
+        kind: str,
+        parse: Optional[Callable[[Any], T]] = None
+    ) -> T:
+        """同じプロンプトを生成温度を変えて2本並行して送り、先に検証・変換まで成功した応答を採用する
+        
+        残った呼び出しはキャンセルする。無効時は通常の _call_gemini_with_retry と同じ。
+        """
+        if not self._speculative_enabled:
+            return await self._call_gemini_with_retry(prompt, kind=kind, parse=parse)
+        
+        pending = {
+            asyncio.ensure_future(
+                self._call_gemini_with_retry(prompt, kind=kind, parse=parse, temperature=temperature)
+            )
+            for temperature in SPECULATIVE_TEMPERATURES
+        }
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _is_cacheable(self, generation_config: Optional[Mapping[str, Any]] = None) -> bool:
+        """応答キャッシュを使うか（exactモードでは決定的な temperature=0 の生成のみ）"""
+        if self._response_cache is None:
+            return False
+        if self._response_cache_mode == "exact":
+            return (generation_config or self.generation_config)["temperature"] == 0
+        return True
+    
+    async def _get_cached_response(
+        self,
+        key: str,
+        generation_config: Optional[Mapping[str, Any]] = None
+    ) -> Optional[str]:
+        """キャッシュ済みの応答を取得（キャッシュ無効時はNone）"""
+        if not self._is_cacheable(generation_config):
+            return None
+        return await self._response_cache.get(key)
+    
+    async def _set_cached_response(
+        self,
+        key: str,
+        value: str,
+        generation_config: Optional[Mapping[str, Any]] = None
+    ) -> None:
+        """Gemini APIの応答をキャッシュに保存（モック応答は保存しない）"""
+        if not self.gemini_api_key or not self._is_cacheable(generation_config):
+            return
+        await self._response_cache.set(key, value)
+    
+    async def _embed_text(self, text: str) -> List[float]:
+        """意味的キャッシュ用にテキストを埋め込む"""
+        result = await genai.embed_content_async(
+            model=EMBEDDING_MODEL_NAME,
+            content=text,
+            task_type="semantic_similarity"
+        )
+        return result["embedding"]
+    
+    def _lightweight_partition(self, request: ScenarioGenerationRequest) -> str:
+        """意味的キャッシュで比較対象を絞るパーティション（場所以外の条件）"""
+        return build_cache_key("lightweight_scenario", {
+            **self._generation_fields(FAST_MODEL_NAME, FAST_GENERATION_CONFIG),
+            "d": request.difficulty,
+            "suspects": list(request.suspect_count_range)
+        })
+    
+    def _scenario_partition(self, request: ScenarioGenerationRequest) -> str:
+        """シナリオ生成の意味的キャッシュのパーティション（場所以外の条件）"""
+        return build_cache_key("scenario", {
+            **self._generation_fields(),
+            "d": request.difficulty,
+            "poi": sorted(request.poi_types)
+        })
+    
+    def _generation_fields(
+        self,
+        model_name: Optional[str] = None,
+        generation_config: Optional[Mapping[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """キャッシュキーに含めるモデル・サンプリング設定"""
+        config = generation_config or self.generation_config
+        return {
+            "model": model_name or self.model_name,
+            "temperature": config["temperature"],
+            "top_p": config["top_p"],
+            "top_k": config["top_k"]
+        }
+    
+    def _build_scenario_key(self, request: ScenarioGenerationRequest) -> str:
+        """シナリオ生成リクエストのキャッシュキー"""
+        return build_cache_key("scenario", {
+            **self._generation_fields(),
+            "d": request.difficulty,
+            "loc": request.location_context,
+            "poi": sorted(request.poi_types)
+        })
+    
+    def _build_scenario_with_evidence_key(
+        self,
+        request: ScenarioGenerationRequest,
+        poi_list: List[Dict[str, Any]]
+    ) -> str:
+        """シナリオ・証拠の一括生成リクエストのキャッシュキー"""
+        return build_cache_key("scenario_with_evidence", {
+            **self._generation_fields(),
+            "d": request.difficulty,
+            "loc": request.location_context,
+            "poi": sorted((poi["name"], poi["lat"], poi["lng"]) for poi in poi_list)
+        })
+    
+    def _build_lightweight_scenario_key(self, request: ScenarioGenerationRequest) -> str:
+        """軽量シナリオ生成リクエストのキャッシュキー"""
+        return build_cache_key("lightweight_scenario", {
+            **self._generation_fields(FAST_MODEL_NAME, FAST_GENERATION_CONFIG),
+            "d": request.difficulty,
+            "loc": _normalize_location_context(request.location_context),
+            "suspects": list(request.suspect_count_range)
+        })
+    
+    def _build_enhancement_key(self, game_id: str, enhancement_prompt: str) -> str:
+        """シナリオ詳細化リクエストのキャッシュキー"""
+        return build_cache_key("enhancement", {
+            **self._generation_fields(),
+            "game": game_id,
+            "prompt": enhancement_prompt
+        })
+    
+    def _build_evidence_key(self, scenario: Scenario, poi_list: List[Dict[str, Any]], evidence_count: int) -> str:
+        """証拠生成リクエストのキャッシュキー"""
+        return build_cache_key("evidence", {
+            **self._generation_fields(),
+            "title": scenario.title,
+            "culprit": scenario.culprit,
+            "poi": sorted((poi["name"], poi["lat"], poi["lng"]) for poi in poi_list),
+            "count": evidence_count
+        })
+    
+    def _build_deduction_key(self, scenario: Scenario, suspect_name: str, reasoning: Optional[str]) -> str:
+        """推理判定リクエストのキャッシュキー"""
+        return build_cache_key("deduction", {
+            **self._generation_fields(),
+            "title": scenario.title,
+            "culprit": scenario.culprit,
+            "suspect": suspect_name,
+            "reasoning": reasoning
+        })
+    
+    async def generate_mystery_scenario(
+        self,
+        request: ScenarioGenerationRequest
+    ) -> Scenario:
+        """ミステリーシナリオを生成"""
+        
+        # 同一条件（または場所情報の言い換え）のリクエストはキャッシュ済みの応答を再利用
+        cache_key = self._build_scenario_key(request)
+        cached = await self._get_cached_response(cache_key)
+        use_semantic_cache = self._semantic_cache is not None and self._is_cacheable()
+        if cached is None and use_semantic_cache:
+            cached = await self._semantic_cache.get(
+                self._scenario_partition(request), _normalize_location_context(request.location_context)
+            )
+        if cached is not None:
+            return Scenario.model_validate_json(cached)
+        
+        # APIキーがない場合はランダムモックを使用
+        if not self.gemini_api_key:
+            logger.info("No API key, using randomized mock scenario")
+            return self._parse_scenario_response(self._generate_random_scenario(request.location_context))
+        
+        prompt = self._create_scenario_prompt(request)
+        
+        logger.info("Using Gemini API for scenario generation")
+        scenario = await self._call_gemini_speculative(
+            prompt, kind="scenario", parse=self._parse_scenario_response
+        )
+        logger.info("シナリオ生成成功: %s", scenario.title)
+        scenario_json = scenario.model_dump_json()
+        await self._set_cached_response(cache_key, scenario_json)
+        if use_semantic_cache:
+            await self._semantic_cache.add(
+                self._scenario_partition(request), _normalize_location_context(request.location_context), scenario_json
+            )
+        return scenario
+
+    async def generate_scenario_with_evidence(
+        self,
+        request: ScenarioGenerationRequest,
+        poi_list: List[Dict[str, Any]]
+    ) -> Tuple[Scenario, List[Evidence]]:
+        """シナリオと証拠を1回のGemini呼び出しでまとめて生成
+        
+        generate_mystery_scenario と generate_evidence を続けて呼ぶ場合の往復1回分と、
+        シナリオ内容を証拠生成のプロンプトに再送する分の入力トークンを省く。
+        """
+        cache_key = self._build_scenario_with_evidence_key(request, poi_list)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            data = orjson.loads(cached)
+            return Scenario.model_validate(data["scenario"]), _EVIDENCE_LIST_ADAPTER.validate_python(data["evidence"])
+        
+        if not self.gemini_api_key:
+            # APIキーがない場合は個別のモック生成を使用
+            scenario = await self.generate_mystery_scenario(request)
+            return scenario, await self.generate_evidence(scenario, poi_list)
+        
+        prompt = self._create_scenario_with_evidence_prompt(request, poi_list)
+        
+        def build(data: Dict[str, Any]) -> Tuple[Scenario, List[Evidence]]:
+            if not data["evidence"]:
+                raise ValueError("証拠が生成されていません")
+            return self._parse_scenario_response(data["scenario"]), self._build_evidence_list(data["evidence"], poi_list)
+        
+        logger.info("Using Gemini API for scenario and evidence generation")
+        scenario, evidence_list = await self._call_gemini_speculative(
+            prompt, kind="scenario_with_evidence", parse=build
+        )
+        logger.info("シナリオ・証拠生成成功: %s (%d個の証拠)", scenario.title, len(evidence_list))
+        await self._set_cached_response(cache_key, orjson.dumps({
+            "scenario": scenario.model_dump(mode="json"),
+            "evidence": [evidence.model_dump(mode="json") for evidence in evidence_list]
+        }).decode())
+        return scenario, evidence_list
 
     async def generate_lightweight_scenario(
         self,
@@ -199,46 +1419,85 @@ class AIService:
         - 詳細は後から段階的に追加
         """
         
+        # 同一条件（または場所情報の言い換え）のリクエストはキャッシュ済みの応答を再利用
+        cached = await self._get_cached_lightweight_scenario(request)
+        if cached is not None:
+            return cached
+        
+        # キャッシュ共有できない場合（モック生成・exactモード）は個別に生成
+        if not self.gemini_api_key or not self._is_cacheable(FAST_GENERATION_CONFIG):
+            return await self._generate_lightweight_scenario(request)
+        
+        # 同一条件で生成中のリクエストがあれば、その結果を待って共有する
+        key = self._build_lightweight_scenario_key(request)
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                scenario = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 生成していた側がキャンセルされた場合は自分で生成し直す
+                if inflight.cancelled():
+                    continue
+                raise
+            return scenario.model_copy(deep=True)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            scenario = await self._generate_lightweight_scenario(request)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 待機者がいない場合の「未取得の例外」警告を抑止
+            future.exception()
+            raise
+        else:
+            future.set_result(scenario)
+            return scenario
+        finally:
+            del self._inflight[key]
+    
+    async def _generate_lightweight_scenario(self, request: ScenarioGenerationRequest) -> Scenario:
+        """軽量シナリオをGemini（APIキーなしの場合はモック）で生成"""
+        
         # 軽量プロンプト作成（文字数・複雑さを大幅削減）
         lightweight_prompt = self._create_lightweight_scenario_prompt(request)
         
         try:
-            logger.info(f"軽量シナリオ生成開始 - 難易度: {request.difficulty}")
-            logger.info(f"APIキー存在確認: {bool(self.gemini_api_key)}")
+            logger.info("軽量シナリオ生成開始 - 難易度: %s", request.difficulty)
             
             # Gemini Flash（高速モデル）を使用
             if self.gemini_api_key:
-                logger.info("Gemini API使用してシナリオ生成中...")
-                logger.info(f"プロンプト内容（最初100文字）: {lightweight_prompt[:100]}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("プロンプト内容（最初100文字）: %s", lightweight_prompt[:100])
                 
                 try:
+                    await self._wait_for_rate_limit(lightweight_prompt)
                     response = await self._call_gemini_api_fast(lightweight_prompt)
-                    logger.info(f"Gemini API応答受信 - 文字数: {len(response)}")
-                    logger.info(f"応答内容（最初200文字）: {response[:200]}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("応答内容（最初200文字）: %s", response[:200])
                     
                     try:
                         # マークダウンコードブロックを除去
-                        json_str = self._clean_json_response(response)
-                        scenario_data = json.loads(json_str)
-                        logger.info(f"JSON解析成功 - タイトル: {scenario_data.get('title', '不明')}")
-                        logger.info(f"説明文字数: {len(scenario_data.get('description', ''))}")
-                        logger.info(f"説明内容: {scenario_data.get('description', '')[:100]}...")
-                        
+                        json_str = extract_json_text(response)
                         # 基本シナリオオブジェクト作成
-                        scenario = self._parse_lightweight_scenario(scenario_data)
-                        logger.info(f"軽量シナリオ生成完了: {scenario.title} (難易度: {request.difficulty})")
-                        logger.info(f"最終説明文字数: {len(scenario.description)}")
+                        scenario = await self._parse_json(json_str, self._parse_lightweight_scenario)
+                        logger.info(
+                            "軽量シナリオ生成完了: %s (難易度: %s, 説明文字数: %d)",
+                            scenario.title, request.difficulty, len(scenario.description)
+                        )
+                        await self._cache_lightweight_scenario(request, scenario)
                         return scenario
                         
-                    except json.JSONDecodeError as je:
-                        logger.error(f"Gemini API応答のJSON解析失敗: {je}")
-                        logger.error(f"レスポンス内容: {response[:500]}...")
+                    except orjson.JSONDecodeError as je:
+                        logger.error("Gemini API応答のJSON解析失敗: %s", je)
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("レスポンス内容: %s...", response[:500])
                         raise
                         
                 except Exception as gemini_error:
-                    logger.error(f"Gemini API呼び出しエラー: {gemini_error}")
-                    logger.error(f"エラータイプ: {type(gemini_error).__name__}")
-                    logger.error(f"エラー詳細: {repr(gemini_error)}")
+                    logger.error("Gemini API呼び出しエラー: %s: %r", type(gemini_error).__name__, gemini_error)
                     raise  # エラーを再発生させてフォールバックへ
                     
             else:
@@ -246,467 +1505,214 @@ class AIService:
                 # 高速モック生成
                 scenario_data = self._generate_fast_mock_scenario(request.location_context, request.suspect_count_range)
                 scenario = self._parse_lightweight_scenario(scenario_data)
-                logger.info(f"モックシナリオ生成完了: {scenario.title}")
+                logger.info("モックシナリオ生成完了: %s", scenario.title)
                 return scenario
             
         except Exception as e:
-            logger.error(f"軽量シナリオ生成エラー: {e}")
-            logger.error(f"エラー詳細: {type(e).__name__}: {str(e)}")
+            logger.error("軽量シナリオ生成エラー: %s: %s", type(e).__name__, e)
             # フォールバック: 即座シナリオ生成
-            logger.info("フォールバックシナリオ生成中...")
             fallback_data = self._generate_fast_mock_scenario(request.location_context, request.suspect_count_range)
             scenario = self._parse_lightweight_scenario(fallback_data)
-            logger.info(f"フォールバックシナリオ生成完了: {scenario.title}")
+            logger.info("フォールバックシナリオ生成完了: %s", scenario.title)
             return scenario
     
-    async def enhance_scenario_background(
-        self,
-        game_id: str,
-        base_scenario: Scenario,
-        request: ScenarioGenerationRequest
-    ):
-        """
-        バックグラウンドでシナリオを詳細化
-        - キャラクター背景強化
-        - 複雑な推理要素追加
-        - 動機・手法の詳細化
-        """
-        
-        try:
-            logger.info(f"シナリオ詳細化開始 game_id: {game_id}")
-            
-            # 詳細化プロンプト作成
-            enhancement_prompt = self._create_enhancement_prompt(base_scenario, request)
-            
-            # バックグラウンドで詳細生成
-            if self.gemini_api_key:
-                enhanced_data = await self._call_gemini_api(enhancement_prompt)
-                enhanced_scenario = self._merge_enhanced_scenario(base_scenario, enhanced_data)
-            else:
-                enhanced_scenario = self._enhance_mock_scenario(base_scenario)
-            
-            # データベースに更新保存
-            from .database_service import database_service
-            await database_service.update_game_scenario(game_id, enhanced_scenario)
-            
-            logger.info(f"シナリオ詳細化完了 game_id: {game_id}")
-            
-        except Exception as e:
-            logger.error(f"シナリオ詳細化エラー game_id: {game_id}, error: {e}")
-            # エラーでも基本ゲームは継続可能
+    async def _get_cached_lightweight_scenario(self, request: ScenarioGenerationRequest) -> Optional[Scenario]:
+        """キャッシュ済みの軽量シナリオを取得（完全一致 → 場所情報の類似度の順に照合）"""
+        cached = await self._get_cached_response(
+            self._build_lightweight_scenario_key(request), FAST_GENERATION_CONFIG
+        )
+        if cached is None and self._semantic_cache is not None and self._is_cacheable(FAST_GENERATION_CONFIG):
+            cached = await self._semantic_cache.get(
+                self._lightweight_partition(request),
+                _normalize_location_context(request.location_context)
+            )
+        return Scenario.model_validate_json(cached) if cached is not None else None
     
-    def _create_scenario_prompt(self, request: ScenarioGenerationRequest) -> str:
-        """シナリオ生成用プロンプトを作成"""
-        
-        difficulty_settings = {
-            "easy": {
-                "suspects": 3, 
-                "complexity": "シンプル", 
-                "red_herrings": "少なめ",
-                "description_length": "200-400文字",
-                "detail_level": "基本的な情報と簡潔な背景説明"
-            },
-            "normal": {
-                "suspects": 4, 
-                "complexity": "適度", 
-                "red_herrings": "適度",
-                "description_length": "400-600文字",
-                "detail_level": "詳細な背景情報と人間関係を含む"
-            },
-            "hard": {
-                "suspects": 6, 
-                "complexity": "複雑", 
-                "red_herrings": "多め",
-                "description_length": "600-1000文字",
-                "detail_level": "非常に詳細な人間関係、複雑な背景設定、複数の伏線を含む"
-            }
-        }
-        
-        settings_info = difficulty_settings.get(request.difficulty, difficulty_settings["normal"])
-        
-        prompt = f"""
-あなたは優秀な推理小説作家です。GPS連動のミステリーゲーム用に、論理的で魅力的な事件シナリオを作成してください。
-
-## 重要な要件
-**3つの証拠から論理的に犯人を特定できるシナリオを作成してください。**
-- 証拠1: 犯人でない容疑者を除外できる証拠
-- 証拠2: さらに別の容疑者を除外できる証拠
-- 証拠3: 残った容疑者が犯人であることを示す決定的証拠
-
-## 条件設定
-- 難易度: {request.difficulty}
-- 場所: {request.location_context}
-- 利用可能なPOI: {', '.join(request.poi_types)}
-- 容疑者数: {settings_info['suspects']}名（必ず3名）
-- 複雑さ: {settings_info['complexity']}
-- ミスリード要素: {settings_info['red_herrings']}
-- 説明文の長さ: **{settings_info['description_length']}**
-- 詳細レベル: {settings_info['detail_level']}
-
-## シナリオ作成のルール
-1. 各容疑者に明確で異なる動機を設定
-2. 各容疑者のアリバイに穴や矛盾を設定（犯人は致命的な矛盾）
-3. 証拠は段階的に真相に近づくよう設計
-4. 毎回異なるシナリオを生成（ランダム要素を含める）
-5. 現実的で信憑性のある事件設定
-
-## 出力形式（必ずJSON形式で出力）
-{{
-  "title": "事件のタイトル",
-  "description": "導入文（**必ず{settings_info['description_length']}で作成**、ドラマチック、{settings_info['detail_level']}）",
-  "victim": {{
-    "name": "被害者名",
-    "age": 年齢,
-    "occupation": "職業",
-    "personality": "性格・特徴",
-    "temperament": "calm",
-    "relationship": "事件との関係",
-    "background": "背景情報"
-  }},
-  "suspects": [
-    {{
-      "name": "容疑者名",
-      "age": 年齢,
-      "occupation": "職業", 
-      "personality": "性格・特徴",
-      "temperament": "calm|volatile|sarcastic|defensive|nervous",
-      "relationship": "被害者との関係",
-      "alibi": "アリバイ",
-      "motive": "動機（犯人以外は薄い動機）",
-      "background": "背景情報"
-    }}
-  ],
-  "culprit": "真犯人の名前",
-  "motive": "真の犯行動機",
-  "method": "犯行手口",
-  "timeline": [
-    "時系列1",
-    "時系列2",
-    "時系列3"
-  ],
-  "theme": "human_drama|time_complex|misdirection|psychological|classic",
-  "difficulty_factors": ["複雑さ要因1", "複雑さ要因2"],
-  "red_herrings": ["ミスリード要因1", "ミスリード要因2"]
-}}
-
-## 重要な注意事項
-1. 容疑者のうち1名が必ず真犯人
-2. temperament は必ず指定の5種類から選択
-3. 日本の法律に違反しない範囲で作成
-4. 実在する人物・団体は使用しない
-5. 過度に暴力的・グロテスクな描写は避ける
-6. プレイヤーが推理できる論理的な手がかりを含む
-7. **最重要: 難易度{request.difficulty}に応じて、説明文を必ず{settings_info['description_length']}の範囲で作成し、{settings_info['detail_level']}**
-
-シナリオを生成してください。
-"""
-        return prompt
-
-    def _create_lightweight_scenario_prompt(self, request: ScenarioGenerationRequest) -> str:
-        """軽量シナリオ生成用プロンプト（高速・最小限）"""
-        import random
-        import time
-        
-        # 難易度による文字数調整
-        difficulty_settings = {
-            "easy": {
-                "description_length": "120-200文字",
-                "complexity": "単純で分かりやすい",
-                "suspects": request.suspect_count_range[1]
-            },
-            "normal": {
-                "description_length": "200-350文字", 
-                "complexity": "適度に複雑な",
-                "suspects": request.suspect_count_range[1]
-            },
-            "hard": {
-                "description_length": "350-500文字",
-                "complexity": "複雑で手の込んだ",
-                "suspects": request.suspect_count_range[1]
-            }
-        }
-        
-        settings = difficulty_settings.get(request.difficulty, difficulty_settings["normal"])
-        
-        # ユニークネス確保
-        random_seed = random.randint(1000, 9999)
-        timestamp = int(time.time())
-        
-        # シンプルなバリエーション
-        themes = ["人間関係", "金銭問題", "秘密", "裏切り"]
-        crimes = ["失踪", "盗難", "詐欺", "恐喝"]
-        
-        selected_theme = random.choice(themes)
-        selected_crime = random.choice(crimes)
+    async def _cache_lightweight_scenario(self, request: ScenarioGenerationRequest, scenario: Scenario) -> None:
+        """生成した軽量シナリオをキャッシュに保存"""
+        scenario_json = scenario.model_dump_json()
+        await self._set_cached_response(
+            self._build_lightweight_scenario_key(request), scenario_json, FAST_GENERATION_CONFIG
+        )
+        if self._semantic_cache is not None and self._is_cacheable(FAST_GENERATION_CONFIG):
+            await self._semantic_cache.add(
+                self._lightweight_partition(request),
+                _normalize_location_context(request.location_context),
+                scenario_json
+            )
+    
+    async def enhance_scenario_background(
+        self,
+        game_id: str,
+        base_scenario: Scenario,
+        request: ScenarioGenerationRequest
+    ):
+        """
+        バックグラウンドでシナリオを詳細化
+        - キャラクター背景強化
+        - 複雑な推理要素追加
+        - 動機・手法の詳細化
+        """
         
-        # location_contextの処理
-        location_info = request.location_context
-        if not location_info or location_info == "不明な地域の情報です。":
-            location_info = "都市部の商業地域"
-        location_clean = location_info.rstrip('。')
+        try:
+            logger.info("シナリオ詳細化開始 game_id: %s", game_id)
+            
+            # 詳細化プロンプト作成
+            enhancement_prompt = self._create_enhancement_prompt(base_scenario, request)
+            
+            # バックグラウンドで詳細生成
+            if self.gemini_api_key:
+                # 同一ゲームの再実行（再起動後の復旧など）はキャッシュ済みの応答を再利用
+                cache_key = self._build_enhancement_key(game_id, enhancement_prompt)
+                enhanced_data = await self._get_cached_response(cache_key)
+                if enhanced_data is None:
+                    await self._wait_for_rate_limit(enhancement_prompt)
+                    enhanced_data = await self._call_gemini_api(enhancement_prompt)
+                    await self._set_cached_response(cache_key, enhanced_data)
+                enhanced_scenario = self._merge_enhanced_scenario(base_scenario, enhanced_data)
+            else:
+                enhanced_scenario = self._enhance_mock_scenario(base_scenario)
+            
+            # データベースに更新保存
+            from .database_service import database_service
+            await database_service.update_game_scenario(game_id, enhanced_scenario)
+            
+            logger.info("シナリオ詳細化完了 game_id: %s", game_id)
+            
+        except Exception as e:
+            logger.error("シナリオ詳細化エラー game_id: %s, error: %s", game_id, e)
+            # エラーでも基本ゲームは継続可能
+    
+    def _create_scenario_prompt(self, request: ScenarioGenerationRequest) -> str:
+        """シナリオ生成用プロンプトを作成"""
         
-        # 容疑者のJSONテンプレートを動的生成
-        suspects_template = []
-        temperaments = ["nervous", "volatile", "sarcastic", "defensive", "calm"]
+        settings_info = DIFFICULTY_SETTINGS.get(request.difficulty, DIFFICULTY_SETTINGS["normal"])
         
-        for i in range(settings["suspects"]):
-            suspect_num = i + 1
-            temperament = temperaments[i % len(temperaments)]
-            suspects_template.append(f'''    {{
-      "name": "容疑者{suspect_num}名",
-      "age": 年齢,
-      "occupation": "職業", 
-      "personality": "性格",
-      "temperament": "{temperament}",
-      "relationship": "{selected_theme}に関連する関係",
-      "alibi": "具体的アリバイ",
-      "motive": null,
-      "background": null
-    }}''')
+        return _SCENARIO_PROMPT_TPL.substitute(
+            settings_info,
+            difficulty=request.difficulty,
+            location=request.location_context,
+            poi_types=', '.join(request.poi_types)
+        )
+
+    def _create_scenario_with_evidence_prompt(
+        self,
+        request: ScenarioGenerationRequest,
+        poi_list: List[Dict[str, Any]]
+    ) -> str:
+        """シナリオ・証拠の一括生成用プロンプトを作成（POIは名前と種類のみ渡す）"""
         
-        suspects_json = ",\n".join(suspects_template)
+        settings_info = DIFFICULTY_SETTINGS.get(request.difficulty, DIFFICULTY_SETTINGS["normal"])
         
-        # よりシンプルなプロンプト
-        prompt = f"""推理ゲーム用のミステリー事件シナリオをJSON形式で作成してください。
-
-場所: {location_clean}
-難易度: {request.difficulty}
-テーマ: {selected_theme}を背景とした{selected_crime}事件
-容疑者数: {settings["suspects"]}人
-
-【厳守事項】:
-- description文字数: 必ず{settings["description_length"]}（最低でも{settings["description_length"].split('-')[0]}文字以上）
-- 短い文章は絶対禁止 - 「○○事件。証拠を集めて推理を進めよう」のような短文は不可
-- 毎回異なるユニークなシナリオ生成
-- 具体的で詳細な事件描写が必要
-- 容疑者は必ず{settings["suspects"]}人生成
-
-JSON出力:
-{{
-  "title": "ユニークな事件タイトル（10-15文字）",
-  "description": "【重要】必ず{settings['description_length']}で記述してください。{location_clean}で起きた{selected_theme}に関連する{selected_crime}事件の詳細な描写。被害者の状況、事件の経緯、現場の様子、不可解な謎、関係者の動き、時系列などを含む魅力的で引き込まれる事件説明。「証拠を集めて推理を進めよう」のような短い文ではなく、具体的で詳細な事件ストーリーを{settings['description_length']}で記述。",
-  "victim": {{
-    "name": "被害者名",
-    "age": 年齢,
-    "occupation": "職業",
-    "personality": "性格",
-    "temperament": "calm",
-    "relationship": "被害者",
-    "alibi": ""
-  }},
-  "suspects": [
-{suspects_json}
-  ],
-  "culprit": "容疑者1名",
-  "motive": "具体的な動機",
-  "method": "手口", 
-  "timeline": ["時系列"],
-  "theme": "human_drama",
-  "difficulty_factors": [],
-  "red_herrings": []
-}}
+        return _SCENARIO_WITH_EVIDENCE_PROMPT_TPL.substitute(
+            settings_info,
+            difficulty=request.difficulty,
+            location=request.location_context,
+            poi_types=', '.join(request.poi_types),
+            poi_json=orjson.dumps([{"name": poi["name"], "type": poi.get("type", "unknown")} for poi in poi_list]).decode()
+        )
 
-注意: 
-- temperamentは calm|volatile|sarcastic|defensive|nervous から選択必須
-- ユニーク性のためのID: {random_seed}-{timestamp}
-- 【最重要】description は必ず{settings["description_length"]}で詳細に記述してください
-"""
-        return prompt
+    def _create_lightweight_scenario_prompt(self, request: ScenarioGenerationRequest) -> str:
+        """軽量シナリオ生成用プロンプト（高速・最小限）"""
+        # 難易度による文字数調整
+        description_length, min_length = LIGHTWEIGHT_DESCRIPTION_LENGTHS.get(
+            request.difficulty, LIGHTWEIGHT_DESCRIPTION_LENGTHS["normal"]
+        )
+        suspect_count = request.suspect_count_range[1]
+        
+        # 固定部分を先頭に置き、毎回変わる条件は末尾にまとめる（プレフィックスキャッシュを効かせる）
+        return _LIGHTWEIGHT_SCENARIO_PROMPT_PREFIX + _LIGHTWEIGHT_SCENARIO_PROMPT_TPL.substitute(
+            location=_normalize_location_context(request.location_context),
+            difficulty=request.difficulty,
+            theme=self._rng.choice(_LIGHTWEIGHT_THEMES),
+            crime=self._rng.choice(_LIGHTWEIGHT_CRIMES),
+            suspects=suspect_count,
+            suspect_temperaments=_suspect_temperaments(suspect_count),
+            description_length=description_length,
+            min_length=min_length,
+            unique_id=secrets.token_hex(4)  # ユニークネス確保
+        )
     
     def _create_enhancement_prompt(self, base_scenario: Scenario, request: ScenarioGenerationRequest) -> str:
         """シナリオ詳細化用プロンプト"""
         
-        prompt = f"""
-以下の基本シナリオを詳細化してください。
-
-## 基本シナリオ
-タイトル: {base_scenario.title}
-説明: {base_scenario.description}
-被害者: {base_scenario.victim.name}
-容疑者: {[s.name for s in base_scenario.suspects]}
-真犯人: {base_scenario.culprit}
-
-## 詳細化要求
-- 各キャラクターの背景を詳細化
-- 複雑な人間関係を追加
-- 動機を深掘り
-- ミスリード要素を追加
-- 推理要素を強化
-
-## 出力形式（JSON）
-基本シナリオの全フィールドを含め、以下を詳細化：
-- description: 400-800文字に拡張
-- 各キャラクターのbackground, motive を詳細化
-- difficulty_factors と red_herrings を追加
-- timeline を詳細化
+        return _ENHANCEMENT_PROMPT_TPL.substitute(
+            title=base_scenario.title,
+            description=base_scenario.description,
+            victim=base_scenario.victim.name,
+            suspects=", ".join(s.name for s in base_scenario.suspects),
+            culprit=base_scenario.culprit
+        )
 
-詳細化されたシナリオを生成してください。
-"""
-        return prompt
-
-    def _clean_json_response(self, response: str) -> str:
-        """Gemini APIのレスポンスからマークダウンコードブロックを除去"""
-        if response.startswith("```json"):
-            return response.replace("```json", "").replace("```", "").strip()
-        elif response.startswith("```"):
-            return response.replace("```", "").strip()
-        return response
-    
     async def _call_gemini_api_fast(self, prompt: str) -> str:
         """Gemini Flash（高速モデル）でAPI呼び出し"""
         
         try:
-            logger.info("Gemini API呼び出し開始")
-            logger.info(f"使用モデル: gemini-1.5-flash")
-            logger.info(f"プロンプト文字数: {len(prompt)}")
+            logger.debug("Gemini API呼び出し開始 - モデル: %s, プロンプト文字数: %d", FAST_MODEL_NAME, len(prompt))
             
-            # より軽量なGemini 1.5 Flash モデルを使用
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # より軽量な設定（レスポンス速度重視）
-            generation_config = genai.types.GenerationConfig(
-                temperature=0.5,  # より低い温度で安定性向上
-                max_output_tokens=2000,  # 適度に制限
-                top_p=0.8,
-                top_k=20,  # 選択肢を絞って高速化
-                candidate_count=1
-            )
-            
-            logger.info("Gemini API リクエスト送信中...")
+            # より軽量なGemini 1.5 Flash モデルを使用（生成設定ごと一度だけ作成して使い回す）
+            if self._fast_model is None:
+                self._fast_model = genai.GenerativeModel(
+                    model_name=FAST_MODEL_NAME,
+                    generation_config=dict(FAST_GENERATION_CONFIG),
+                    safety_settings=self.safety_settings
+                )
             
-            # タイムアウト60秒
-            response = await asyncio.wait_for(
-                model.generate_content_async(
-                    prompt,
-                    generation_config=generation_config,
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-                    ]
-                ),
-                timeout=60.0  # 60秒に延長
+            # ストリーミング時はJSONが閉じた時点で受信を終える
+            text = await asyncio.wait_for(
+                self._generate_text(self._fast_model, prompt, stop_on_complete_json=True),
+                timeout=self.api_timeout
             )
             
-            logger.info("Gemini API レスポンス受信成功")
-            logger.info(f"レスポンス文字数: {len(response.text)}")
+            logger.info("Gemini API レスポンス受信 - 文字数: %d", len(text))
             
-            return response.text
+            return text
             
         except asyncio.TimeoutError:
-            logger.error("Gemini API タイムアウト (60秒)")
+            logger.error("Gemini API タイムアウト (%.0f秒)", self.api_timeout)
             raise TimeoutError("Gemini Flash API call timed out")
         except Exception as e:
-            logger.error(f"Gemini Flash API エラー: {e}")
-            logger.error(f"エラータイプ: {type(e).__name__}")
+            logger.error("Gemini Flash API エラー: %s: %s", type(e).__name__, e)
             raise
 
     def _generate_fast_mock_scenario(self, location_context: str, suspect_count_range: tuple = (3, 3)) -> dict:
-        """高速モックシナリオ生成"""
-        
-        import random
-        
-        titles = ["突然の失踪", "謎の訪問者", "消えた証拠", "偽りの証言"]
-        occupations = ["会社員", "店主", "学生", "主婦", "フリーランサー"]
-        
-        # 容疑者数を動的に決定
-        suspect_count = random.randint(suspect_count_range[0], suspect_count_range[1])
-        
-        # 容疑者名のプール
-        suspect_names = [
-            "佐藤花子", "田中一郎", "鈴木次郎", "高橋美咲", "渡辺健太",
-            "伊藤良子", "山田浩二", "中村真理", "小林隆史", "加藤恵美"
-        ]
+        """高速モックシナリオ生成（事前生成したバリエーションから選択）"""
         
-        # 容疑者をランダムに生成
-        suspects = []
-        selected_names = random.sample(suspect_names, suspect_count)
-        temperaments = ["nervous", "volatile", "defensive", "calm"]
-        
-        for i, name in enumerate(selected_names):
-            suspects.append({
-                "name": name,
-                "age": random.randint(25, 60),
-                "occupation": random.choice(occupations),
-                "personality": random.choice(["社交的だが秘密主義", "無口で頑固", "神経質で疑い深い", "明るく積極的"]),
-                "temperament": random.choice(temperaments),
-                "relationship": random.choice(["知人", "同僚", "近隣住民", "関係者"]),
-                "alibi": random.choice(["仕事をしていました", "家にいました", "買い物に出ていました", "友人と会っていました"]),
-                "motive": None,
-                "background": None
-            })
+        # 容疑者数を動的に決定（名前プールの範囲内）
+        suspect_count = self._rng.randint(suspect_count_range[0], suspect_count_range[1])
+        suspect_count = max(FAST_MOCK_MIN_SUSPECTS, min(suspect_count, FAST_MOCK_MAX_SUSPECTS))
+        template = self._rng.choice(_FAST_MOCK_SCENARIOS[suspect_count])
         
+        # 共有テンプレートを書き換えないよう入れ子のdict・listはコピーして返す
         return {
-            "title": random.choice(titles),
+            **template,
             "description": f"{location_context}で起きた不可解な事件。真相を探るため、証拠を集めて推理を進めよう。",
-            "victim": {
-                "name": "山田太郎",
-                "age": random.randint(25, 60),
-                "occupation": random.choice(occupations),
-                "personality": "真面目で責任感が強い",
-                "temperament": "calm",
-                "relationship": "被害者",
-                "alibi": ""
-            },
-            "suspects": suspects,
-            "culprit": suspects[0]["name"],  # 最初の容疑者を犯人に設定
-            "motive": "金銭トラブル",
-            "method": "計画的犯行",
-            "timeline": ["事件発生前の異変"],
-            "theme": "human_drama",
+            "victim": dict(template["victim"]),
+            "suspects": [dict(suspect) for suspect in template["suspects"]],
+            "timeline": list(template["timeline"]),
             "difficulty_factors": [],
             "red_herrings": []
         }
 
     def _parse_lightweight_scenario(self, scenario_data: dict) -> Scenario:
-        """軽量シナリオデータをScenarioオブジェクトに変換"""
-        
-        from shared.models.character import Character
-        from shared.models.scenario import Scenario
-        
-        # 被害者作成
-        victim_data = scenario_data["victim"]
-        victim = Character(
-            name=victim_data["name"],
-            age=victim_data["age"],
-            occupation=victim_data["occupation"],
-            personality=victim_data["personality"],
-            temperament=victim_data["temperament"],
-            relationship=victim_data["relationship"],
-            alibi=victim_data.get("alibi", "")
-        )
+        """軽量シナリオデータをScenarioオブジェクトに変換（被害者・容疑者を含め1回で検証）"""
         
-        # 容疑者リスト作成
-        suspects = []
-        for suspect_data in scenario_data["suspects"]:
-            suspect = Character(
-                name=suspect_data["name"],
-                age=suspect_data["age"],
-                occupation=suspect_data["occupation"],
-                personality=suspect_data["personality"],
-                temperament=suspect_data["temperament"],
-                relationship=suspect_data["relationship"],
-                alibi=suspect_data.get("alibi", "")
-            )
-            suspects.append(suspect)
-        
-        # Scenarioオブジェクト作成
-        scenario = Scenario(
-            title=scenario_data["title"],
-            description=scenario_data["description"],
-            victim=victim,
-            suspects=suspects,
-            culprit=scenario_data["culprit"],
-            motive=scenario_data["motive"],
-            method=scenario_data["method"],
-            timeline=scenario_data.get("timeline", []),
-            theme=scenario_data.get("theme"),
-            difficulty_factors=scenario_data.get("difficulty_factors", []),
-            red_herrings=scenario_data.get("red_herrings", [])
-        )
+        def character(data: Dict[str, Any]) -> Dict[str, Any]:
+            return {"alibi": "", **_character_payload(data)}
         
-        return scenario
+        return Scenario.model_validate({
+            "title": scenario_data["title"],
+            "description": scenario_data["description"],
+            "victim": character(scenario_data["victim"]),
+            "suspects": [character(suspect) for suspect in scenario_data["suspects"]],
+            "culprit": scenario_data["culprit"],
+            "motive": scenario_data["motive"],
+            "method": scenario_data["method"],
+            "timeline": scenario_data.get("timeline", []),
+            "theme": scenario_data.get("theme"),
+            "difficulty_factors": scenario_data.get("difficulty_factors", []),
+            "red_herrings": scenario_data.get("red_herrings", [])
+        })
 
     def _create_fallback_scenario(self, location_context: str, suspect_count_range: tuple = (3, 3)) -> Scenario:
         """フォールバック用即座シナリオ"""
@@ -715,77 +1721,10 @@ JSON出力:
     
     def _generate_random_scenario(self, location_context: str) -> Dict[str, Any]:
         """ランダムな要素を含むモックシナリオを生成"""
-        import random
-        
-        # シナリオテンプレート
-        scenario_templates = [
-            {
-                "title": "深夜のカフェ殺人事件",
-                "victim": {"name": "木村太郎", "age": 42, "occupation": "カフェオーナー"},
-                "location": "深夜営業のカフェ",
-                "time": "午後11時",
-                "method": "毒殺",
-                "culprit_index": 0
-            },
-            {
-                "title": "公園の謎の失踪事件",
-                "victim": {"name": "高橋美咲", "age": 28, "occupation": "ジョガー"},
-                "location": "早朝の公園",
-                "time": "午前5時",
-                "method": "突き落とし",
-                "culprit_index": 1
-            },
-            {
-                "title": "商店街の密室殺人",
-                "victim": {"name": "渡辺次郎", "age": 55, "occupation": "商店主"},
-                "location": "閉店後の商店",
-                "time": "午後9時",
-                "method": "絞殺",
-                "culprit_index": 2
-            },
-            {
-                "title": "オフィスビルの転落事件",
-                "victim": {"name": "斉藤花子", "age": 35, "occupation": "会社員"},
-                "location": "オフィスビルの屋上",
-                "time": "午後7時",
-                "method": "転落",
-                "culprit_index": 0
-            },
-            {
-                "title": "駐車場の襲撃事件",
-                "victim": {"name": "伊藤健一", "age": 48, "occupation": "タクシー運転手"},
-                "location": "地下駐車場",
-                "time": "午前2時",
-                "method": "鈍器による殴打",
-                "culprit_index": 1
-            }
-        ]
-        
-        # 容疑者テンプレート
-        suspect_templates = [
-            {"name": "山田太郎", "age": 30, "occupation": "会社員", "personality": "神経質で短気"},
-            {"name": "佐藤花子", "age": 25, "occupation": "パート店員", "personality": "表面上は明るいが計算高い"},
-            {"name": "鈴木一郎", "age": 40, "occupation": "自営業", "personality": "プライドが高く頑固"},
-            {"name": "田中美咲", "age": 35, "occupation": "主婦", "personality": "嫉妬深く執念深い"},
-            {"name": "高橋健太", "age": 28, "occupation": "フリーター", "personality": "怠惰だが賢い"},
-            {"name": "渡辺真理", "age": 45, "occupation": "教師", "personality": "厳格で融通が利かない"},
-            {"name": "伊藤次郎", "age": 50, "occupation": "警備員", "personality": "無口で観察力が鋭い"},
-            {"name": "斉藤美香", "age": 32, "occupation": "看護師", "personality": "献身的だが秘密主義"}
-        ]
         
         # ランダムに選択
-        template = random.choice(scenario_templates)
-        selected_suspects = random.sample(suspect_templates, 3)
-        
-        # 動機のリスト
-        motives = [
-            "金銭トラブルで恨みを持っていた",
-            "不倫関係が暴露されることを恐れた",
-            "過去の秘密を握られていた",
-            "仕事上の対立があった",
-            "嫉妬と怒りが爆発した",
-            "復讐のため計画的に実行した"
-        ]
+        template = self._rng.choice(_RANDOM_SCENARIO_TEMPLATES)
+        selected_suspects = self._rng.sample(_RANDOM_SUSPECT_TEMPLATES, 3)
         
         # 犯人を決定
         culprit_index = template["culprit_index"]
@@ -810,16 +1749,16 @@ JSON出力:
                     "age": suspect["age"],
                     "occupation": suspect["occupation"],
                     "personality": suspect["personality"],
-                    "temperament": random.choice(["calm", "nervous", "defensive"]),
-                    "relationship": random.choice(["同僚", "近隣住民", "知人", "取引相手"]),
+                    "temperament": self._rng.choice(_RANDOM_TEMPERAMENTS),
+                    "relationship": self._rng.choice(_RANDOM_RELATIONSHIPS),
                     "alibi": f"事件当時、{'自宅にいた' if i != culprit_index else '現場付近にいた'}と主張",
-                    "motive": random.choice(motives) if i == culprit_index else random.choice(motives[:3]),
+                    "motive": self._rng.choice(_RANDOM_MOTIVES) if i == culprit_index else self._rng.choice(_RANDOM_MOTIVES[:3]),
                     "background": f"{location_context}在住"
                 }
                 for i, suspect in enumerate(selected_suspects)
             ],
             "culprit": culprit_name,
-            "motive": random.choice(motives),
+            "motive": self._rng.choice(_RANDOM_MOTIVES),
             "method": template["method"],
             "timeline": [
                 f"{template['time']}の30分前: 被害者が{template['location']}に到着",
@@ -832,208 +1771,169 @@ JSON出力:
         }
     
     def _parse_scenario_response(self, data: Dict[str, Any]) -> Scenario:
-        """AIレスポンスをScenarioオブジェクトに変換"""
-        
-        # 被害者の作成
-        victim_data = data["victim"]
-        victim = Character(
-            name=victim_data["name"],
-            age=victim_data["age"],
-            occupation=victim_data["occupation"],
-            personality=victim_data["personality"],
-            temperament=Temperament(victim_data["temperament"]),
-            relationship=victim_data["relationship"],
-            background=victim_data.get("background")
+        """AIレスポンスをScenarioオブジェクトに変換（被害者・容疑者を含め1回で検証）"""
+        
+        return Scenario.model_validate({
+            "title": data["title"],
+            "description": data["description"],
+            "victim": _character_payload(data["victim"]),
+            "suspects": [_character_payload(suspect) for suspect in data["suspects"]],
+            "culprit": data["culprit"],
+            "motive": data["motive"],
+            "method": data["method"],
+            "timeline": data["timeline"],
+            "theme": data.get("theme"),
+            "difficulty_factors": data.get("difficulty_factors", []),
+            "red_herrings": data.get("red_herrings", [])
+        })
+    
+    def _plan_evidence_assignments(
+        self,
+        scenario: Scenario,
+        poi_list: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """3つの証拠の役割（除外証拠2つ・決定的証拠1つ）と配置POIを決定"""
+        innocent_suspects = [s for s in scenario.suspects if s.name != scenario.culprit]
+        roles = [
+            (f"第{i + 1}の証拠（除外証拠）: 容疑者「{suspect.name}」が犯人でないことを示す証拠", "important")
+            for i, suspect in enumerate(innocent_suspects[:2])
+        ]
+        roles.append((f"第{len(roles) + 1}の証拠（決定的証拠）: 真犯人「{scenario.culprit}」の犯行を示す証拠", "critical"))
+        
+        return [
+            {"role": role, "importance": importance, "poi": poi_list[i % len(poi_list)]}
+            for i, (role, importance) in enumerate(roles)
+        ]
+    
+    async def _generate_single_evidence(
+        self,
+        scenario: Scenario,
+        suspects_json: str,
+        assignment: Dict[str, Any]
+    ) -> Evidence:
+        """役割を指定して証拠を1つ生成
+        
+        応答を受信した時点でEvidenceに変換し、他の証拠の受信待ちと重ねる。
+        """
+        
+        # 固定の論理構造・出力形式は EVIDENCE_SYSTEM_INSTRUCTION 側に置き、ここでは可変部分のみ作成
+        prompt = _EVIDENCE_PROMPT_TPL.substitute(
+            title=scenario.title,
+            culprit=scenario.culprit,
+            motive=scenario.motive,
+            method=scenario.method,
+            suspects_json=suspects_json,
+            poi_json=orjson.dumps(assignment["poi"]).decode(),
+            role=assignment["role"],
+            importance=assignment["importance"]
         )
         
-        # 容疑者リストの作成
-        suspects = []
-        for suspect_data in data["suspects"]:
-            suspect = Character(
-                name=suspect_data["name"],
-                age=suspect_data["age"],
-                occupation=suspect_data["occupation"],
-                personality=suspect_data["personality"],
-                temperament=Temperament(suspect_data["temperament"]),
-                relationship=suspect_data["relationship"],
-                alibi=suspect_data.get("alibi"),
-                motive=suspect_data.get("motive"),
-                background=suspect_data.get("background")
-            )
-            suspects.append(suspect)
-        
-        return Scenario(
-            title=data["title"],
-            description=data["description"],
-            victim=victim,
-            suspects=suspects,
-            culprit=data["culprit"],
-            motive=data["motive"],
-            method=data["method"],
-            timeline=data["timeline"],
-            theme=data.get("theme"),
-            difficulty_factors=data.get("difficulty_factors", []),
-            red_herrings=data.get("red_herrings", [])
+        def build(item: Dict[str, Any]) -> Evidence:
+            # 配置先と重要度は事前に決めた割り当てを優先（証拠IDは全件そろった後に採番）
+            item["importance"] = assignment["importance"]
+            return self._build_evidence("", item, assignment["poi"])
+        
+        return await self._call_gemini_with_retry(prompt, kind="evidence", parse=build)
+    
+    def _build_evidence(self, evidence_id: str, item: Dict[str, Any], poi_info: Dict[str, Any]) -> Evidence:
+        """証拠データをEvidenceオブジェクトに変換してPOIに配置"""
+        return Evidence(
+            evidence_id=evidence_id,
+            name=item["name"],
+            # 既定文は値がない場合のみ組み立てる
+            description=item.get("description") or f"詳しい情報は{poi_info['name']}で発見してください",
+            discovery_text=item.get("discovery_text") or f"あなたは{poi_info['name']}で{item['name']}を発見した！これは事件に関わる重要な手がかりのようだ...",
+            importance=_IMPORTANCE_MAP[item["importance"]],
+            location=Location(
+                lat=poi_info["lat"],
+                lng=poi_info["lng"]
+            ),
+            poi_name=poi_info["name"],
+            poi_type=poi_info.get("type", "unknown"),
+            related_character=item.get("related_character"),
+            clue_text=item.get("clue_text")
         )
     
+    def _build_evidence_list(
+        self,
+        items: List[Dict[str, Any]],
+        poi_list: List[Dict[str, Any]]
+    ) -> List[Evidence]:
+        """証拠データをEvidenceオブジェクトに変換してPOIに配置"""
+        # 同名POIは従来通り先頭を優先
+        poi_by_name = {poi["name"]: poi for poi in reversed(poi_list)}
+        poi_count = len(poi_list)
+        build = self._build_evidence
+        
+        # POI情報を取得（見つからない場合は順番に割り当て）
+        return [
+            build(f"evidence_{i+1}", item, poi_by_name.get(item["poi_name"]) or poi_list[i % poi_count])
+            for i, item in enumerate(items)
+        ]
+    
     async def generate_evidence(
         self,
         scenario: Scenario,
         poi_list: List[Dict[str, Any]],
         evidence_count: int = 5
     ) -> List[Evidence]:
-        """証拠を生成して POI に配置"""
+        """証拠を生成して POI に配置
         
-        prompt = f"""
-以下のミステリーシナリオ用に、3つの証拠で論理的に犯人を特定できる証拠を生成してください。
-
-## シナリオ情報
-タイトル: {scenario.title}
-犯人: {scenario.culprit}
-犯行動機: {scenario.motive}
-犯行手口: {scenario.method}
-
-## 容疑者情報
-{json.dumps([{"name": s.name, "alibi": s.alibi, "motive": s.motive} for s in scenario.suspects], ensure_ascii=False)}
-
-## 利用可能なPOI
-{json.dumps(poi_list, ensure_ascii=False)}
-
-## 重要：3つの証拠の論理構造
-1. **第1の証拠（除外証拠）**: 容疑者Aが犯人でないことを示す証拠
-   - 例：容疑者Aが事件時刻に別の場所にいたことを証明する防犯カメラ映像
-   
-2. **第2の証拠（除外証拠）**: 容疑者Bが犯人でないことを示す証拠
-   - 例：容疑者Bのアリバイを裏付ける第三者の証言記録
-
-3. **第3の証拠（決定的証拠）**: 容疑者C（真犯人）の犯行を示す証拠
-   - 例：犯人しか知りえない情報、凶器に残された痕跡、決定的な矛盾の証明
-
-## 要求
-- 証拠数: 3個（必須）
-- 各証拠は異なるPOIに配置
-- 証拠の重要度: critical(1個：決定的証拠), important(2個：除外証拠)
-- 論理的に推理可能な構成にする
-
-## 出力形式（JSON）
-{{
-  "evidence": [
-    {{
-      "name": "証拠名",
-      "description": "証拠の詳細説明",
-      "discovery_text": "発見時のドラマチックな描写",
-      "importance": "critical|important|misleading|background",
-      "poi_name": "配置するPOI名（poi_listから選択）",
-      "related_character": "関連キャラクター名（オプション）",
-      "clue_text": "次のヒント（オプション）"
-    }}
-  ]
-}}
-
-証拠を生成してください。
-"""
+        3つの証拠は役割ごとに別々のリクエストとして並行生成する。
+        除外証拠の生成に失敗した場合は残りの証拠でゲームを継続するが、
+        決定的証拠がないと解けないため、決定的証拠は一度再生成し、それでも失敗した場合は例外とする。
+        """
         
-        for attempt in range(self.max_retries):
-            try:
-                # レート制限待機
-                await self._wait_for_rate_limit()
-                
-                logger.info(f"証拠生成開始 (試行 {attempt + 1}/{self.max_retries})")
-                
-                # Gemini APIで証拠生成  
-                if self.gemini_api_key:
-                    logger.info("Using Gemini API for evidence generation")
-                    response = await self._call_gemini_api(prompt)
-                    json_str = self._clean_json_response(response)
-                    evidence_data = json.loads(json_str)
-                else:
-                    # APIキーがない場合はモックを使用
-                    logger.info("No API key, using mock evidence data")
-                    evidence_data = {
-                    "evidence": [
-                        {
-                            "name": "血痕の付いた花瓶",
-                            "description": "コミュニティセンター会議室の床に落ちていた陶製の花瓶。被害者の血液と複数人の指紋が付着している。",
-                            "discovery_text": "会議室の床に散らばった花瓶の破片を発見した。底の部分に血痕があり、持ち手部分には複数の指紋が確認できる。田中、佐藤、鈴木の指紋が全て検出された...",
-                            "importance": "critical",
-                            "poi_name": poi_list[0]["name"] if poi_list else "近所の公園",
-                            "related_character": "全容疑者",
-                            "clue_text": "全員の指紋があるため、まだ犯人を特定できない"
-                        },
-                        {
-                            "name": "破れた騒音苦情書",
-                            "description": "ゴミ箱から発見された、田中直筆の騒音苦情書。山田に対する強い怒りの言葉が書かれ、最後に「もう我慢の限界だ」と記されている。",
-                            "discovery_text": "ゴミ箱の中から破り捨てられた苦情書を発見した。田中の直筆で書かれており、山田への激しい怒りと「今夜話し合いに行く」という予告が記されている...",
-                            "importance": "important", 
-                            "poi_name": poi_list[1]["name"] if len(poi_list) > 1 else "ニュータウン広場",
-                            "related_character": "田中太郎",
-                            "clue_text": "田中が事件当夜に山田と会う予定だったことを示す"
-                        },
-                        {
-                            "name": "防犯カメラの映像",
-                            "description": "会議終了後の映像記録。佐藤と鈴木は8時45分に帰宅、田中のみ9時まで残り、その後会議室へ向かう姿が記録されている。",
-                            "discovery_text": "防犯カメラの映像を詳しく分析すると、他の参加者は早めに帰宅しているが、田中だけが最後まで残り、一人で会議室に向かっている決定的な瞬間が記録されていた...",
-                            "importance": "critical",
-                            "poi_name": poi_list[2]["name"] if len(poi_list) > 2 else "港北ニュータウン駅",
-                            "related_character": "田中太郎",
-                            "clue_text": "他の容疑者にはアリバイがあり、田中のみが犯行可能時間に現場にいた"
-                        }
-                    ]
-                }
-                evidence_list = []
-                
-                for i, item in enumerate(evidence_data["evidence"]):
-                    # POI情報を取得
-                    poi_info = next(
-                        (poi for poi in poi_list if poi["name"] == item["poi_name"]),
-                        poi_list[i % len(poi_list)]  # フォールバック
-                    )
-                    
-                    evidence = Evidence(
-                        evidence_id=f"evidence_{i+1}",
-                        name=item["name"],
-                        description=item.get("description", f"詳しい情報は{poi_info['name']}で発見してください"),
-                        discovery_text=item.get("discovery_text", f"あなたは{poi_info['name']}で{item['name']}を発見した！これは事件に関わる重要な手がかりのようだ..."),
-                        importance=EvidenceImportance(item["importance"]),
-                        location=Location(
-                            lat=poi_info["lat"],
-                            lng=poi_info["lng"]
-                        ),
-                        poi_name=poi_info["name"],
-                        poi_type=poi_info.get("type", "unknown"),
-                        related_character=item.get("related_character"),
-                        clue_text=item.get("clue_text")
-                    )
-                    evidence_list.append(evidence)
-                
-                logger.info(f"証拠生成成功: {len(evidence_list)}個の証拠を生成")
-                return evidence_list
-                
-            except asyncio.TimeoutError:
-                logger.warning(f"証拠生成がタイムアウトしました (試行 {attempt + 1})")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError("証拠生成がタイムアウトしました")
-                    
-            except json.JSONDecodeError as e:
-                logger.warning(f"証拠生成JSONパースエラー (試行 {attempt + 1}): {e}")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError(f"証拠生成のレスポンス形式が不正です: {str(e)}")
-                    
-            except Exception as e:
-                logger.error(f"証拠生成エラー (試行 {attempt + 1}): {e}")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError(f"証拠生成に失敗しました: {str(e)}")
+        cache_key = self._build_evidence_key(scenario, poi_list, evidence_count)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return _EVIDENCE_LIST_ADAPTER.validate_json(cached)
         
-        raise RuntimeError("最大リトライ回数を超えました")
+        if not self.gemini_api_key:
+            # APIキーがない場合はモックを使用
+            logger.info("No API key, using mock evidence data")
+            items = [
+                {**item, "poi_name": poi_list[i]["name"] if i < len(poi_list) else default_poi_name}
+                for i, (item, default_poi_name) in enumerate(_MOCK_EVIDENCE)
+            ]
+            return self._build_evidence_list(items, poi_list)
+        
+        logger.info("Using Gemini API for evidence generation")
+        # 容疑者情報は全証拠・全リトライで共通のため一度だけシリアライズ
+        suspects_json = orjson.dumps(
+            [{"name": s.name, "alibi": s.alibi, "motive": s.motive} for s in scenario.suspects]
+        ).decode()
+        assignments = self._plan_evidence_assignments(scenario, poi_list)
+        
+        # 各証拠を並行生成（同時実行数はGemini呼び出し側のセマフォで制限）
+        results = await asyncio.gather(
+            *(self._generate_single_evidence(scenario, suspects_json, assignment) for assignment in assignments),
+            return_exceptions=True
+        )
+        
+        evidence_list = []
+        for assignment, result in zip(assignments, results):
+            if isinstance(result, Exception) and assignment["importance"] == "critical":
+                logger.warning("決定的証拠の生成失敗のため再生成: %s", result)
+                try:
+                    result = await self._generate_single_evidence(scenario, suspects_json, assignment)
+                except Exception as e:
+                    raise RuntimeError("証拠生成に失敗しました: 決定的証拠を生成できません") from e
+            if isinstance(result, Exception):
+                logger.warning("証拠生成失敗のためスキップ (%s): %s", assignment['importance'], result)
+                continue
+            result.evidence_id = f"evidence_{len(evidence_list) + 1}"
+            evidence_list.append(result)
+        
+        logger.info("証拠生成成功: %d個の証拠を生成", len(evidence_list))
+        
+        # 全件生成できた場合のみキャッシュ
+        if len(evidence_list) == len(assignments):
+            await self._set_cached_response(
+                cache_key,
+                orjson.dumps([evidence.model_dump(mode="json") for evidence in evidence_list]).decode()
+            )
+        return evidence_list
     
     async def judge_deduction(
         self,
@@ -1043,108 +1943,60 @@ JSON出力:
     ) -> List[CharacterReaction]:
         """推理を判定し、キャラクター反応を生成"""
         
+        cache_key = self._build_deduction_key(scenario, suspect_name, reasoning)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return _REACTION_LIST_ADAPTER.validate_json(cached)
+        
         is_correct = scenario.is_culprit(suspect_name)
-        culprit_character = scenario.culprit_character
-        accused_character = scenario.get_suspect_by_name(suspect_name)
         
-        prompt = f"""
-推理小説の結末シーンを作成してください。
-
-## シナリオ
-タイトル: {scenario.title}
-真犯人: {scenario.culprit}
-犯行動機: {scenario.motive}
-
-## プレイヤーの推理
-推理した犯人: {suspect_name}
-正解: {"正解" if is_correct else "不正解"}
-
-## キャラクター情報
-{json.dumps([
-    {
-        "name": c.name, 
-        "temperament": c.temperament.value,
-        "personality": c.personality
-    } for c in scenario.suspects
-], ensure_ascii=False)}
-
-## 要求
-推理結果に応じた各キャラクターの反応を生成。
-
-## 出力形式（JSON）
-{{
-  "reactions": [
-    {{
-      "character_name": "キャラクター名",
-      "reaction": "反応テキスト（気質に応じて）",
-      "reaction_type": "confession|denial|surprise|praise",
-      "emotion_intensity": 0.8
-    }}
-  ]
-}}
-
-キャラクター反応を生成してください。
-"""
+        # キャラクター情報はリトライ間で不変のため一度だけシリアライズ
+        characters_json = orjson.dumps([
+            {
+                "name": c.name, 
+                "temperament": c.temperament.value,
+                "personality": c.personality
+            } for c in scenario.suspects
+        ]).decode()
         
-        for attempt in range(self.max_retries):
-            try:
-                # レート制限待機
-                await self._wait_for_rate_limit()
-                
-                logger.info(f"推理判定開始 (試行 {attempt + 1}/{self.max_retries})")
-                
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        self.model.generate_content,
-                        prompt
-                    ),
-                    timeout=get_settings().api.scenario_generation_timeout if hasattr(get_settings().api, 'scenario_generation_timeout') else 30
+        # 固定の要求・出力形式は DEDUCTION_SYSTEM_INSTRUCTION 側に置き、ここでは可変部分のみ作成
+        prompt = _DEDUCTION_PROMPT_TPL.substitute(
+            title=scenario.title,
+            culprit=scenario.culprit,
+            motive=scenario.motive,
+            suspect_name=suspect_name,
+            verdict="正解" if is_correct else "不正解",
+            characters_json=characters_json
+        )
+        
+        def build_reactions(reaction_data: Dict[str, Any]) -> List[CharacterReaction]:
+            # 反応の対象キャラクターは容疑者の索引から引き、容疑者以外への反応は除外
+            find_suspect = scenario.get_suspect_by_name
+            return [
+                CharacterReaction(
+                    character_name=item["character_name"],
+                    reaction=item["reaction"],
+                    reaction_type=item["reaction_type"],
+                    temperament=character.temperament,
+                    emotion_intensity=item.get("emotion_intensity", 0.5)
                 )
-                
-                json_str = self._clean_json_response(response.text)
-                reaction_data = json.loads(json_str)
-                reactions = []
-                
-                for item in reaction_data["reactions"]:
-                    character = scenario.get_suspect_by_name(item["character_name"])
-                    if character:
-                        reaction = CharacterReaction(
-                            character_name=item["character_name"],
-                            reaction=item["reaction"],
-                            reaction_type=item["reaction_type"],
-                            temperament=character.temperament,
-                            emotion_intensity=item.get("emotion_intensity", 0.5)
-                        )
-                        reactions.append(reaction)
-                
-                logger.info(f"推理判定成功: {len(reactions)}個の反応を生成")
-                return reactions
-                
-            except asyncio.TimeoutError:
-                logger.warning(f"推理判定がタイムアウトしました (試行 {attempt + 1})")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError("推理判定がタイムアウトしました")
-                    
-            except json.JSONDecodeError as e:
-                logger.warning(f"推理判定JSONパースエラー (試行 {attempt + 1}): {e}")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError(f"推理判定のレスポンス形式が不正です: {str(e)}")
-                    
-            except Exception as e:
-                logger.error(f"推理判定エラー (試行 {attempt + 1}): {e}")
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                else:
-                    raise RuntimeError(f"推理判定に失敗しました: {str(e)}")
+                for item in reaction_data["reactions"]
+                if (character := find_suspect(item["character_name"]))
+            ]
         
-        raise RuntimeError("最大リトライ回数を超えました")
+        reactions = await self._call_gemini_with_retry(
+            prompt,
+            kind="deduction",
+            parse=build_reactions,
+            timeout=self._judge_timeout
+        )
+        
+        logger.info("推理判定成功: %d個の反応を生成", len(reactions))
+        await self._set_cached_response(
+            cache_key,
+            orjson.dumps([reaction.model_dump(mode="json") for reaction in reactions]).decode()
+        )
+        return reactions
 
 
 # グローバルAIサービスインスタンス
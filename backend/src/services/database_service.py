@@ -4,40 +4,281 @@
 """
 
 import os
-import json
+import re
+import shutil
+import time
 import asyncio
-from typing import Dict, Any, List, Optional
+import contextvars
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import weakref
+import orjson
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
+from ..config.settings import get_settings
 from ..core.logging import get_database_logger
 
 logger = get_database_logger(__name__)
 
-class LocalFileDatabase:
+# 検索時に並行して読み込むファイル数の上限
+QUERY_READ_CONCURRENCY = 64
+
+# 読み込み時にdatetimeへ戻すフィールド（コレクション -> フィールド）
+# それ以外のISO文字列はそのまま返す（モデル側でdatetimeに変換される）
+DATETIME_FIELDS = {
+    "game_sessions": frozenset({"created_at", "updated_at", "completed_at", "last_question_time"}),
+    "game_history": frozenset({"completed_at"}),
+    "players": frozenset({"created_at", "updated_at"})
+}
+
+# Firestoreのヘルスチェック結果を再利用する秒数（ロードバランサーからの頻繁な確認でFirestoreを叩かない）
+HEALTH_CHECK_CACHE_TTL = 5.0
+
+# 追記専用コレクションのログファイル名（1行1ドキュメントのNDJSON）
+APPEND_LOG_NAME = "history.log"
+
+# 検索条件に使うフィールドの索引（コレクション -> フィールド）
+INDEXED_FIELDS = {
+    "game_sessions": ("player_id", "status")
+}
+
+
+class DocumentDatabase(ABC):
+    """ローカル用ドキュメントDBの共通処理（保存・取得・検索の実装は派生クラス）"""
+    
+    def __init__(self):
+        # ドキュメント単位の更新ロック（使用中のものだけ保持）
+        self._document_locks: "weakref.WeakValueDictionary[tuple, asyncio.Lock]" = weakref.WeakValueDictionary()
+    
+    def _document_lock(self, collection: str, document_id: str) -> asyncio.Lock:
+        """ドキュメントの読み込み・変更・保存を直列化するロックを取得
+        
+        保存はスレッドで実行され、その間に他の更新が同じドキュメントを読み込むと
+        片方の変更が失われるため、同じドキュメントへの更新は1つずつ行う。
+        """
+        key = (collection, document_id)
+        lock = self._document_locks.get(key)
+        if lock is None:
+            lock = self._document_locks[key] = asyncio.Lock()
+        return lock
+    
+    @abstractmethod
+    async def save_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> bool:
+        """ドキュメントを保存"""
+    
+    @abstractmethod
+    async def get_document(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        """ドキュメントを取得"""
+    
+    @abstractmethod
+    async def delete_document(self, collection: str, document_id: str) -> bool:
+        """ドキュメントを削除"""
+    
+    @abstractmethod
+    async def query_documents_where(
+        self,
+        collection: str,
+        conditions: Dict[str, Any],
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """すべての条件（フィールド == 値）に一致するドキュメントを検索"""
+    
+    @abstractmethod
+    def close(self) -> None:
+        """ファイル・接続などのリソースを解放（シャットダウン時に呼ぶ）"""
+    
+    async def append_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> bool:
+        """更新しないドキュメントを追記保存（既定は通常の保存）"""
+        return await self.save_document(collection, document_id, data)
+    
+    async def update_document(self, collection: str, document_id: str, update_data: Dict[str, Any]) -> bool:
+        """ドキュメントを更新"""
+        try:
+            async with self._document_lock(collection, document_id):
+                existing_data = await self.get_document(collection, document_id)
+                if existing_data is None:
+                    return False
+                
+                # データをマージ
+                existing_data.update(update_data)
+                existing_data["updated_at"] = datetime.now()
+                
+                return await self.save_document(collection, document_id, existing_data)
+            
+        except Exception as e:
+            logger.error(f"ドキュメント更新エラー: {e}")
+            return False
+
+    async def update_game_scenario(self, game_id: str, enhanced_scenario):
+        """ゲームセッションのシナリオ部分のみ更新"""
+        try:
+            async with self._document_lock("game_sessions", game_id):
+                # 既存ゲームデータを取得
+                existing_data = await self.get_document("game_sessions", game_id)
+                if not existing_data:
+                    raise ValueError(f"Game session not found: {game_id}")
+                
+                # シナリオ部分を更新
+                if hasattr(enhanced_scenario, 'dict'):
+                    existing_data['scenario'] = enhanced_scenario.dict()
+                else:
+                    existing_data['scenario'] = enhanced_scenario
+                
+                existing_data['updated_at'] = datetime.utcnow().isoformat()
+                
+                # ファイルに保存
+                await self.save_document("game_sessions", game_id, existing_data)
+            
+        except Exception as e:
+            logger.error(f"Failed to update game scenario in local DB: {e}")
+            raise
+
+    async def update_game_evidence(self, game_id: str, enhanced_evidence):
+        """ゲームセッションの証拠リスト部分のみ更新"""
+        try:
+            async with self._document_lock("game_sessions", game_id):
+                # 既存ゲームデータを取得
+                existing_data = await self.get_document("game_sessions", game_id)
+                if not existing_data:
+                    raise ValueError(f"Game session not found: {game_id}")
+                
+                # 証拠リストを更新
+                evidence_data = []
+                for ev in enhanced_evidence:
+                    if hasattr(ev, 'dict'):
+                        evidence_data.append(ev.dict())
+                    else:
+                        evidence_data.append(ev)
+                
+                existing_data['evidence_list'] = evidence_data
+                existing_data['updated_at'] = datetime.utcnow().isoformat()
+                
+                # ファイルに保存
+                await self.save_document("game_sessions", game_id, existing_data)
+            
+        except Exception as e:
+            logger.error(f"Failed to update game evidence in local DB: {e}")
+            raise
+    
+    async def query_documents(
+        self, 
+        collection: str, 
+        field: str = None, 
+        value: Any = None, 
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """ドキュメントを検索"""
+        conditions = {field: value} if field and value is not None else {}
+        return await self.query_documents_where(collection, conditions, limit)
+    
+    def _deserialize_data(self, collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """データのデシリアライゼーション（日時フィールドのISO文字列のみdatetimeに変換）"""
+        for key in DATETIME_FIELDS.get(collection, ()):
+            value = data.get(key)
+            if isinstance(value, str):
+                try:
+                    data[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                except ValueError:
+                    pass
+        return data
+
+
+class LocalFileDatabase(DocumentDatabase):
     """ローカルファイルベースのデータベース（開発用）"""
     
-    def __init__(self, data_dir: str = "local_db"):
+    def __init__(self, data_dir: str = "local_db", pretty_json: bool = False, inplace_updates: bool = False):
+        super().__init__()
         self.data_dir = Path(data_dir)
+        self._json_option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty_json else 0)
+        self._inplace_updates = inplace_updates
         self.data_dir.mkdir(exist_ok=True)
         
         # コレクション別ディレクトリを作成
         (self.data_dir / "game_sessions").mkdir(exist_ok=True)
         (self.data_dir / "players").mkdir(exist_ok=True) 
         (self.data_dir / "game_history").mkdir(exist_ok=True)
+        
+        # 追記ログのファイルディスクリプタ（コレクション -> fd、開いたまま使い回す）
+        self._append_fds: Dict[str, int] = {}
+        self._append_lock = threading.Lock()
+        
+        # フィールド値 -> ドキュメントIDの索引（全ファイルを読む検索を避ける）
+        index_path = self.data_dir / "_index.sqlite3"
+        rebuild_index = not index_path.exists()
+        self._index_lock = threading.Lock()
+        self._index_conn = sqlite3.connect(str(index_path), check_same_thread=False, isolation_level=None)
+        self._index_conn.execute("PRAGMA journal_mode=WAL")
+        self._index_conn.execute(
+            "CREATE TABLE IF NOT EXISTS field_index ("
+            "collection TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, doc_id TEXT NOT NULL)"
+        )
+        self._index_conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_field_value ON field_index (collection, field, value)"
+        )
+        self._index_conn.execute("CREATE INDEX IF NOT EXISTS idx_doc ON field_index (collection, doc_id)")
+        if rebuild_index:
+            self._rebuild_index()
     
     def _get_file_path(self, collection: str, document_id: str) -> Path:
+        """ドキュメントの保存先（IDのハッシュで2階層のシャードに分散し、1ディレクトリのファイル数を抑える）"""
+        digest = hashlib.blake2b(document_id.encode(), digest_size=2).hexdigest()
+        return self.data_dir / collection / digest[:2] / digest[2:] / f"{document_id}.json"
+    
+    def _get_legacy_file_path(self, collection: str, document_id: str) -> Path:
+        """シャード導入前の保存先（コレクション直下）"""
         return self.data_dir / collection / f"{document_id}.json"
     
+    def _find_file_path(self, collection: str, document_id: str) -> Optional[Path]:
+        """既存ドキュメントのファイルを取得（移行前のコレクション直下のファイルも参照）"""
+        for file_path in (self._get_file_path(collection, document_id), self._get_legacy_file_path(collection, document_id)):
+            if file_path.exists():
+                return file_path
+        return None
+    
+    def _list_document_paths(self, collection_dir: Path) -> List[str]:
+        """コレクション内の全ドキュメントファイル（シャード・コレクション直下の両方）"""
+        return [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(collection_dir)
+            for name in names
+            if name.endswith(".json")
+        ]
+    
+    def migrate_to_shards(self) -> int:
+        """コレクション直下のドキュメントファイルをシャードディレクトリへ移動（一度だけ実行）
+        
+        移動したファイル数を返す。移行前のファイルも読み込みは可能なため、実行は任意。
+        """
+        moved = 0
+        for collection_dir in self.data_dir.iterdir():
+            if not collection_dir.is_dir():
+                continue
+            for entry in os.scandir(collection_dir):
+                if not (entry.is_file() and entry.name.endswith(".json")):
+                    continue
+                file_path = self._get_file_path(collection_dir.name, entry.name[:-len(".json")])
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(entry.path, file_path)
+                moved += 1
+        logger.info(f"ローカルDBのシャード移行完了: {moved}件")
+        return moved
+    
     async def save_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> bool:
-        """ドキュメントを保存"""
+        """ドキュメントを保存
+        
+        書き込みと索引の更新はスレッドで実行し、一時ファイルからの置き換えで途中状態を読まれないようにする。
+        """
         try:
-            file_path = self._get_file_path(collection, document_id)
-            
-            # datetimeオブジェクトをISOフォーマットに変換
-            serializable_data = self._serialize_data(data)
+            # datetimeはorjsonがISOフォーマットに変換
+            payload = orjson.dumps(data, option=self._json_option)
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(serializable_data, f, ensure_ascii=False, indent=2)
+            await asyncio.to_thread(self._save_file, collection, document_id, payload, data)
             
             logger.db_operation(
                 operation="save_document",
@@ -57,219 +298,483 @@ class LocalFileDatabase:
             )
             return False
     
+    async def update_document(self, collection: str, document_id: str, update_data: Dict[str, Any]) -> bool:
+        """ドキュメントを更新
+        
+        読み込み・マージ・書き込みを1回のスレッド実行で行い、取得と保存を別々に行う場合の
+        ファイルオープン・パースの重複を避ける。同じドキュメントへの更新はロックで1つずつ行う。
+        """
+        try:
+            async with self._document_lock(collection, document_id):
+                file_path = self._find_file_path(collection, document_id)
+                if file_path is None:
+                    return False
+                
+                await asyncio.to_thread(self._update_file, collection, document_id, file_path, update_data)
+            
+            logger.db_operation(
+                operation="update_document",
+                collection=collection,
+                document_id=document_id,
+                success=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.error(f"ドキュメント更新エラー: {e}")
+            return False
+    
+    def _update_file(
+        self,
+        collection: str,
+        document_id: str,
+        file_path: Path,
+        update_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """ファイルを読み込んでマージ結果を書き戻し、索引を更新する（スレッドで実行）
+        
+        inplace_updates が有効な場合は同じファイルをその場で書き換える。
+        既定では一時ファイルからの置き換えで、書き込み途中の内容を残さない。
+        """
+        if self._inplace_updates:
+            with open(file_path, 'r+b') as f:
+                data = orjson.loads(f.read())
+                data.update(update_data)
+                data["updated_at"] = datetime.now()
+                f.seek(0)
+                f.write(orjson.dumps(data, option=self._json_option))
+                f.truncate()
+            self._update_index(collection, document_id, data)
+            return data
+        
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
+        data.update(update_data)
+        data["updated_at"] = datetime.now()
+        self._write_file(self._get_file_path(collection, document_id), orjson.dumps(data, option=self._json_option))
+        # 移行前のファイルを更新した場合はシャードへ移す
+        if file_path != self._get_file_path(collection, document_id):
+            file_path.unlink(missing_ok=True)
+        self._update_index(collection, document_id, data)
+        return data
+    
+    async def append_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> bool:
+        """ドキュメントをコレクションの追記ログに1行追加（ゲーム履歴など更新しないもの）
+        
+        ドキュメントごとのファイル作成・置き換えを行わず、開いたままのファイルに追記する。
+        O_APPEND での1回の書き込みのため、並行して追記しても行は混ざらない。
+        """
+        try:
+            record = {"id": document_id, **data}
+            payload = orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+            os.write(self._get_append_fd(collection), payload)
+            
+            logger.db_operation(
+                operation="append_document",
+                collection=collection,
+                document_id=document_id,
+                success=True
+            )
+            return True
+            
+        except Exception as e:
+            logger.db_error(
+                operation="append_document",
+                error_message="Document append failed",
+                collection=collection,
+                document_id=document_id,
+                exception=e
+            )
+            return False
+    
+    def _get_append_fd(self, collection: str) -> int:
+        """コレクションの追記ログのファイルディスクリプタを取得（初回のみ開く）"""
+        fd = self._append_fds.get(collection)
+        if fd is None:
+            with self._append_lock:
+                fd = self._append_fds.get(collection)
+                if fd is None:
+                    log_path = self.data_dir / collection / APPEND_LOG_NAME
+                    log_path.parent.mkdir(parents=True, exist_ok=True)
+                    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    self._append_fds[collection] = fd
+        return fd
+    
+    def read_appended(self, collection: str) -> List[Dict[str, Any]]:
+        """コレクションの追記ログを全件読み込み"""
+        log_path = self.data_dir / collection / APPEND_LOG_NAME
+        if not log_path.exists():
+            return []
+        with open(log_path, 'rb') as f:
+            return [self._deserialize_data(collection, orjson.loads(line)) for line in f if line.strip()]
+    
+    def close(self) -> None:
+        """追記ログと索引の接続を閉じる"""
+        with self._append_lock:
+            for fd in self._append_fds.values():
+                os.close(fd)
+            self._append_fds.clear()
+        self._index_conn.close()
+    
     async def get_document(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
         """ドキュメントを取得"""
         try:
-            file_path = self._get_file_path(collection, document_id)
+            file_path = self._find_file_path(collection, document_id)
             
-            if not file_path.exists():
+            if file_path is None:
                 return None
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                data = orjson.loads(f.read())
             
             # ISO文字列をdatetimeに変換
-            return self._deserialize_data(data)
+            return self._deserialize_data(collection, data)
             
         except Exception as e:
             logger.error(f"ドキュメント取得エラー: {e}")
             return None
     
-    async def update_document(self, collection: str, document_id: str, update_data: Dict[str, Any]) -> bool:
-        """ドキュメントを更新"""
+    async def delete_document(self, collection: str, document_id: str) -> bool:
+        """ドキュメントを削除（ファイル削除と索引の更新はスレッドで実行）"""
         try:
-            existing_data = await self.get_document(collection, document_id)
-            if existing_data is None:
-                return False
-            
-            # データをマージ
-            existing_data.update(update_data)
-            existing_data["updated_at"] = datetime.now()
-            
-            return await self.save_document(collection, document_id, existing_data)
+            await asyncio.to_thread(self._delete_file, collection, document_id)
+            return True
             
         except Exception as e:
-            logger.error(f"ドキュメント更新エラー: {e}")
+            logger.error(f"ドキュメント削除エラー: {e}")
             return False
-
-    async def update_game_scenario(self, game_id: str, enhanced_scenario):
-        """ゲームセッションのシナリオ部分のみ更新"""
+    
+    async def query_documents_where(
+        self,
+        collection: str,
+        conditions: Dict[str, Any],
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """すべての条件（フィールド == 値）に一致するドキュメントを検索
+        
+        条件がすべて索引付きのフィールドであれば、索引で対象のファイルのみに絞って読み込む。
+        ファイルの読み込み・パースはスレッドで並行実行し、イベントループを塞がない。
+        """
         try:
-            # 既存ゲームデータを取得
-            existing_data = await self.get_document("game_sessions", game_id)
-            if not existing_data:
-                raise ValueError(f"Game session not found: {game_id}")
-            
-            # シナリオ部分を更新
-            if hasattr(enhanced_scenario, 'dict'):
-                existing_data['scenario'] = enhanced_scenario.dict()
+            collection_dir = self.data_dir / collection
+            if not collection_dir.exists():
+                return []
+            
+            doc_ids = await asyncio.to_thread(self._find_indexed_ids, collection, conditions)
+            if doc_ids is not None:
+                paths = [
+                    str(file_path)
+                    for file_path in (self._find_file_path(collection, doc_id) for doc_id in doc_ids)
+                    if file_path is not None
+                ]
             else:
-                existing_data['scenario'] = enhanced_scenario
+                paths = self._list_document_paths(collection_dir)
+                if not conditions:
+                    # 条件なしの場合は先頭 limit 件のみ読み込む
+                    paths = paths[:limit]
+            
+            semaphore = asyncio.Semaphore(QUERY_READ_CONCURRENCY)
+            
+            async def read(path: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await asyncio.to_thread(self._read_document, collection, path)
             
-            existing_data['updated_at'] = datetime.utcnow().isoformat()
+            documents = await asyncio.gather(*(read(path) for path in paths), return_exceptions=True)
+            
+            results = []
+            for path, data in zip(paths, documents):
+                if isinstance(data, Exception):
+                    logger.warning(f"ファイル読み取りエラー: {path}, {data}")
+                    continue
+                
+                data["id"] = Path(path).stem  # ファイル名をIDとして追加
+                
+                # フィルタリング（索引経由の場合も読み込んだ内容で確認）
+                if any(data.get(name) != expected for name, expected in conditions.items()):
+                    continue
+                results.append(data)
+                
+                if len(results) >= limit:
+                    break
             
-            # ファイルに保存
-            await self.save_document("game_sessions", game_id, existing_data)
+            return results
             
         except Exception as e:
-            logger.error(f"Failed to update game scenario in local DB: {e}")
+            logger.error(f"ドキュメント検索エラー: {e}")
+            return []
+    
+    def _update_index(self, collection: str, document_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """ドキュメントの索引を更新（data が None の場合は削除）"""
+        fields = INDEXED_FIELDS.get(collection)
+        if not fields:
+            return
+        
+        rows = [
+            (collection, name, orjson.dumps(data[name]).decode(), document_id)
+            for name in fields
+            if data is not None and data.get(name) is not None
+        ]
+        with self._index_lock:
+            self._index_conn.execute("BEGIN")
+            try:
+                self._index_conn.execute(
+                    "DELETE FROM field_index WHERE collection = ? AND doc_id = ?", (collection, document_id)
+                )
+                self._index_conn.executemany(
+                    "INSERT INTO field_index (collection, field, value, doc_id) VALUES (?, ?, ?, ?)", rows
+                )
+                self._index_conn.execute("COMMIT")
+            except Exception:
+                self._index_conn.execute("ROLLBACK")
+                raise
+    
+    def _find_indexed_ids(self, collection: str, conditions: Dict[str, Any]) -> Optional[List[str]]:
+        """索引から条件に一致するドキュメントIDを取得（索引で絞れない条件の場合はNone）"""
+        fields = INDEXED_FIELDS.get(collection, ())
+        if not conditions or any(name not in fields for name in conditions):
+            return None
+        
+        query = " INTERSECT ".join(
+            "SELECT doc_id FROM field_index WHERE collection = ? AND field = ? AND value = ?" for _ in conditions
+        )
+        params = [
+            param
+            for name, expected in conditions.items()
+            for param in (collection, name, orjson.dumps(expected).decode())
+        ]
+        with self._index_lock:
+            return [row[0] for row in self._index_conn.execute(query, params)]
+    
+    def _rebuild_index(self) -> None:
+        """既存のドキュメントファイルから索引を作成"""
+        for collection in INDEXED_FIELDS:
+            collection_dir = self.data_dir / collection
+            if not collection_dir.exists():
+                continue
+            for path in self._list_document_paths(collection_dir):
+                try:
+                    with open(path, 'rb') as f:
+                        data = orjson.loads(f.read())
+                    self._update_index(collection, Path(path).stem, data)
+                except Exception as e:
+                    logger.warning(f"索引作成時のファイル読み取りエラー: {path}, {e}")
+    
+    def _save_file(self, collection: str, document_id: str, payload: bytes, data: Dict[str, Any]) -> None:
+        """ドキュメントファイルを書き込んで索引を更新（スレッドで実行）"""
+        self._write_file(self._get_file_path(collection, document_id), payload)
+        # 移行前のファイルが残っていれば削除（読み込み時に古い内容を参照しないため）
+        self._get_legacy_file_path(collection, document_id).unlink(missing_ok=True)
+        self._update_index(collection, document_id, data)
+    
+    def _delete_file(self, collection: str, document_id: str) -> None:
+        """ドキュメントファイルを削除して索引から除く（スレッドで実行）"""
+        for file_path in (self._get_file_path(collection, document_id), self._get_legacy_file_path(collection, document_id)):
+            if file_path.exists():
+                file_path.unlink()
+                logger.debug(f"ドキュメント削除成功: {collection}/{document_id}")
+        self._update_index(collection, document_id, None)
+    
+    def _write_file(self, file_path: Path, payload: bytes) -> None:
+        """同じディレクトリの一時ファイルに書き込んでから置き換える（スレッドで実行）"""
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=file_path.parent, suffix=".tmp", delete=False) as f:
+            f.write(payload)
+        try:
+            os.replace(f.name, file_path)
+        except BaseException:
+            os.unlink(f.name)
             raise
+    
+    def _read_document(self, collection: str, path: str) -> Dict[str, Any]:
+        """ドキュメントファイルを読み込んでデシリアライズ（スレッドで実行）"""
+        with open(path, 'rb') as f:
+            return self._deserialize_data(collection, orjson.loads(f.read()))
 
-    async def update_game_evidence(self, game_id: str, enhanced_evidence):
-        """ゲームセッションの証拠リスト部分のみ更新"""
+
+class SqliteDatabase(DocumentDatabase):
+    """SQLite 1ファイルのローカルデータベース（開発用）
+    
+    ドキュメントはJSON文字列で保持し、ゲームセッションの player_id・status には
+    式インデックスを張って、プレイヤーのアクティブゲーム検索を索引のみで行う。
+    """
+    
+    # 式インデックスを使える条件にするため、フィールドのパスはSQLに直接埋め込む（名前は英数字のみ許可）
+    _FIELD_NAME_PATTERN = re.compile(r"\w+")
+    
+    def __init__(self, data_dir: str = "local_db"):
+        super().__init__()
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.data_dir / "db.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (collection, id))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_game_sessions_player_status ON docs "
+            "(json_extract(data, '$.player_id'), json_extract(data, '$.status')) "
+            "WHERE collection = 'game_sessions'"
+        )
+    
+    def _execute(self, query: str, params: tuple = ()) -> List[tuple]:
+        """SQLを実行して全行を取得（スレッドで実行）"""
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+    
+    def close(self) -> None:
+        """データベースの接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+    
+    async def save_document(self, collection: str, document_id: str, data: Dict[str, Any]) -> bool:
+        """ドキュメントを保存"""
         try:
-            # 既存ゲームデータを取得
-            existing_data = await self.get_document("game_sessions", game_id)
-            if not existing_data:
-                raise ValueError(f"Game session not found: {game_id}")
-            
-            # 証拠リストを更新
-            evidence_data = []
-            for ev in enhanced_evidence:
-                if hasattr(ev, 'dict'):
-                    evidence_data.append(ev.dict())
-                else:
-                    evidence_data.append(ev)
+            payload = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+            await asyncio.to_thread(
+                self._execute,
+                "INSERT OR REPLACE INTO docs (collection, id, data) VALUES (?, ?, ?)",
+                (collection, document_id, payload)
+            )
             
-            existing_data['evidence_list'] = evidence_data
-            existing_data['updated_at'] = datetime.utcnow().isoformat()
+            logger.db_operation(
+                operation="save_document",
+                collection=collection,
+                document_id=document_id,
+                success=True
+            )
+            return True
             
-            # ファイルに保存
-            await self.save_document("game_sessions", game_id, existing_data)
+        except Exception as e:
+            logger.db_error(
+                operation="save_document",
+                error_message="Document save failed",
+                collection=collection,
+                document_id=document_id,
+                exception=e
+            )
+            return False
+    
+    async def get_document(self, collection: str, document_id: str) -> Optional[Dict[str, Any]]:
+        """ドキュメントを取得"""
+        try:
+            rows = await asyncio.to_thread(
+                self._execute, "SELECT data FROM docs WHERE collection = ? AND id = ?", (collection, document_id)
+            )
+            if not rows:
+                return None
+            return self._deserialize_data(collection, orjson.loads(rows[0][0]))
             
         except Exception as e:
-            logger.error(f"Failed to update game evidence in local DB: {e}")
-            raise
+            logger.error(f"ドキュメント取得エラー: {e}")
+            return None
     
     async def delete_document(self, collection: str, document_id: str) -> bool:
         """ドキュメントを削除"""
         try:
-            file_path = self._get_file_path(collection, document_id)
-            
-            if file_path.exists():
-                file_path.unlink()
-                logger.debug(f"ドキュメント削除成功: {collection}/{document_id}")
-            
+            await asyncio.to_thread(
+                self._execute, "DELETE FROM docs WHERE collection = ? AND id = ?", (collection, document_id)
+            )
             return True
             
         except Exception as e:
             logger.error(f"ドキュメント削除エラー: {e}")
             return False
     
-    async def query_documents(
-        self, 
-        collection: str, 
-        field: str = None, 
-        value: Any = None, 
+    async def query_documents_where(
+        self,
+        collection: str,
+        conditions: Dict[str, Any],
         limit: int = 100
     ) -> List[Dict[str, Any]]:
-        """ドキュメントを検索"""
+        """すべての条件（フィールド == 値）に一致するドキュメントを検索"""
         try:
-            collection_dir = self.data_dir / collection
-            if not collection_dir.exists():
-                return []
+            clauses = ["collection = ?"]
+            params: List[Any] = [collection]
+            for name, expected in conditions.items():
+                if not self._FIELD_NAME_PATTERN.fullmatch(name):
+                    raise ValueError(f"検索できないフィールド名です: {name}")
+                clauses.append(f"json_extract(data, '$.{name}') = ?")
+                # Enumなどを含め、保存時と同じJSONの値に揃える
+                params.append(orjson.loads(orjson.dumps(expected)))
+            params.append(limit)
             
-            results = []
-            for json_file in collection_dir.glob("*.json"):
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    data = self._deserialize_data(data)
-                    data["id"] = json_file.stem  # ファイル名をIDとして追加
-                    
-                    # フィルタリング
-                    if field and value is not None:
-                        if data.get(field) == value:
-                            results.append(data)
-                    else:
-                        results.append(data)
-                    
-                    if len(results) >= limit:
-                        break
-                        
-                except Exception as file_error:
-                    logger.warning(f"ファイル読み取りエラー: {json_file}, {file_error}")
-                    continue
+            rows = await asyncio.to_thread(
+                self._execute,
+                f"SELECT id, data FROM docs WHERE {' AND '.join(clauses)} LIMIT ?",
+                tuple(params)
+            )
             
+            results = []
+            for document_id, payload in rows:
+                data = self._deserialize_data(collection, orjson.loads(payload))
+                data["id"] = document_id
+                results.append(data)
             return results
             
         except Exception as e:
             logger.error(f"ドキュメント検索エラー: {e}")
             return []
-    
-    def _serialize_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """データのシリアライゼーション（JSON保存用）"""
-        serialized = {}
-        
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                serialized[key] = value.isoformat()
-            elif isinstance(value, dict):
-                serialized[key] = self._serialize_data(value)
-            elif isinstance(value, list):
-                serialized[key] = [
-                    self._serialize_data(item) if isinstance(item, dict) else 
-                    item.isoformat() if isinstance(item, datetime) else item
-                    for item in value
-                ]
-            else:
-                serialized[key] = value
-        
-        return serialized
-    
-    def _deserialize_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """データのデシリアライゼーション（JSON読み込み用）"""
-        deserialized = {}
-        
-        for key, value in data.items():
-            if isinstance(value, str) and self._is_iso_datetime(value):
-                deserialized[key] = datetime.fromisoformat(value)
-            elif isinstance(value, dict):
-                deserialized[key] = self._deserialize_data(value)
-            elif isinstance(value, list):
-                deserialized[key] = [
-                    self._deserialize_data(item) if isinstance(item, dict) else
-                    datetime.fromisoformat(item) if isinstance(item, str) and self._is_iso_datetime(item) else item
-                    for item in value
-                ]
-            else:
-                deserialized[key] = value
-        
-        return deserialized
-    
-    def _is_iso_datetime(self, value: str) -> bool:
-        """ISO形式のdatetime文字列かチェック"""
-        try:
-            datetime.fromisoformat(value.replace('Z', '+00:00'))
-            return True
-        except (ValueError, AttributeError):
-            return False
+
+
+# batch_writes() のブロック内で書き込みをまとめるFirestoreのAsyncWriteBatch（リクエスト処理ごとに独立）
+_firestore_write_batch: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar(
+    "firestore_write_batch", default=None
+)
+
+
+@dataclass
+class BatchWriteResult:
+    """batch_writes() の結果（ブロックを抜けた後に参照する）"""
+    committed: bool = True
+    error: Optional[str] = None
 
 
 class DatabaseService:
     """統合データベースサービス"""
     
+    # 直近のFirestoreヘルスチェック結果（取得時刻, 結果）
+    _health_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+    
     def __init__(self):
-        from ..config.settings import get_settings
         settings = get_settings()
         
         self.use_firestore = settings.database.use_firestore
         self.firestore_client = None
         self.local_db = None
+        self._local_db_backend = settings.database.local_db_backend
+        self._local_db_path = settings.database.local_db_path
+        self._local_db_pretty_json = settings.database.local_db_pretty_json
+        self._local_db_inplace_updates = settings.database.local_db_inplace_updates
         
         if self.use_firestore:
             self._initialize_firestore()
         else:
-            self.local_db = LocalFileDatabase()
-            logger.info("Using local file database", database_type="local_file")
+            self.local_db = self._create_local_db()
+            logger.info("Using local database", database_type=self._local_db_type)
+    
+    @property
+    def _local_db_type(self) -> str:
+        return "local_sqlite" if self._local_db_backend == "sqlite" else "local_file"
+    
+    def _create_local_db(self) -> DocumentDatabase:
+        """設定に応じたローカルDBを作成（file: ドキュメントごとのJSONファイル / sqlite: SQLite 1ファイル）"""
+        if self._local_db_backend == "sqlite":
+            return SqliteDatabase(self._local_db_path)
+        return LocalFileDatabase(
+            self._local_db_path,
+            pretty_json=self._local_db_pretty_json,
+            inplace_updates=self._local_db_inplace_updates
+        )
     
     def _initialize_firestore(self):
         """Firestore初期化"""
         try:
             from google.cloud import firestore
             
-            from ..config.settings import get_settings
             settings = get_settings()
             
             project_id = settings.database.project_id or 'detective-anywhere-local'
@@ -279,13 +784,71 @@ class DatabaseService:
                 os.environ['FIRESTORE_EMULATOR_HOST'] = settings.database.emulator_host
                 logger.info(f"Firestoreエミュレーターを使用: {settings.database.emulator_host}")
             
-            self.firestore_client = firestore.Client(project=project_id)
+            # 非同期クライアント（gRPCの往復中もイベントループを塞がない）
+            self.firestore_client = firestore.AsyncClient(project=project_id)
             logger.info("Firestoreクライアント初期化成功")
             
         except Exception as e:
             logger.warning(f"Firestore初期化失敗、ローカルDBにフォールバック: {e}")
             self.use_firestore = False
-            self.local_db = LocalFileDatabase()
+            self.local_db = self._create_local_db()
+    
+    def close(self) -> None:
+        """ローカルDB・Firestoreクライアントの接続を閉じる（シャットダウン時に呼ぶ）"""
+        if self.local_db is not None:
+            self.local_db.close()
+        if self.firestore_client is not None:
+            self.firestore_client.close()
+        logger.info("データベース接続を閉じました")
+    
+    @asynccontextmanager
+    async def batch_writes(self) -> AsyncIterator[BatchWriteResult]:
+        """ブロック内のFirestoreへの保存・更新を1回のコミットにまとめる
+        
+        ゲーム完了時のセッション更新と履歴保存など、続けて行う書き込みの往復を1回にする。
+        書き込みはブロックを抜けた時点で反映される（例外時は反映しない）。
+        コミットの失敗は例外にせずログに記録し、結果の committed を False にする
+        （バッチは一括で反映されるため、失敗時はブロック内のどの書き込みも反映されない）。
+        ローカルDBの場合は各書き込みをその場で実行する。
+        """
+        result = BatchWriteResult()
+        if not (self.use_firestore and self.firestore_client) or _firestore_write_batch.get() is not None:
+            yield result
+            return
+        
+        batch = self.firestore_client.batch()
+        token = _firestore_write_batch.set(batch)
+        try:
+            yield result
+        finally:
+            _firestore_write_batch.reset(token)
+        
+        if len(batch):
+            try:
+                await batch.commit()
+                logger.info(f"Firestore一括書き込み成功: {len(batch)}件")
+            except Exception as e:
+                logger.error(f"Firestore一括書き込みエラー: {e}")
+                result.committed = False
+                result.error = str(e)
+    
+    async def _set_document(self, doc_ref, data: Dict[str, Any], merge: bool = False) -> bool:
+        """Firestoreにドキュメントを保存（batch_writes() 内ではバッチに追加し True を返す）"""
+        batch = _firestore_write_batch.get()
+        if batch is not None:
+            batch.set(doc_ref, data, merge=merge)
+            return True
+        await doc_ref.set(data, merge=merge)
+        return False
+    
+    async def _update_document(self, doc_ref, data: Dict[str, Any]) -> bool:
+        """Firestoreのドキュメントを更新（batch_writes() 内ではバッチに追加し True を返す）"""
+        batch = _firestore_write_batch.get()
+        if batch is not None:
+            batch.update(doc_ref, data)
+            return True
+        await doc_ref.update(data)
+        return False
     
     async def save_game_session(self, game_id: str, game_data: Dict[str, Any]) -> bool:
         """ゲームセッションを保存"""
@@ -295,8 +858,8 @@ class DatabaseService:
         if self.use_firestore and self.firestore_client:
             try:
                 doc_ref = self.firestore_client.collection('game_sessions').document(game_id)
-                doc_ref.set(game_data)
-                logger.info(f"ゲームセッション保存成功 (Firestore): {game_id}")
+                queued = await self._set_document(doc_ref, game_data)
+                logger.info(f"ゲームセッション{'保存をバッチに追加' if queued else '保存成功'} (Firestore): {game_id}")
                 return True
             except Exception as e:
                 logger.error(f"Firestore保存エラー: {e}")
@@ -309,7 +872,7 @@ class DatabaseService:
         if self.use_firestore and self.firestore_client:
             try:
                 doc_ref = self.firestore_client.collection('game_sessions').document(game_id)
-                doc = doc_ref.get()
+                doc = await doc_ref.get()
                 
                 if doc.exists:
                     data = doc.to_dict()
@@ -327,13 +890,15 @@ class DatabaseService:
     
     async def update_game_session(self, game_id: str, update_data: Dict[str, Any]) -> bool:
         """ゲームセッションを更新"""
-        update_data["updated_at"] = datetime.now()
-        
         if self.use_firestore and self.firestore_client:
             try:
+                from google.cloud.firestore import SERVER_TIMESTAMP
+                
+                # 更新日時はサーバー側で設定
+                update_data["updated_at"] = SERVER_TIMESTAMP
                 doc_ref = self.firestore_client.collection('game_sessions').document(game_id)
-                doc_ref.update(update_data)
-                logger.info(f"ゲームセッション更新成功 (Firestore): {game_id}")
+                queued = await self._update_document(doc_ref, update_data)
+                logger.info(f"ゲームセッション{'更新をバッチに追加' if queued else '更新成功'} (Firestore): {game_id}")
                 return True
             except Exception as e:
                 logger.error(f"Firestore更新エラー: {e}")
@@ -347,7 +912,7 @@ class DatabaseService:
             if self.use_firestore and self.firestore_client:
                 # Firestore更新
                 doc_ref = self.firestore_client.collection('game_sessions').document(game_id)
-                await doc_ref.update({
+                await self._update_document(doc_ref, {
                     'scenario': enhanced_scenario.dict() if hasattr(enhanced_scenario, 'dict') else enhanced_scenario,
                     'updated_at': datetime.utcnow().isoformat()
                 })
@@ -370,7 +935,7 @@ class DatabaseService:
                 evidence_data = [
                     ev.dict() if hasattr(ev, 'dict') else ev for ev in enhanced_evidence
                 ]
-                await doc_ref.update({
+                await self._update_document(doc_ref, {
                     'evidence_list': evidence_data,
                     'updated_at': datetime.utcnow().isoformat()
                 })
@@ -392,9 +957,8 @@ class DatabaseService:
                         .where('player_id', '==', player_id)
                         .where('status', '==', 'active'))
                 
-                docs = query.stream()
                 results = []
-                for doc in docs:
+                async for doc in query.stream():
                     data = doc.to_dict()
                     data["id"] = doc.id
                     results.append(data)
@@ -405,19 +969,17 @@ class DatabaseService:
                 logger.error(f"Firestoreクエリエラー: {e}")
                 return []
         else:
-            all_games = await self.local_db.query_documents("game_sessions")
-            return [
-                game for game in all_games 
-                if game.get("player_id") == player_id and game.get("status") == "active"
-            ]
+            return await self.local_db.query_documents_where(
+                "game_sessions", {"player_id": player_id, "status": "active"}
+            )
     
     async def save_player_data(self, player_id: str, player_data: Dict[str, Any]) -> bool:
         """プレイヤーデータを保存"""
         if self.use_firestore and self.firestore_client:
             try:
                 doc_ref = self.firestore_client.collection('players').document(player_id)
-                doc_ref.set(player_data, merge=True)  # 既存データとマージ
-                logger.info(f"プレイヤーデータ保存成功 (Firestore): {player_id}")
+                queued = await self._set_document(doc_ref, player_data, merge=True)  # 既存データとマージ
+                logger.info(f"プレイヤーデータ{'保存をバッチに追加' if queued else '保存成功'} (Firestore): {player_id}")
                 return True
             except Exception as e:
                 logger.error(f"Firestoreプレイヤー保存エラー: {e}")
@@ -430,7 +992,7 @@ class DatabaseService:
         if self.use_firestore and self.firestore_client:
             try:
                 doc_ref = self.firestore_client.collection('players').document(player_id)
-                doc = doc_ref.get()
+                doc = await doc_ref.get()
                 
                 if doc.exists:
                     return doc.to_dict()
@@ -448,50 +1010,53 @@ class DatabaseService:
         if self.use_firestore and self.firestore_client:
             try:
                 doc_ref = self.firestore_client.collection('game_history').document(history_id)
-                doc_ref.set(history_data)
-                logger.info(f"ゲーム履歴保存成功 (Firestore): {history_id}")
+                queued = await self._set_document(doc_ref, history_data)
+                logger.info(f"ゲーム履歴{'保存をバッチに追加' if queued else '保存成功'} (Firestore): {history_id}")
                 return True
             except Exception as e:
                 logger.error(f"Firestore履歴保存エラー: {e}")
                 return False
         else:
-            return await self.local_db.save_document("game_history", history_id, history_data)
+            return await self.local_db.append_document("game_history", history_id, history_data)
     
     async def health_check(self) -> Dict[str, Any]:
-        """データベース接続のヘルスチェック"""
+        """データベース接続のヘルスチェック（データの書き込みは行わない）"""
+        if self.use_firestore and self.firestore_client and self._health_cache is not None:
+            checked_at, cached = self._health_cache
+            if time.monotonic() - checked_at < HEALTH_CHECK_CACHE_TTL:
+                return cached
+        
         health_info = {
-            "database_type": "firestore" if self.use_firestore else "local_file",
+            "database_type": "firestore" if self.use_firestore else self._local_db_type,
             "status": "unknown",
             "details": {}
         }
         
         try:
             if self.use_firestore and self.firestore_client:
-                # Firestoreへの簡単な読み取りテスト
-                test_collection = self.firestore_client.collection('_health_check')
-                list(test_collection.limit(1).stream())
+                # Firestoreへの1ドキュメントの読み取りテスト
+                await self.firestore_client.collection('_health_check').document('ping').get()
                 
                 health_info["status"] = "healthy"
                 health_info["details"]["firestore_connected"] = True
                 
             else:
-                # ローカルDBのヘルスチェック
-                test_data = {"test": "health_check", "timestamp": datetime.now()}
-                save_success = await self.local_db.save_document("_health", "test", test_data)
+                # ローカルDBは保存先ディレクトリの書き込み権限と空き容量のみ確認
+                data_dir = self.local_db.data_dir
+                writable = os.access(data_dir, os.W_OK)
+                free_bytes = shutil.disk_usage(data_dir).free
                 
-                if save_success:
-                    retrieved = await self.local_db.get_document("_health", "test") 
-                    await self.local_db.delete_document("_health", "test")
-                    
-                    health_info["status"] = "healthy" if retrieved else "unhealthy"
-                    health_info["details"]["local_db_operational"] = retrieved is not None
-                else:
-                    health_info["status"] = "unhealthy"
+                health_info["status"] = "healthy" if writable and free_bytes > 0 else "unhealthy"
+                health_info["details"]["local_db_operational"] = health_info["status"] == "healthy"
+                health_info["details"]["free_bytes"] = free_bytes
                     
         except Exception as e:
             health_info["status"] = "unhealthy"
             health_info["details"]["error"] = str(e)
         
+        if self.use_firestore and self.firestore_client:
+            self._health_cache = (time.monotonic(), health_info)
+        
         return health_info
 
 
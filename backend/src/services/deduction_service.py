@@ -2,13 +2,13 @@
 推理フェーズのサービス
 """
 
-import json
 import logging
+import orjson
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import asyncio
 
-from ..services.ai_service import ai_service
+from ..services.ai_service import ai_service, extract_json_text
 from ..services.database_service import database_service
 from ...shared.models.game import GameSession, GameStatus
 from ...shared.models.scenario import Scenario
@@ -153,31 +153,35 @@ class DeductionService:
         # 真相の文章生成
         full_story = await self._generate_full_story(scenario)
         
-        # ゲーム完了処理
-        await database_service.update_game_session(game_id, {
-            "status": "completed",
-            "completed_at": datetime.now(),
-            "final_score": score_details["total_score"],
-            "culprit_guessed": culprit_guess,
-            "culprit_correct": culprit_correct,
-            "motive_correct": motive_correct
-        })
-        
-        # ゲーム履歴保存
-        await database_service.save_game_history(
-            f"{game_id}_history",
-            {
-                "game_id": game_id,
-                "player_id": player_id,
-                "title": scenario.get("title", "Unknown Mystery"),
+        # ゲーム完了処理と履歴保存（Firestoreでは1回のコミットにまとめる）
+        async with database_service.batch_writes() as batch_result:
+            await database_service.update_game_session(game_id, {
+                "status": "completed",
                 "completed_at": datetime.now(),
-                "score": score_details["total_score"],
+                "final_score": score_details["total_score"],
+                "culprit_guessed": culprit_guess,
                 "culprit_correct": culprit_correct,
-                "motive_correct": motive_correct,
-                "difficulty": game_session.get("difficulty", "normal"),
-                "duration": self._calculate_game_duration(game_session)
-            }
-        )
+                "motive_correct": motive_correct
+            })
+            
+            # ゲーム履歴保存
+            await database_service.save_game_history(
+                f"{game_id}_history",
+                {
+                    "game_id": game_id,
+                    "player_id": player_id,
+                    "title": scenario.get("title", "Unknown Mystery"),
+                    "completed_at": datetime.now(),
+                    "score": score_details["total_score"],
+                    "culprit_correct": culprit_correct,
+                    "motive_correct": motive_correct,
+                    "difficulty": game_session.get("difficulty", "normal"),
+                    "duration": self._calculate_game_duration(game_session)
+                }
+            )
+        if not batch_result.committed:
+            # 保存に失敗しても判定結果は返す（従来の個別保存の失敗時と同じ扱い）
+            logger.error(f"ゲーム完了の保存に失敗: {game_id}: {batch_result.error}")
         
         return {
             "is_correct": culprit_correct and motive_correct,
@@ -352,16 +356,12 @@ JSON形式で回答:
 """
         
         try:
-            response = await ai_service.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # JSONブロックを抽出
-            if "```json" in response_text:
-                json_start = response_text.index("```json") + 7
-                json_end = response_text.index("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
+            # レート制限・同時実行数の制限・リトライはAIサービス側で行う
+            response = await ai_service.generate_text(prompt)
+            # JSONブロックを抽出（AIサービスと同じ事前コンパイル済みのパターンを使用）
+            response_text = extract_json_text(response)
             
-            answer_data = json.loads(response_text)
+            answer_data = orjson.loads(response_text)
             return answer_data
             
         except Exception as e:
@@ -455,8 +455,8 @@ JSON形式で回答:
 """
         
         try:
-            response = await ai_service.model.generate_content(prompt)
-            return response.text.strip()
+            response = await ai_service.generate_text(prompt)
+            return response.strip()
         except Exception as e:
             logger.error(f"真相文章生成エラー: {e}")
             return f"{scenario.get('culprit')}が犯人でした。動機は{scenario.get('motive')}でした。"
@@ -6,11 +6,12 @@ import uuid
 import time
 import asyncio
 import traceback
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Set, Coroutine
 from datetime import datetime
 
 from .database_service import database_service
 from ..core.logging import get_game_logger
+from ..config.settings import get_settings
 from shared.models.game import (
     GameSession, GameStatus, Difficulty, GameScore, 
     DeductionRequest, DeductionResult
@@ -24,10 +25,16 @@ from shared.models.character import CharacterReaction
 from .lazy_service_manager import lazy_service_manager
 from .gps_service import gps_service, GPSReading, GPSAccuracy
 
+# シャットダウン時にバックグラウンド詳細化の完了を待つ最大秒数
+BACKGROUND_DRAIN_TIMEOUT_SECONDS = 8.0
+
 
 class GameService:
     def __init__(self):
         self.logger = get_game_logger(__name__)
+        # バックグラウンド詳細化（同時実行数を制限し、GCで消えないよう参照を保持）
+        self._bg_sem = asyncio.Semaphore(get_settings().api.background_enhancement_max_concurrent)
+        self._bg_tasks: Set[asyncio.Task] = set()
     """ゲームサービス"""
     
     async def start_new_game(
@@ -67,20 +74,20 @@ class GameService:
         # 拡張POIサービスを取得（遅延初期化）
         enhanced_poi_service = await lazy_service_manager.get_enhanced_poi_service()
         
-        # 証拠配置に最適化されたPOI検索（動的半径を使用）
+        # 証拠配置に最適化されたPOI検索（動的半径を使用）と地域コンテキスト取得は独立のため並行実行
         evidence_count = self._get_evidence_count(difficulty)
-        evidence_pois = await enhanced_poi_service.find_evidence_suitable_pois(
-            player_location,
-            radius=radius,  # 動的半径を使用
-            evidence_count=evidence_count
+        evidence_pois, location_context = await asyncio.gather(
+            enhanced_poi_service.find_evidence_suitable_pois(
+                player_location,
+                radius=radius,  # 動的半径を使用
+                evidence_count=evidence_count
+            ),
+            poi_service.get_location_context(player_location)
         )
         
         if len(evidence_pois) < 3:
             raise ValueError(f"半径{radius}m内にゲーム作成に十分なPOI（最低3件）がありません。より大きな半径を選択してください。")
         
-        # 地域コンテキスト取得
-        location_context = await poi_service.get_location_context(player_location)
-        
         # シナリオ生成リクエスト作成
         scenario_request = ScenarioGenerationRequest(
             difficulty=difficulty.value,
@@ -89,17 +96,13 @@ class GameService:
             suspect_count_range=self._get_suspect_count_range(difficulty)
         )
         
-        # AIでシナリオ生成
+        # AIでシナリオと証拠を一括生成（証拠は選択されたPOIに配置）
         ai_service = await lazy_service_manager.get_ai_service()
-        scenario = await ai_service.generate_mystery_scenario(scenario_request)
-        
-        # 証拠生成（選択されたPOIを使用）
-        evidence_list = await ai_service.generate_evidence(
-            scenario,
+        scenario, evidence_list = await ai_service.generate_scenario_with_evidence(
+            scenario_request,
             [{"name": poi.name, "type": poi.poi_type.value, 
               "lat": poi.location.lat, "lng": poi.location.lng,
-              "poi_id": poi.poi_id, "address": poi.address} for poi in evidence_pois],
-            evidence_count
+              "poi_id": poi.poi_id, "address": poi.address} for poi in evidence_pois]
         )
         
         # ゲームセッション作成
@@ -251,13 +254,11 @@ class GameService:
         )
         
         try:
-            scenario = await ai_service.generate_mystery_scenario(scenario_request)
-            evidence_list = await ai_service.generate_evidence(
-                scenario,
+            scenario, evidence_list = await ai_service.generate_scenario_with_evidence(
+                scenario_request,
                 [{"name": poi.name, "type": poi.poi_type.value, 
                   "lat": poi.location.lat, "lng": poi.location.lng,
-                  "poi_id": poi.poi_id, "address": poi.address} for poi in evidence_pois],
-                evidence_count
+                  "poi_id": poi.poi_id, "address": poi.address} for poi in evidence_pois]
             )
         except Exception as e:
             logger.error(f"AI generation failed: {e}, using fallback")
@@ -496,7 +497,7 @@ class GameService:
             
             # Phase 2: バックグラウンドで詳細化開始
             self.logger.info("バックグラウンド詳細化開始...")
-            asyncio.create_task(
+            self._spawn_background(
                 self._enhance_game_background(game_id, base_scenario, scenario_request, evidence_pois)
             )
             
@@ -569,6 +570,29 @@ class GameService:
         
         return evidence_list
     
+    def _spawn_background(self, coro: Coroutine[Any, Any, None]) -> asyncio.Task:
+        """バックグラウンド処理を同時実行数の上限付きで開始（応答は待たない）"""
+        async def run() -> None:
+            async with self._bg_sem:
+                await coro
+        
+        task = asyncio.create_task(run())
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+    
+    async def drain_background_tasks(self, timeout: float = BACKGROUND_DRAIN_TIMEOUT_SECONDS) -> None:
+        """実行中のバックグラウンド処理の完了を待つ（シャットダウン時に書き込みを失わないため）"""
+        if not self._bg_tasks:
+            return
+        
+        self.logger.info(f"バックグラウンド処理の完了待ち: {len(self._bg_tasks)}件")
+        _, pending = await asyncio.wait(set(self._bg_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.logger.warning(f"バックグラウンド処理をキャンセル: {len(pending)}件")
+    
     async def _enhance_game_background(
         self, 
         game_id: str, 
@@ -578,11 +602,10 @@ class GameService:
     ):
         """バックグラウンドでゲーム詳細化"""
         try:
-            # Phase 2: シナリオ詳細化
+            # Phase 2: シナリオ詳細化 / Phase 3: 証拠詳細化
+            # どちらも同じゲームセッションを読み込んで書き戻すため、更新が失われないよう順に実行
             ai_service = await lazy_service_manager.get_ai_service()
             await ai_service.enhance_scenario_background(game_id, base_scenario, scenario_request)
-            
-            # Phase 3: 証拠詳細化
             await self._enhance_evidence_background(game_id, base_scenario, evidence_pois)
             
         except Exception as e:
@@ -1017,15 +1040,17 @@ class GameService:
         # ゲーム完了処理
         game_session.complete_game(score)
         
-        # データベース更新
-        await database_service.update_game_session(game_session.game_id, {
-            "status": "completed",
-            "completed_at": game_session.completed_at,
-            "final_score": score.total_score
-        })
-        
-        # 履歴保存
-        await self._save_game_history(game_session)
+        # データベース更新と履歴保存（Firestoreでは1回のコミットにまとめる）
+        async with database_service.batch_writes() as batch_result:
+            await database_service.update_game_session(game_session.game_id, {
+                "status": "completed",
+                "completed_at": game_session.completed_at,
+                "final_score": score.total_score
+            })
+            await self._save_game_history(game_session)
+        if not batch_result.committed:
+            # 保存に失敗しても推理結果は返す（従来の個別保存の失敗時と同じ扱い）
+            self.logger.error(f"ゲーム完了の保存に失敗: {game_session.game_id}: {batch_result.error}")
         
         return DeductionResult(
             correct=is_correct,
@@ -0,0 +1,269 @@
+"""
+LLM応答キャッシュ - 同一リクエストに対するGemini呼び出しを省略
+"""
+
+import asyncio
+import math
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import orjson
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, Sequence
+from cachetools import TTLCache
+
+from ..core.logging import get_ai_logger
+
+logger = get_ai_logger(__name__)
+
+
+def build_cache_key(namespace: str, fields: Dict[str, Any]) -> str:
+    """正規化したリクエスト項目からキャッシュキーを作成"""
+    payload = orjson.dumps(fields, option=orjson.OPT_SORT_KEYS)
+    digest = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class CacheBackend(Protocol):
+    """応答キャッシュの保存先"""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str) -> None:
+        ...
+
+    async def clear(self) -> None:
+        ...
+
+
+class MemoryCacheBackend:
+    """インメモリの保存先（上限超過時は最も使われていないものから破棄・TTL付き）"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 3600):
+        self._cache: TTLCache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        self._cache[key] = value
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+class RedisCacheBackend:
+    """Redisの保存先（複数ワーカー・インスタンス間で共有）"""
+
+    def __init__(self, url: str, ttl_seconds: int = 3600, prefix: str = "llm_cache:"):
+        import redis.asyncio as redis_asyncio
+
+        self._client = redis_asyncio.from_url(url, decode_responses=True)
+        self._ttl_seconds = ttl_seconds
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(self._prefix + key)
+
+    async def set(self, key: str, value: str) -> None:
+        await self._client.set(self._prefix + key, value, ex=self._ttl_seconds)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self._client.scan_iter(match=self._prefix + "*")]
+        if keys:
+            await self._client.delete(*keys)
+
+
+class SqliteCacheBackend:
+    """SQLiteファイルの保存先（プロセス再起動後も残る・最も使われていないものから破棄）
+
+    開発・テストで同じシナリオの証拠生成を繰り返す場合などに、Gemini呼び出しを省略する。
+    """
+
+    def __init__(self, path: str, max_size: int = 1024, ttl_seconds: int = 86400):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self._ttl_seconds, now)
+            )
+            # 期限切れと上限超過分を破棄
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self._max_size,)
+            )
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+
+class ResponseCache:
+    """LLM応答のキャッシュ
+
+    値はシリアライズ済みのJSON文字列で保持する。
+    保存先は CacheBackend で差し替え可能（既定はインメモリ）。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: int = 3600,
+        backend: Optional[CacheBackend] = None
+    ):
+        self._backend: CacheBackend = backend or MemoryCacheBackend(max_size, ttl_seconds)
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def get(self, key: str) -> Optional[str]:
+        """キャッシュから取得（存在しない場合はNone）"""
+        try:
+            value = await self._backend.get(key)
+        except Exception as e:
+            # キャッシュ障害時はAPI呼び出しにフォールバック
+            logger.warning("LLM応答キャッシュ取得失敗: %s", e)
+            value = None
+
+        if value is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+            logger.debug("LLM応答キャッシュヒット: %s", key)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """キャッシュに保存"""
+        try:
+            await self._backend.set(key, value)
+        except Exception as e:
+            logger.warning("LLM応答キャッシュ保存失敗: %s", e)
+
+    async def clear(self) -> None:
+        """キャッシュを全削除"""
+        await self._backend.clear()
+
+
+class SemanticScenarioCache:
+    """埋め込みの類似度で引く応答キャッシュ
+
+    言い回しだけが異なる場所情報（例: 「新宿区西新宿の商業地域」と「西新宿の商業エリア」）
+    を同一とみなし、生成済みの応答を再利用する。
+    完全一致キャッシュの後段で使い、比較は同じパーティション（難易度など）内に限る。
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[Sequence[float]]],
+        threshold: float = 0.92,
+        max_entries: int = 256,
+        ttl_seconds: int = 3600
+    ):
+        self._embed = embed
+        self._threshold = threshold
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        # パーティション -> {テキスト: (正規化済み埋め込み, 値)}
+        self._partitions: Dict[str, TTLCache] = {}
+        # 直近の埋め込み結果（get の後の add で再計算しないため）
+        self._vectors: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def _vector(self, text: str) -> Optional[List[float]]:
+        """テキストの正規化済み埋め込みを取得（失敗時はNone）"""
+        vector = self._vectors.get(text)
+        if vector is not None:
+            return vector
+
+        try:
+            embedding = await self._embed(text)
+        except Exception as e:
+            logger.warning("埋め込み取得失敗: %s", e)
+            return None
+
+        norm = math.sqrt(sum(x * x for x in embedding))
+        if norm == 0:
+            return None
+        vector = [x / norm for x in embedding]
+        self._vectors[text] = vector
+        return vector
+
+    async def get(self, partition: str, text: str) -> Optional[str]:
+        """類似度が閾値以上の応答を取得（見つからない場合はNone）"""
+        entries = self._partitions.get(partition)
+        if not entries:
+            self.stats["misses"] += 1
+            return None
+
+        vector = await self._vector(text)
+        if vector is None:
+            self.stats["misses"] += 1
+            return None
+
+        best_score, best_value = 0.0, None
+        for stored_vector, value in list(entries.values()):
+            score = sum(a * b for a, b in zip(vector, stored_vector))
+            if score > best_score:
+                best_score, best_value = score, value
+
+        if best_score >= self._threshold:
+            self.stats["hits"] += 1
+            logger.debug("意味的キャッシュヒット: %s (類似度 %.3f)", partition, best_score)
+            return best_value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def add(self, partition: str, text: str, value: str) -> None:
+        """応答を保存"""
+        vector = await self._vector(text)
+        if vector is None:
+            return
+
+        entries = self._partitions.get(partition)
+        if entries is None:
+            entries = self._partitions[partition] = TTLCache(
+                maxsize=self._max_entries, ttl=self._ttl_seconds
+            )
+        entries[text] = (vector, value)
+
+    def clear(self) -> None:
+        """キャッシュを全削除"""
+        self._partitions.clear()
+        self._vectors.clear()
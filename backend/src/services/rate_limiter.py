@@ -0,0 +1,77 @@
+"""
+レート制限 - Gemini APIのRPM・TPM上限を超えないよう送出を調整
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from ..config.settings import get_settings
+
+
+class AsyncTokenBucket:
+    """非同期トークンバケット（レート制限用）
+
+    rate_per_sec でトークンを補充し、最大 burst 個まで蓄積する。
+    トークンが足りない呼び出しのみ不足分が補充されるまで待機する。
+    """
+
+    def __init__(self, rate_per_sec: float, burst: float):
+        self.rate = rate_per_sec
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """経過時間に応じてトークンを補充"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self, n: float = 1) -> None:
+        """n 個のトークンを取得（不足時は補充まで待機）"""
+        # バケット容量を超える要求は容量分として扱う（永久待機の防止）
+        n = min(n, self.burst)
+        async with self._lock:
+            self._refill()
+            if self.tokens < n:
+                await asyncio.sleep((n - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= n
+
+
+class RateLimiter:
+    """リクエスト数（RPM）と入力トークン数（TPM）の両方を制限"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, request_burst: int):
+        self._requests = AsyncTokenBucket(
+            rate_per_sec=requests_per_minute / 60,
+            burst=request_burst
+        )
+        self._tokens = AsyncTokenBucket(
+            rate_per_sec=tokens_per_minute / 60,
+            burst=tokens_per_minute
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """リクエスト1回分と tokens 個の入力トークンを取得"""
+        await self._requests.acquire(1)
+        await self._tokens.acquire(tokens)
+
+
+# APIキー単位の上限のため、プロセス内の全AIServiceで共有する
+_gemini_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_gemini_rate_limiter() -> RateLimiter:
+    """Gemini API用の共有レート制限を取得"""
+    global _gemini_rate_limiter
+    if _gemini_rate_limiter is None:
+        api_settings = get_settings().api
+        _gemini_rate_limiter = RateLimiter(
+            requests_per_minute=api_settings.gemini_requests_per_minute,
+            tokens_per_minute=api_settings.gemini_tokens_per_minute,
+            request_burst=api_settings.gemini_request_burst
+        )
+    return _gemini_rate_limiter
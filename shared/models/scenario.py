@@ -2,8 +2,8 @@
 シナリオ関連のデータモデル
 """
 
-from typing import List, Optional, ClassVar
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, ClassVar, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
 
 from .character import Character
 
@@ -23,6 +23,9 @@ class Scenario(BaseModel):
     difficulty_factors: List[str] = Field(default=[], description="難易度要素")
     red_herrings: List[str] = Field(default=[], description="ミスリード要素")
     
+    # 名前 -> 容疑者の索引（作成元のリストとその件数を保持し、差し替え・追加時は作り直す）
+    _suspect_index: Optional[Tuple[List[Character], int, Dict[str, Character]]] = PrivateAttr(default=None)
+    
     @property
     def suspect_count(self) -> int:
         """容疑者数"""
@@ -31,17 +34,15 @@ class Scenario(BaseModel):
     @property
     def culprit_character(self) -> Optional[Character]:
         """真犯人のキャラクター情報を取得"""
-        for suspect in self.suspects:
-            if suspect.name == self.culprit:
-                return suspect
-        return None
+        return self.get_suspect_by_name(self.culprit)
     
     def get_suspect_by_name(self, name: str) -> Optional[Character]:
-        """名前で容疑者を検索"""
-        for suspect in self.suspects:
-            if suspect.name == name:
-                return suspect
-        return None
+        """名前で容疑者を検索（同名の場合は先頭を優先）"""
+        cached = self._suspect_index
+        if cached is None or cached[0] is not self.suspects or cached[1] != len(self.suspects):
+            index = {suspect.name: suspect for suspect in reversed(self.suspects)}
+            cached = self._suspect_index = (self.suspects, len(self.suspects), index)
+        return cached[2].get(name)
     
     def get_all_characters(self) -> List[Character]:
         """全キャラクター（被害者+容疑者）を取得"""
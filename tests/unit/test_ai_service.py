@@ -0,0 +1,517 @@
+"""
+AIサービス補助機能のテスト
+"""
+
+import pytest
+import asyncio
+import time
+import orjson
+from unittest.mock import Mock
+from google.api_core import exceptions as google_exceptions
+from google.generativeai.types import generation_types
+
+from backend.src.services.ai_service import (
+    AIService, GeminiResponseBlocked, GeminiResponseTruncated, _RESPONSE_VALIDATORS, _raise_for_incomplete_response,
+    extract_json_text
+)
+from backend.src.config.settings import APIConfig, reset_settings
+from backend.src.services.rate_limiter import AsyncTokenBucket
+from backend.src.services.llm_cache import ResponseCache, SemanticScenarioCache, SqliteCacheBackend, build_cache_key
+from shared.models.scenario import ScenarioGenerationRequest
+
+
+class TestAsyncTokenBucket:
+    """トークンバケットのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_burst_does_not_wait(self):
+        """バースト容量内の取得は待機しない"""
+        bucket = AsyncTokenBucket(rate_per_sec=1.0, burst=5)
+
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire(1) for _ in range(5)))
+
+        assert time.monotonic() - start < 0.1
+
+    @pytest.mark.asyncio
+    async def test_waits_for_refill(self):
+        """トークン不足時は補充まで待機する"""
+        bucket = AsyncTokenBucket(rate_per_sec=20.0, burst=1)
+
+        await bucket.acquire(1)
+        start = time.monotonic()
+        await bucket.acquire(1)
+
+        assert time.monotonic() - start >= 0.04
+
+    @pytest.mark.asyncio
+    async def test_request_larger_than_burst_is_clamped(self):
+        """容量を超える要求でも永久に待機しない"""
+        bucket = AsyncTokenBucket(rate_per_sec=1.0, burst=10)
+
+        await asyncio.wait_for(bucket.acquire(1000), timeout=1.0)
+
+
+class TestResponseCache:
+    """LLM応答キャッシュのテスト"""
+
+    def test_cache_key_ignores_field_order(self):
+        """項目の順序が違っても同じキーになる"""
+        key_a = build_cache_key("scenario", {"d": "easy", "poi": ["cafe", "park"]})
+        key_b = build_cache_key("scenario", {"poi": ["cafe", "park"], "d": "easy"})
+
+        assert key_a == key_b
+        assert key_a.startswith("scenario:")
+
+    def test_scenario_key_normalizes_poi_order(self):
+        """POIタイプの並び順はキーに影響しない"""
+        service = AIService()
+        request_a = ScenarioGenerationRequest(
+            difficulty="easy", location_context="渋谷", poi_types=["cafe", "park"]
+        )
+        request_b = ScenarioGenerationRequest(
+            difficulty="easy", location_context="渋谷", poi_types=["park", "cafe"]
+        )
+
+        assert service._build_scenario_key(request_a) == service._build_scenario_key(request_b)
+
+    @pytest.mark.asyncio
+    async def test_get_and_set(self):
+        """保存した値を取得できる"""
+        cache = ResponseCache(max_size=10, ttl_seconds=60)
+
+        assert await cache.get("missing") is None
+        await cache.set("key", '{"title": "事件"}')
+        assert await cache.get("key") == '{"title": "事件"}'
+        assert cache.stats == {"hits": 1, "misses": 1}
+
+    @pytest.mark.asyncio
+    async def test_sqlite_backend_persists_and_evicts(self, tmp_path):
+        """SQLite保存先は再オープン後も値を保持し、上限超過時は古いものから破棄する"""
+        path = str(tmp_path / "llm_cache.sqlite3")
+        backend = SqliteCacheBackend(path, max_size=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            await backend.set(key, key.upper())
+
+        reopened = SqliteCacheBackend(path, max_size=2, ttl_seconds=60)
+        assert await reopened.get("a") is None
+        assert await reopened.get("c") == "C"
+
+    def test_exact_mode_skips_nondeterministic_generation(self):
+        """exactモードでは temperature=0 の生成のみキャッシュする"""
+        service = AIService()
+        service._response_cache = ResponseCache(max_size=10, ttl_seconds=60)
+        service._response_cache_mode = "exact"
+
+        assert not service._is_cacheable({"temperature": 0.8})
+        assert service._is_cacheable({"temperature": 0})
+
+    def test_default_mode_is_exact(self):
+        """既定では決定的な生成のみキャッシュし、温度に関係ないキャッシュは明示指定時のみ"""
+        assert APIConfig().ai_response_cache_mode == "exact"
+
+    def test_cache_is_disabled_by_default(self):
+        """応答キャッシュは明示的に有効化した場合のみ使う（別プレイヤーのゲームで応答を使い回さない）"""
+        assert APIConfig().ai_response_cache_enabled is False
+        assert AIService()._response_cache is None
+
+    def test_exact_mode_without_deterministic_config_warns(self, monkeypatch, caplog):
+        """exactモードで temperature=0 の生成設定がなければ何もキャッシュされないことを警告する"""
+        monkeypatch.setenv("AI_RESPONSE_CACHE_ENABLED", "true")
+        monkeypatch.setenv("AI_RESPONSE_CACHE_MODE", "exact")
+        reset_settings()
+        try:
+            with caplog.at_level("WARNING"):
+                AIService()
+        finally:
+            reset_settings()
+
+        assert "nothing will be cached" in caplog.text
+
+    def test_semantic_cache_is_disabled_by_default(self):
+        """意味的キャッシュは明示的に有効化した場合のみ使う"""
+        assert APIConfig().semantic_cache_enabled is False
+
+
+class TestSemanticScenarioCache:
+    """意味的キャッシュのテスト"""
+
+    @staticmethod
+    async def _fake_embed(text):
+        vectors = {
+            "新宿区西新宿の商業地域": [1.0, 0.1, 0.0],
+            "西新宿の商業エリア": [0.98, 0.12, 0.0],
+            "浅草の住宅街": [0.0, 0.2, 1.0],
+        }
+        return vectors[text]
+
+    @pytest.mark.asyncio
+    async def test_similar_location_hits(self):
+        """言い換えられた場所情報はヒットする"""
+        cache = SemanticScenarioCache(self._fake_embed, threshold=0.92)
+        await cache.add("normal", "新宿区西新宿の商業地域", '{"title": "事件"}')
+
+        assert await cache.get("normal", "西新宿の商業エリア") == '{"title": "事件"}'
+        assert await cache.get("normal", "浅草の住宅街") is None
+
+    @pytest.mark.asyncio
+    async def test_partitions_are_isolated(self):
+        """異なるパーティション（難易度など）の応答は返さない"""
+        cache = SemanticScenarioCache(self._fake_embed, threshold=0.92)
+        await cache.add("easy", "新宿区西新宿の商業地域", '{"title": "事件"}')
+
+        assert await cache.get("hard", "新宿区西新宿の商業地域") is None
+
+    @pytest.mark.asyncio
+    async def test_mystery_scenario_reuses_paraphrased_location(self):
+        """言い換えられた場所情報のシナリオ生成はGeminiを呼ばずに再利用する"""
+        service = AIService()
+        service.gemini_api_key = "test-key"
+        service._response_cache = ResponseCache(max_size=10, ttl_seconds=60)
+        service._response_cache_mode = "loose"
+        service._semantic_cache = SemanticScenarioCache(self._fake_embed, threshold=0.92)
+        calls = []
+
+        async def call_with_retry(prompt, *, kind, parse=None, timeout=None):
+            calls.append(prompt)
+            return service._parse_scenario_response({**service._generate_random_scenario("西新宿"), "theme": "classic"})
+
+        service._call_gemini_with_retry = call_with_retry
+        first = await service.generate_mystery_scenario(
+            ScenarioGenerationRequest(difficulty="normal", location_context="新宿区西新宿の商業地域", poi_types=["cafe"])
+        )
+        second = await service.generate_mystery_scenario(
+            ScenarioGenerationRequest(difficulty="normal", location_context="西新宿の商業エリア", poi_types=["cafe"])
+        )
+
+        assert len(calls) == 1
+        assert second.title == first.title
+
+
+class TestStructuredOutput:
+    """構造化出力（JSONモード）設定のテスト"""
+
+    @pytest.mark.parametrize("prompt_kind", ["scenario", "evidence", "scenario_with_evidence", "deduction"])
+    def test_generation_config_uses_json_schema(self, prompt_kind):
+        """プロンプト種別ごとにJSONスキーマ付きの設定になる"""
+        service = AIService()
+        config = generation_types.to_generation_config_dict(
+            service._structured_generation_config(prompt_kind)
+        )
+
+        assert config["response_mime_type"] == "application/json"
+        assert config["response_schema"].properties
+
+    def test_response_validator_rejects_missing_fields(self):
+        """スキーマに合わない応答は変換前に検出する"""
+        service = AIService()
+        scenario_data = {**service._generate_random_scenario("渋谷"), "theme": "classic"}
+        _RESPONSE_VALIDATORS["scenario"](scenario_data)
+
+        del scenario_data["suspects"][0]["temperament"]
+        with pytest.raises(ValueError, match=r"suspects\[\]\.temperament"):
+            _RESPONSE_VALIDATORS["scenario"](scenario_data)
+
+    @pytest.mark.asyncio
+    async def test_scenario_with_evidence_uses_single_call(self):
+        """シナリオと証拠を1回の呼び出しで生成し、証拠を指定のPOIに配置する"""
+        service = AIService()
+        service.gemini_api_key = "test-key"
+        poi_list = [{"name": name, "type": "cafe", "lat": 35.0, "lng": 139.0 + i} for i, name in enumerate("ABC")]
+        scenario_data = {**service._generate_random_scenario("渋谷"), "theme": "classic"}
+        evidence_data = [
+            {"name": f"証拠{i}", "description": "説明", "discovery_text": "発見", "poi_name": poi, "importance": importance}
+            for i, (poi, importance) in enumerate([("B", "important"), ("C", "important"), ("A", "critical")])
+        ]
+        calls = []
+
+        async def wait_for_rate_limit(prompt):
+            pass
+
+        async def call_gemini_api(prompt, kind, max_output_tokens=None, temperature=None):
+            calls.append(kind)
+            return orjson.dumps({"scenario": scenario_data, "evidence": evidence_data}).decode()
+
+        service._wait_for_rate_limit = wait_for_rate_limit
+        service._call_gemini_api = call_gemini_api
+        request = ScenarioGenerationRequest(difficulty="normal", location_context="渋谷", poi_types=["cafe"])
+
+        scenario, evidence_list = await service.generate_scenario_with_evidence(request, poi_list)
+
+        assert calls == ["scenario_with_evidence"]
+        assert scenario.title == scenario_data["title"]
+        assert [e.evidence_id for e in evidence_list] == ["evidence_1", "evidence_2", "evidence_3"]
+        assert [e.location.lng for e in evidence_list] == [140.0, 141.0, 139.0]
+        assert evidence_list[-1].importance.value == "critical"
+
+
+class TestExtractJsonText:
+    """応答からのJSON部分の抽出のテスト"""
+
+    @pytest.mark.parametrize("response", [
+        '{"answer": "はい"}',
+        '```json\n{"answer": "はい"}\n```',
+        '回答です。\n{"answer": "はい"}\n以上です。',
+    ])
+    def test_extracts_object(self, response):
+        """コードブロック・前後の文章を除いたJSONオブジェクトを返す"""
+        assert orjson.loads(extract_json_text(response)) == {"answer": "はい"}
+
+
+class TestEvidenceAssignments:
+    """証拠の役割割り当てのテスト"""
+
+    def test_two_exclusions_and_one_decisive(self):
+        """除外証拠2つと決定的証拠1つを別々のPOIに割り当てる"""
+        service = AIService()
+        scenario = service._parse_scenario_response(service._generate_random_scenario("渋谷"))
+        poi_list = [{"name": name, "lat": 35.0, "lng": 139.0} for name in ("A", "B", "C")]
+
+        assignments = service._plan_evidence_assignments(scenario, poi_list)
+
+        assert [a["importance"] for a in assignments] == ["important", "important", "critical"]
+        assert [a["poi"]["name"] for a in assignments] == ["A", "B", "C"]
+        assert scenario.culprit in assignments[-1]["role"]
+
+
+class TestEvidenceGeneration:
+    """役割別の証拠生成のテスト"""
+
+    @staticmethod
+    def _service_with_failures(failures):
+        """importance ごとに指定回数だけ証拠生成が失敗するサービスを作成"""
+        service = AIService()
+        service.gemini_api_key = "test-key"
+        service._response_cache = None
+        calls = []
+
+        async def generate_single(scenario, suspects_json, assignment):
+            importance = assignment["importance"]
+            calls.append(importance)
+            if failures.get(importance, 0) > 0:
+                failures[importance] -= 1
+                raise RuntimeError("生成失敗")
+            return service._build_evidence("", {
+                "name": importance, "description": "説明", "discovery_text": "発見", "importance": importance
+            }, assignment["poi"])
+
+        service._generate_single_evidence = generate_single
+        return service, calls
+
+    @staticmethod
+    def _inputs(service):
+        scenario = service._parse_scenario_response(service._generate_random_scenario("渋谷"))
+        poi_list = [{"name": name, "lat": 35.0, "lng": 139.0} for name in ("A", "B", "C")]
+        return scenario, poi_list
+
+    @pytest.mark.asyncio
+    async def test_failed_exclusion_evidence_is_skipped(self):
+        """除外証拠の失敗は残りの証拠で継続する"""
+        service, _ = self._service_with_failures({"important": 1})
+
+        evidence_list = await service.generate_evidence(*self._inputs(service))
+
+        assert [e.importance.value for e in evidence_list] == ["important", "critical"]
+
+    @pytest.mark.asyncio
+    async def test_failed_critical_evidence_is_regenerated(self):
+        """決定的証拠の失敗は一度再生成する"""
+        service, calls = self._service_with_failures({"critical": 1})
+
+        evidence_list = await service.generate_evidence(*self._inputs(service))
+
+        assert calls.count("critical") == 2
+        assert evidence_list[-1].importance.value == "critical"
+
+    @pytest.mark.asyncio
+    async def test_critical_evidence_failure_raises(self):
+        """決定的証拠を生成できない場合は解けないゲームを作らずに例外とする"""
+        service, _ = self._service_with_failures({"critical": 2})
+
+        with pytest.raises(RuntimeError):
+            await service.generate_evidence(*self._inputs(service))
+
+
+class TestBackoff:
+    """リトライ待機時間のテスト"""
+
+    def test_full_jitter_is_capped(self):
+        """待機時間は0から上限までの範囲に収まる"""
+        service = AIService()
+
+        for attempt in range(10):
+            delay = service._backoff_delay(attempt)
+            assert 0 <= delay <= min(service._backoff_cap, service._backoff_base * (2 ** attempt))
+
+    def test_retry_after_header_is_honored(self):
+        """429のRetry-Afterヘッダーを優先する"""
+        service = AIService()
+        response = Mock(headers={"Retry-After": "7"})
+        error = google_exceptions.TooManyRequests("rate limited", response=response)
+
+        assert service._backoff_delay(0, error) == 7.0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("error, expected_calls", [
+        (google_exceptions.ServiceUnavailable("unavailable"), 3),
+        (google_exceptions.InvalidArgument("bad request"), 1),
+        (ValueError("invalid json"), 2),
+        (GeminiResponseBlocked("blocked"), 1),
+    ])
+    async def test_retries_only_transient_errors(self, error, expected_calls):
+        """一時的なAPIエラーのみ上限までリトライし、応答不正は1回だけ再生成する"""
+        service = AIService()
+        service.max_retries = 3
+        service._backoff_base = 0
+        calls = []
+
+        async def wait_for_rate_limit(prompt):
+            pass
+
+        async def call_gemini_api(prompt, kind, max_output_tokens=None, temperature=None):
+            calls.append(prompt)
+            raise error
+
+        service._wait_for_rate_limit = wait_for_rate_limit
+        service._call_gemini_api = call_gemini_api
+
+        with pytest.raises(RuntimeError):
+            await service._call_gemini_with_retry("prompt", kind="evidence")
+        assert len(calls) == expected_calls
+
+    @pytest.mark.asyncio
+    async def test_generate_text_is_rate_limited_and_retried(self):
+        """他サービス向けの文章生成もレート制限を経由し、一時的なエラーはリトライする"""
+        service = AIService()
+        service.gemini_api_key = "test-key"
+        service.max_retries = 3
+        service._backoff_base = 0
+        service._get_default_model = Mock()
+        acquired, calls = [], []
+
+        async def wait_for_rate_limit(prompt):
+            acquired.append(prompt)
+
+        async def generate_text(model, prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise google_exceptions.ServiceUnavailable("unavailable")
+            return "真相の文章"
+
+        service._wait_for_rate_limit = wait_for_rate_limit
+        service._generate_text = generate_text
+
+        assert await service.generate_text("prompt") == "真相の文章"
+        assert acquired == ["prompt", "prompt"]
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_truncated_response_retries_with_larger_output_limit(self):
+        """出力トークン上限で途切れた応答は上限を引き上げて再生成する"""
+        service = AIService()
+        service._backoff_base = 0
+        limits = []
+
+        async def wait_for_rate_limit(prompt):
+            pass
+
+        async def call_gemini_api(prompt, kind, max_output_tokens=None, temperature=None):
+            limits.append(max_output_tokens)
+            if max_output_tokens is None:
+                raise GeminiResponseTruncated("truncated")
+            return '{"name": "n", "description": "d", "discovery_text": "t"}'
+
+        service._wait_for_rate_limit = wait_for_rate_limit
+        service._call_gemini_api = call_gemini_api
+
+        result = await service._call_gemini_with_retry("prompt", kind="evidence")
+
+        assert result["name"] == "n"
+        assert limits == [None, 2 * service.generation_config["max_output_tokens"]]
+
+    @pytest.mark.parametrize("feedback, finish_reason, error", [
+        (Mock(block_reason=Mock(name="SAFETY")), "STOP", GeminiResponseBlocked),
+        (Mock(block_reason=0), "SAFETY", GeminiResponseBlocked),
+        (Mock(block_reason=0), "MAX_TOKENS", GeminiResponseTruncated),
+        (Mock(block_reason=0), "STOP", None),
+    ])
+    def test_finish_reason_is_checked_before_parsing(self, feedback, finish_reason, error):
+        """ブロック・途切れはパース前に終了理由から判定する"""
+        candidate = Mock()
+        candidate.finish_reason.name = finish_reason
+        response = Mock(prompt_feedback=feedback, candidates=[candidate])
+
+        if error is None:
+            _raise_for_incomplete_response(response)
+        else:
+            with pytest.raises(error):
+                _raise_for_incomplete_response(response)
+
+
+class TestSpeculativeGeneration:
+    """投機的な並行生成のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_speculative_call_returns_first_success(self):
+        """投機的な並行呼び出しは先に成功した応答を採用し、残りをキャンセルする"""
+        service = AIService()
+        service._speculative_enabled = True
+        outcomes = [(0.01, RuntimeError("failed")), (0.02, "fast"), (1.0, "slow")]
+        cancelled, temperatures = [], []
+
+        async def call_with_retry(prompt, *, kind, parse=None, timeout=None, temperature=None):
+            temperatures.append(temperature)
+            delay, outcome = outcomes.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(outcome)
+                raise
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        service._call_gemini_with_retry = call_with_retry
+        # 1本目は失敗、2本目が成功（3本目は呼ばれない）
+        assert await service._call_gemini_speculative("prompt", kind="scenario") == "fast"
+        assert cancelled == []
+        assert len(outcomes) == 1
+        # 2本の呼び出しは異なる生成温度で送る
+        assert sorted(temperatures) == [0.6, 0.8]
+
+        outcomes[:] = [(0.01, "fast"), (1.0, "slow")]
+        assert await service._call_gemini_speculative("prompt", kind="scenario") == "fast"
+        await asyncio.sleep(0)
+        assert cancelled == ["slow"]
+
+
+class TestLightweightScenario:
+    """軽量シナリオ生成のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_share_one_generation(self):
+        """同一条件の同時リクエストはGemini呼び出しを1回に集約する"""
+        service = AIService()
+        service.gemini_api_key = "test-key"
+        service._response_cache = ResponseCache(max_size=10, ttl_seconds=60)
+        service._response_cache_mode = "loose"
+        service._semantic_cache = None
+        calls = []
+
+        async def generate(request):
+            calls.append(request)
+            await asyncio.sleep(0.01)
+            return service._create_fallback_scenario(request.location_context)
+
+        service._generate_lightweight_scenario = generate
+        request = ScenarioGenerationRequest(difficulty="easy", location_context="渋谷", poi_types=["cafe"])
+
+        first, second = await asyncio.gather(
+            service.generate_lightweight_scenario(request),
+            service.generate_lightweight_scenario(request)
+        )
+
+        assert len(calls) == 1
+        assert first.title == second.title
+        assert first is not second
+        assert service._inflight == {}
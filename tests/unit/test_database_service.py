@@ -0,0 +1,388 @@
+"""
+データベースサービス（ローカルファイル）のテスト
+"""
+
+import asyncio
+import sqlite3
+import threading
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock
+
+from backend.src.services.database_service import DatabaseService, DocumentDatabase, LocalFileDatabase, SqliteDatabase
+
+
+@pytest.fixture
+def local_db(tmp_path):
+    return LocalFileDatabase(str(tmp_path / "local_db"))
+
+
+class TestQueryDocuments:
+    """ドキュメント検索のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_filters_and_limits_results(self, local_db):
+        """条件に一致するドキュメントのみを上限件数まで返す"""
+        for i in range(6):
+            await local_db.save_document("game_sessions", f"game_{i}", {
+                "player_id": "p1" if i % 2 == 0 else "p2",
+                "created_at": datetime(2024, 1, 1, 12, i)
+            })
+        (local_db.data_dir / "game_sessions" / "broken.json").write_text("{", encoding="utf-8")
+
+        results = await local_db.query_documents("game_sessions", "player_id", "p1", limit=2)
+        all_results = await local_db.query_documents("game_sessions")
+
+        assert len(results) == 2
+        assert all(doc["player_id"] == "p1" for doc in results)
+        assert all(isinstance(doc["created_at"], datetime) for doc in results)
+        assert {doc["id"] for doc in all_results} == {f"game_{i}" for i in range(6)}
+
+
+class TestSerialization:
+    """保存・読み込み時の変換のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_only_datetime_fields_are_restored(self, local_db):
+        """日時フィールドのみdatetimeに戻し、その他のISO形式の文字列はそのまま返す"""
+        created_at = datetime(2024, 1, 1, 12, 30, 15, 123456)
+        await local_db.save_document("game_sessions", "g1", {
+            "created_at": created_at,
+            "title": "2024-01-01T00:00:00",
+            "evidence_list": [{"discovered_at": created_at}]
+        })
+
+        data = await local_db.get_document("game_sessions", "g1")
+
+        assert data["created_at"] == created_at
+        assert data["title"] == "2024-01-01T00:00:00"
+        assert data["evidence_list"][0]["discovered_at"] == created_at.isoformat()
+
+    @pytest.mark.asyncio
+    async def test_save_replaces_file_without_leaving_temporaries(self, local_db):
+        """上書き保存は一時ファイルからの置き換えで行い、一時ファイルを残さない"""
+        await local_db.save_document("players", "p1", {"name": "before"})
+        await local_db.save_document("players", "p1", {"name": "after"})
+
+        assert await local_db.get_document("players", "p1") == {"name": "after"}
+        assert [path.name for path in local_db._get_file_path("players", "p1").parent.iterdir()] == ["p1.json"]
+
+
+class TestShardedStorage:
+    """シャードディレクトリへの保存のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_legacy_files_are_readable_and_migrated(self, local_db):
+        """コレクション直下の既存ファイルも読み込め、移行でシャードへ移動する"""
+        legacy_path = local_db.data_dir / "game_sessions" / "old.json"
+        legacy_path.write_text('{"player_id": "p1", "status": "active"}', encoding="utf-8")
+
+        assert (await local_db.get_document("game_sessions", "old"))["player_id"] == "p1"
+        assert [doc["id"] for doc in await local_db.query_documents("game_sessions")] == ["old"]
+
+        assert local_db.migrate_to_shards() == 1
+        assert not legacy_path.exists()
+        assert local_db._get_file_path("game_sessions", "old").exists()
+        assert (await local_db.get_document("game_sessions", "old"))["status"] == "active"
+
+
+class TestFieldIndex:
+    """フィールド索引のテスト"""
+
+    @pytest.mark.asyncio
+    async def test_query_uses_index_and_follows_updates(self, local_db):
+        """索引で絞り込んだ結果が保存・更新・削除に追従する"""
+        await local_db.save_document("game_sessions", "g1", {"player_id": "p1", "status": "active"})
+        await local_db.save_document("game_sessions", "g2", {"player_id": "p1", "status": "completed"})
+        await local_db.save_document("game_sessions", "g3", {"player_id": "p2", "status": "active"})
+
+        conditions = {"player_id": "p1", "status": "active"}
+        assert local_db._find_indexed_ids("game_sessions", conditions) == ["g1"]
+
+        await local_db.update_document("game_sessions", "g2", {"status": "active"})
+        await local_db.delete_document("game_sessions", "g1")
+
+        results = await local_db.query_documents_where("game_sessions", conditions)
+        assert [doc["id"] for doc in results] == ["g2"]
+
+    @pytest.mark.asyncio
+    async def test_index_is_rebuilt_from_existing_files(self, local_db):
+        """索引ファイルがない場合は既存のドキュメントから作成する"""
+        await local_db.save_document("game_sessions", "g1", {"player_id": "p1", "status": "active"})
+        local_db._index_conn.close()
+        for path in local_db.data_dir.glob("_index.sqlite3*"):
+            path.unlink()
+
+        reopened = LocalFileDatabase(str(local_db.data_dir))
+
+        assert reopened._find_indexed_ids("game_sessions", {"player_id": "p1"}) == ["g1"]
+
+    @pytest.mark.asyncio
+    async def test_index_is_accessed_off_the_event_loop(self, local_db, monkeypatch):
+        """索引の更新・検索はスレッドで実行し、イベントループを塞がない"""
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return method(*args, **kwargs)
+            return wrapper
+
+        monkeypatch.setattr(local_db, "_update_index", record(local_db._update_index))
+        monkeypatch.setattr(local_db, "_find_indexed_ids", record(local_db._find_indexed_ids))
+
+        await local_db.save_document("game_sessions", "g1", {"player_id": "p1", "status": "active"})
+        await local_db.update_document("game_sessions", "g1", {"status": "completed"})
+        await local_db.query_documents_where("game_sessions", {"player_id": "p1"})
+        await local_db.delete_document("game_sessions", "g1")
+
+        assert len(threads) == 4
+        assert loop_thread not in threads
+
+
+class TestUpdateDocument:
+    """ドキュメント更新のテスト"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("inplace_updates", [False, True])
+    async def test_update_merges_and_reindexes(self, tmp_path, inplace_updates):
+        """更新内容をマージして書き戻し、索引・短くなった内容も正しく反映する"""
+        db = LocalFileDatabase(str(tmp_path / "local_db"), inplace_updates=inplace_updates)
+        await db.save_document("game_sessions", "g1", {
+            "player_id": "p1", "status": "active", "notes": "x" * 100
+        })
+
+        assert await db.update_document("game_sessions", "g1", {"status": "completed", "notes": ""})
+        assert not await db.update_document("game_sessions", "missing", {"status": "completed"})
+
+        data = await db.get_document("game_sessions", "g1")
+        assert data["status"] == "completed"
+        assert data["notes"] == ""
+        assert isinstance(data["updated_at"], datetime)
+        assert await db.query_documents_where("game_sessions", {"player_id": "p1", "status": "active"}) == []
+        db.close()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("inplace_updates", [False, True])
+    async def test_concurrent_updates_are_all_kept(self, tmp_path, inplace_updates):
+        """同じドキュメントへの同時更新で、どの更新も失われない"""
+        db = LocalFileDatabase(str(tmp_path / "local_db"), inplace_updates=inplace_updates)
+        await db.save_document("game_sessions", "g1", {"status": "active"})
+
+        results = await asyncio.gather(*(
+            db.update_document("game_sessions", "g1", {f"field_{i}": i}) for i in range(20)
+        ))
+
+        data = await db.get_document("game_sessions", "g1")
+        assert all(results)
+        assert all(data[f"field_{i}"] == i for i in range(20))
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_scenario_and_evidence_updates_are_kept(self, local_db):
+        """同じゲームへのシナリオ・証拠の同時更新で、どちらの変更も失われない"""
+        for i in range(20):
+            game_id = f"g{i}"
+            await local_db.save_document("game_sessions", game_id, {"scenario": None, "evidence_list": []})
+
+            await asyncio.gather(
+                local_db.update_game_scenario(game_id, {"title": "事件"}),
+                local_db.update_game_evidence(game_id, [{"evidence_id": "e1"}])
+            )
+
+            data = await local_db.get_document("game_sessions", game_id)
+            assert data["scenario"] == {"title": "事件"}
+            assert data["evidence_list"] == [{"evidence_id": "e1"}]
+
+
+class TestAppendLog:
+    """追記専用コレクションのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_history_is_appended_to_single_log(self, local_db):
+        """ゲーム履歴はドキュメントごとのファイルを作らず、1つのログに1行ずつ追記する"""
+        completed_at = datetime(2024, 1, 1, 12, 0)
+        for i in range(3):
+            assert await local_db.append_document("game_history", f"g{i}_history", {
+                "game_id": f"g{i}",
+                "completed_at": completed_at
+            })
+
+        records = local_db.read_appended("game_history")
+        local_db.close()
+
+        assert [record["id"] for record in records] == ["g0_history", "g1_history", "g2_history"]
+        assert all(record["completed_at"] == completed_at for record in records)
+        assert not any((local_db.data_dir / "game_history").rglob("*.json"))
+
+
+class TestFirestoreBatchWrites:
+    """Firestore一括書き込みのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_writes_in_block_are_committed_once(self):
+        """ブロック内の更新・保存はバッチに追加され、抜けた時点で1回だけコミットされる"""
+        service = DatabaseService.__new__(DatabaseService)
+        service.use_firestore = True
+        service.firestore_client = Mock()
+        service.local_db = None
+        batch = service.firestore_client.batch.return_value
+        batch.__len__ = Mock(return_value=2)
+        batch.commit = AsyncMock()
+        doc_ref = service.firestore_client.collection.return_value.document.return_value
+
+        async with service.batch_writes():
+            await service.update_game_session("g1", {"status": "completed"})
+            await service.save_game_history("g1_history", {"game_id": "g1"})
+            batch.commit.assert_not_called()
+
+        batch.update.assert_called_once()
+        batch.set.assert_called_once()
+        batch.commit.assert_awaited_once()
+        doc_ref.update.assert_not_called()
+        doc_ref.set.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_commit_failure_is_reported_not_raised(self):
+        """コミットの失敗は例外にせず、結果の committed で通知する"""
+        service = DatabaseService.__new__(DatabaseService)
+        service.use_firestore = True
+        service.firestore_client = Mock()
+        service.local_db = None
+        batch = service.firestore_client.batch.return_value
+        batch.__len__ = Mock(return_value=2)
+        batch.commit = AsyncMock(side_effect=RuntimeError("404 No document to update"))
+
+        async with service.batch_writes() as result:
+            assert await service.update_game_session("g1", {"status": "completed"})
+            assert await service.save_game_history("g1_history", {"game_id": "g1"})
+
+        assert result.committed is False
+        assert "No document to update" in result.error
+
+    @pytest.mark.asyncio
+    async def test_active_games_are_streamed_asynchronously(self):
+        """アクティブゲームの検索は非同期クライアントのストリームから読み込む"""
+        service = DatabaseService.__new__(DatabaseService)
+        service.use_firestore = True
+        service.firestore_client = Mock()
+        service.local_db = None
+        docs = [Mock(id=f"g{i}", to_dict=Mock(return_value={"status": "active"})) for i in range(2)]
+
+        async def stream():
+            for doc in docs:
+                yield doc
+
+        query = service.firestore_client.collection.return_value.where.return_value.where.return_value
+        query.stream = stream
+
+        results = await service.get_active_games_by_player("p1")
+
+        assert [doc["id"] for doc in results] == ["g0", "g1"]
+
+
+class TestHealthCheck:
+    """ヘルスチェックのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_local_check_does_not_write(self, local_db):
+        """ローカルDBのヘルスチェックはドキュメントを書き込まない"""
+        service = DatabaseService.__new__(DatabaseService)
+        service.use_firestore = False
+        service.firestore_client = None
+        service.local_db = local_db
+        service._local_db_backend = "file"
+        before = sorted(local_db.data_dir.rglob("*"))
+
+        health = await service.health_check()
+
+        assert health["status"] == "healthy"
+        assert health["details"]["local_db_operational"] is True
+        assert sorted(local_db.data_dir.rglob("*")) == before
+
+    @pytest.mark.asyncio
+    async def test_firestore_result_is_cached(self):
+        """Firestoreのヘルスチェック結果は短時間再利用し、読み取りを繰り返さない"""
+        service = DatabaseService.__new__(DatabaseService)
+        service.use_firestore = True
+        service.firestore_client = Mock()
+        service.local_db = None
+        doc_ref = service.firestore_client.collection.return_value.document.return_value
+        doc_ref.get = AsyncMock()
+
+        first = await service.health_check()
+        second = await service.health_check()
+
+        assert first["status"] == "healthy"
+        assert second is first
+        doc_ref.get.assert_called_once()
+
+
+class TestLocalDatabaseSelection:
+    """ローカルDBの作成のテスト"""
+
+    @pytest.mark.parametrize("backend, expected", [("file", LocalFileDatabase), ("sqlite", SqliteDatabase)])
+    def test_uses_configured_path(self, tmp_path, backend, expected):
+        """設定の保存先（local_db_path）にバックエンドを作成する"""
+        service = DatabaseService.__new__(DatabaseService)
+        service._local_db_backend = backend
+        service._local_db_path = str(tmp_path / "custom_db")
+        service._local_db_pretty_json = False
+        service._local_db_inplace_updates = False
+
+        local_db = service._create_local_db()
+
+        assert isinstance(local_db, expected)
+        assert local_db.data_dir == tmp_path / "custom_db"
+
+    def test_base_class_is_abstract(self):
+        """共通処理の基底クラスは直接作成できない"""
+        with pytest.raises(TypeError):
+            DocumentDatabase()
+
+    @pytest.mark.parametrize("backend", ["file", "sqlite"])
+    def test_close_releases_local_db_connections(self, tmp_path, backend):
+        """シャットダウン時の close でローカルDBの接続を閉じる"""
+        service = DatabaseService.__new__(DatabaseService)
+        service._local_db_backend = backend
+        service._local_db_path = str(tmp_path / "local_db")
+        service._local_db_pretty_json = False
+        service._local_db_inplace_updates = False
+        service.firestore_client = None
+        service.local_db = service._create_local_db()
+        conn = service.local_db._index_conn if backend == "file" else service.local_db._conn
+
+        service.close()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+class TestSqliteDatabase:
+    """SQLiteバックエンドのテスト"""
+
+    @pytest.mark.asyncio
+    async def test_crud_and_indexed_query(self, tmp_path):
+        """保存・更新・削除と、式インデックスを使うアクティブゲーム検索"""
+        db = SqliteDatabase(str(tmp_path / "local_db"))
+        created_at = datetime(2024, 1, 1, 12, 0)
+        await db.save_document("game_sessions", "g1", {"player_id": "p1", "status": "active", "created_at": created_at})
+        await db.save_document("game_sessions", "g2", {"player_id": "p1", "status": "completed"})
+        await db.save_document("game_sessions", "g3", {"player_id": "p2", "status": "active"})
+
+        await db.update_document("game_sessions", "g2", {"status": "active"})
+        await db.delete_document("game_sessions", "g3")
+
+        conditions = {"player_id": "p1", "status": "active"}
+        results = await db.query_documents_where("game_sessions", conditions)
+        assert sorted(doc["id"] for doc in results) == ["g1", "g2"]
+        assert (await db.get_document("game_sessions", "g1"))["created_at"] == created_at
+        assert await db.get_document("game_sessions", "g3") is None
+
+        plan = db._execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM docs WHERE collection = 'game_sessions' "
+            "AND json_extract(data, '$.player_id') = ? AND json_extract(data, '$.status') = ?",
+            ("p1", "active")
+        )
+        assert any("idx_game_sessions_player_status" in row[-1] for row in plan)